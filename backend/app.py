@@ -1,6 +1,7 @@
-from flask import Flask, jsonify
+import threading
+
+from flask import Flask
 from flask_cors import CORS
-import os
 
 from sqlalchemy import inspect, text
 
@@ -13,7 +14,20 @@ from routes.auth import auth_bp
 from routes.user import user_bp
 from routes.orders import orders_bp
 from routes.admin import admin_bp
-from services.messages import save_message
+from routes.messages import messages_bp
+from routes.cart import cart_bp
+from services.auth_service import start_auth_revocation_refresher, start_token_pruner
+from services.cart_service import start_guest_cart_pruner
+from services.catalog_cache import start_catalog_version_refresher
+from services.faq_store import seed_default_faq, start_faq_refresher
+from services.idempotency import start_idempotency_pruner
+from services.messages import import_legacy_messages
+from services.order_events import start_order_event_dispatcher, start_order_event_pruner
+from services.order_reconciliation import start_order_reconciler
+from services.realtime import init_realtime, socketio
+from services.search_service import start_search_index_refresher
+from services.wechat_async import start_wechat_receipt_pruner
+from services.wechat_service import start_credential_refresher
 
 # 确保模型在 db.create_all() 前被加载
 from models.user import User  # noqa: F401
@@ -21,8 +35,27 @@ from models.category import Category  # noqa: F401
 from models.product import Product  # noqa: F401
 from models.user_profile import UserProfile  # noqa: F401
 from models.auth_token import AuthToken  # noqa: F401
+from models.auth_revocation import AuthRevocation  # noqa: F401
 from models.order import Order  # noqa: F401
 from models.order_item import OrderItem  # noqa: F401
+from models.idempotency_key import IdempotencyKey  # noqa: F401
+from models.wechat_message import WechatMessage  # noqa: F401
+from models.faq_entry import FaqEntry  # noqa: F401
+from models.faq_version import FaqVersion  # noqa: F401
+from models.chat_message import ChatMessage  # noqa: F401
+from models.chat_session import ChatSession  # noqa: F401
+from models.service_queue_entry import ServiceQueueEntry  # noqa: F401
+from models.wechat_msg_receipt import WechatMsgReceipt  # noqa: F401
+from models.wechat_credential import WechatCredential  # noqa: F401
+from models.notification import Notification  # noqa: F401
+from models.notification_campaign import NotificationCampaign  # noqa: F401
+from models.campaign_read import CampaignRead  # noqa: F401
+from models.notification_counter import NotificationCounter  # noqa: F401
+from models.order_event import OrderEvent  # noqa: F401
+from models.order_event_offset import OrderEventOffset  # noqa: F401
+from models.cart import Cart  # noqa: F401
+from models.cart_item import CartItem  # noqa: F401
+from models.catalog_version import CatalogVersion  # noqa: F401
 
 # 导入配置文件
 from config import *
@@ -42,7 +75,7 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 @app.after_request
 def add_cors_headers(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization,Idempotency-Key,X-Cart-Token,If-None-Match'
     response.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,DELETE,OPTIONS'
     return response
 
@@ -55,108 +88,76 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(user_bp)
 app.register_blueprint(orders_bp)
 app.register_blueprint(admin_bp)
+app.register_blueprint(messages_bp)
+app.register_blueprint(cart_bp)
+
+# WebSocket 推送（排队变化、人工客服回复）
+init_realtime(app)
+
+
+# 后台任务（过期数据清理、问答库刷新等）在每个工作进程收到第一个请求时启动，
+# 保证 gunicorn 多进程下每个 worker 都有自己的后台线程（fork 之后启动）
+_background_jobs_lock = threading.Lock()
+_background_jobs_started = False
+
+
+@app.before_request
+def start_background_jobs():
+    global _background_jobs_started
+    if _background_jobs_started:
+        return
+    with _background_jobs_lock:
+        if _background_jobs_started:
+            return
+        _background_jobs_started = True
+        start_token_pruner(app)
+        start_auth_revocation_refresher(app)
+        start_idempotency_pruner(app)
+        start_faq_refresher(app)
+        start_wechat_receipt_pruner(app)
+        start_credential_refresher(app)
+        start_order_event_dispatcher(app)
+        start_order_event_pruner(app)
+        start_guest_cart_pruner(app)
+        start_order_reconciler(app)
+        start_catalog_version_refresher(app)
+        start_search_index_refresher(app)
 
 
 # 配置已从config.py导入
 
-# 用户消息中心接口 - 用于前端消息列表展示
-@app.route('/api/messages/<user_id>', methods=['GET'])
-def get_user_messages(user_id):
-    """获取用户的消息列表（系统消息、订单消息、活动消息）"""
-    try:
-        # 模拟消息数据（实际项目中应从数据库获取）
-        system_messages = [
-            {
-                "id": 1,
-                "title": "系统通知",
-                "content": "尊敬的用户，您的账号已成功注册",
-                "createTime": "2025-11-01 14:30:00",
-                "isRead": True
-            },
-            {
-                "id": 2,
-                "title": "系统维护通知",
-                "content": "系统将于11月5日凌晨2点进行维护，届时服务可能暂时不可用",
-                "createTime": "2025-11-03 10:00:00",
-                "isRead": False
-            },
-            {
-                "id": 3,
-                "title": "账号安全提醒",
-                "content": "您的账号在新设备登录，如非本人操作，请及时修改密码",
-                "createTime": "2025-11-04 08:15:00",
-                "isRead": True
-            }
-        ]
-        
-        order_messages = [
-            {
-                "id": 1,
-                "title": "订单发货通知",
-                "content": "您的订单#202511010001已发货，快递公司：顺丰速运，运单号：SF1234567890",
-                "createTime": "2025-11-02 16:45:00",
-                "isRead": True
-            },
-            {
-                "id": 2,
-                "title": "订单支付成功",
-                "content": "您的订单#202511030002已支付成功，商家正在处理中",
-                "createTime": "2025-11-03 14:20:00",
-                "isRead": False
-            },
-            {
-                "id": 3,
-                "title": "订单已完成",
-                "content": "您的订单#202510280001已完成，感谢您的购买",
-                "createTime": "2025-11-01 10:30:00",
-                "isRead": True
-            }
-        ]
-        
-        promo_messages = [
-            {
-                "id": 1,
-                "title": "限时优惠活动",
-                "content": "双11大促开始啦！全场商品5折起，满199减100，快来选购吧！",
-                "createTime": "2025-11-04 09:00:00",
-                "isRead": False
-            },
-            {
-                "id": 2,
-                "title": "新用户专享",
-                "content": "欢迎新用户！注册即送50元优惠券，满100元即可使用",
-                "createTime": "2025-11-01 14:35:00",
-                "isRead": True
-            },
-            {
-                "id": 3,
-                "title": "会员积分提醒",
-                "content": "您的会员积分已到账，当前积分：1500，可用于兑换精美礼品",
-                "createTime": "2025-11-03 11:10:00",
-                "isRead": False
-            }
-        ]
-        
-        # 返回符合前端预期的结构
-        return jsonify({
-            "success": True,
-            "data": {
-                "system": system_messages,
-                "order": order_messages,
-                "promo": promo_messages
-            }
-        })
-        
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": f"获取消息失败: {str(e)}"
-        })
+# 金额由浮点（元）改为整数分：(表, 旧列, 新列)
+MONEY_COLUMNS = [
+    ("products", "price", "price_cents"),
+    ("orders", "total_amount", "total_cents"),
+    ("order_items", "product_price", "product_price_cents"),
+    ("order_items", "subtotal", "subtotal_cents"),
+    ("cart_items", "added_price", "added_price_cents"),
+]
+
+
+def migrate_money_columns():
+    """把旧的浮点金额列按 ROUND(x * 100) 换算到整数分列后删除旧列，已迁移的表跳过。
+    旧订单的 total_amount 是浮点累加的结果，换算后可能与明细之和差几分，用 reconcile_orders.py 核对。"""
+    inspector = inspect(db.engine)
+    for table, old, new in MONEY_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        cols = {c.get("name") for c in inspector.get_columns(table)}
+        if old not in cols:
+            continue
+        try:
+            if new not in cols:
+                db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {new} BIGINT NOT NULL DEFAULT 0"))
+            db.session.execute(text(f"UPDATE {table} SET {new} = ROUND({old} * 100)"))
+            db.session.execute(text(f"ALTER TABLE {table} DROP COLUMN {old}"))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"金额列迁移失败（{table}.{old}）: {str(e)}")
+
 
 if __name__ == "__main__":
-    # 初始化消息记录文件
-    if not os.path.exists(MESSAGE_LOG_FILE):
-        save_message([])
     with app.app_context():
         try:
             inspector = inspect(db.engine)
@@ -174,8 +175,31 @@ if __name__ == "__main__":
                             db.session.commit()
                         except Exception:
                             db.session.rollback()
+            if inspector.has_table("auth_tokens"):
+                cols = {c.get("name") for c in inspector.get_columns("auth_tokens")}
+                if "expires_at" not in cols:
+                    # 旧 token 按签发时间补齐过期时间，随后由后台清理线程分批删除
+                    try:
+                        db.session.execute(text("ALTER TABLE auth_tokens ADD COLUMN expires_at INTEGER NOT NULL DEFAULT 0"))
+                        db.session.execute(text("UPDATE auth_tokens SET expires_at = created_at + :ttl"), {"ttl": TOKEN_TTL})
+                        db.session.execute(text("CREATE INDEX ix_auth_tokens_expires_at ON auth_tokens (expires_at)"))
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+            if inspector.has_table("notifications"):
+                cols = {c.get("name") for c in inspector.get_columns("notifications")}
+                if "source_event_id" not in cols:
+                    try:
+                        db.session.execute(text("ALTER TABLE notifications ADD COLUMN source_event_id INTEGER"))
+                        db.session.execute(text("CREATE UNIQUE INDEX ix_notifications_source_event_id ON notifications (source_event_id)"))
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
         except Exception:
             db.session.rollback()
+        migrate_money_columns()
         db.create_all()
-    # 运行本地服务器
-    app.run(host=HOST, port=PORT, debug=DEBUG)
+        import_legacy_messages()
+        seed_default_faq()
+    # 运行本地服务器（同时提供 WebSocket）
+    socketio.run(app, host=HOST, port=PORT, debug=DEBUG, allow_unsafe_werkzeug=True)
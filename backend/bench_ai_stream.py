@@ -0,0 +1,61 @@
+"""
+流式回复对比：同一个模拟大模型服务下，/api/ai_chat 与 /api/ai_chat/stream 的首字耗时（TTFT）和总耗时
+
+用法：python bench_ai_stream.py [请求次数] [首字延迟ms] [分片间隔ms]   默认 20 300 30
+使用 fake_llm_server.py 在本进程内启动模拟服务，临时 SQLite 数据库保存会话记录。
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_llm_server import start_in_background
+
+requests_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+first_token_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+chunk_interval_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+_server, _api_url = start_in_background(first_token_ms=first_token_ms, chunk_interval_ms=chunk_interval_ms)
+os.environ["VOLC_API_URL"] = _api_url
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ["AI_REPLY_CACHE_TTL"] = "0"  # 不走回复缓存，每次都真正请求模拟服务
+
+from app import app
+from db import db
+
+
+def _summary(name, ttft, total):
+    print(f"{name:<22} TTFT p50={statistics.median(ttft):7.1f}ms  总耗时 p50={statistics.median(total):7.1f}ms")
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    ttft, total = [], []
+    for i in range(requests_count):
+        start = time.perf_counter()
+        client.post("/api/ai_chat", json={"user_id": f"bench-{i}", "msg": f"问题{i}", "history_limit": 0})
+        elapsed = (time.perf_counter() - start) * 1000
+        ttft.append(elapsed)  # 非流式：拿到回复的时间就是首字时间
+        total.append(elapsed)
+    _summary("/api/ai_chat", ttft, total)
+
+    ttft, total = [], []
+    for i in range(requests_count):
+        start = time.perf_counter()
+        res = client.post("/api/ai_chat/stream", json={"user_id": f"bench-s-{i}", "msg": f"问题{i}"}, buffered=False)
+        first = None
+        for chunk in res.response:
+            if first is None and b"event: delta" in chunk:
+                first = (time.perf_counter() - start) * 1000
+        res.close()
+        total.append((time.perf_counter() - start) * 1000)
+        ttft.append(first if first is not None else total[-1])
+    _summary("/api/ai_chat/stream", ttft, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+购物车结算压测：购物车 1/10/50/100 种商品时，结算的耗时与 SQL 语句数；
+对照为原来的逐个商品查询 + 逐个条件扣减库存
+
+用法：python bench_cart_checkout.py [每种规模的结算次数]   默认 20
+默认使用临时 SQLite 数据库；设置 SQLALCHEMY_DATABASE_URI 可指向 MySQL 测试库（会重建表，切勿指向业务库）。
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from sqlalchemy import event
+
+from app import app
+from db import db
+from models.cart_item import CartItem
+from models.order import Order
+from models.order_item import OrderItem
+from models.product import Product
+from models.user import User
+from services.cart_service import checkout, get_cart
+from services.order_events import record_order_event
+
+SIZES = (1, 10, 50, 100)
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def _fill_cart(cart, size):
+    CartItem.query.filter_by(cart_id=cart.id).delete(synchronize_session=False)
+    db.session.execute(CartItem.__table__.insert(), [
+        {"cart_id": cart.id, "product_id": i, "quantity": 1, "added_price_cents": 990, "added_at": int(time.time())}
+        for i in range(1, size + 1)
+    ])
+    db.session.commit()
+
+
+def _legacy_checkout(user_id, size):
+    """原来的流程：前端提交商品列表，逐个查询商品、逐个条件扣减库存"""
+    order = Order(user_id=user_id, recipient="压测", phone="1", address="x", status="pending",
+                  created_at=int(time.time()))
+    total_cents = 0
+    for product_id in range(1, size + 1):
+        product = db.session.get(Product, product_id)
+        result = db.session.execute(
+            Product.__table__.update()
+            .where(Product.id == product_id, Product.stock >= 1)
+            .values(stock=Product.stock - 1)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            raise RuntimeError("stock not enough")
+        total_cents += product.price_cents
+        order.items.append(OrderItem(product_id=product_id, product_name=product.name,
+                                     product_price_cents=product.price_cents, quantity=1,
+                                     subtotal_cents=product.price_cents))
+    order.total_cents = total_cents
+    db.session.add(order)
+    db.session.flush()
+    record_order_event(order, "created", to_status=order.status, items=size, total_amount=total_cents / 100)
+    db.session.commit()
+
+
+def _measure(fn, rounds, prepare):
+    counter = _StatementCounter()
+    samples, statements = [], []
+    for _ in range(rounds):
+        prepare()
+        db.session.expire_all()
+        event.listen(db.engine, "before_cursor_execute", counter)
+        counter.count = 0
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        event.remove(db.engine, "before_cursor_execute", counter)
+        statements.append(counter.count)
+    return statistics.median(samples), max(statements)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username="bench", password_hash="-", created_at=int(time.time()))
+        db.session.add(user)
+        db.session.execute(Product.__table__.insert(), [
+            {"id": i, "name": f"商品{i}", "price_cents": 990, "stock": 1000000} for i in range(1, max(SIZES) + 1)
+        ])
+        db.session.commit()
+        cart = get_cart(user_id=user.id, create=True)
+
+        print(f"{'商品种类':>8} {'结算 p50':>10} {'语句数':>6} {'对照 p50':>10} {'语句数':>6}")
+        for size in SIZES:
+            ms, statements = _measure(
+                lambda: checkout(cart, user.id, "压测", "1", "x"), rounds, lambda: _fill_cart(cart, size)
+            )
+            legacy_ms, legacy_statements = _measure(lambda: _legacy_checkout(user.id, size), rounds, lambda: None)
+            print(f"{size:>8} {ms:>8.2f}ms {statements:>6} {legacy_ms:>8.2f}ms {legacy_statements:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+商品目录缓存压测：分类列表、商品详情、分类商品列表三个接口，对比不走缓存（每次查库 + 序列化）、
+命中缓存、带 If-None-Match 返回 304 时的耗时、数据库查询数和响应字节数
+
+用法：python bench_catalog_cache.py [商品数] [分类数] [每种情况的请求数]   默认 2000 10 500
+默认使用临时 SQLite 数据库；设置 SQLALCHEMY_DATABASE_URI 可指向 MySQL 测试库（会重建表，切勿指向业务库）。
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from sqlalchemy import event
+
+from app import app
+from db import db
+from models.category import Category
+from models.product import Product
+from services.catalog_cache import catalog_cache
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def _seed(products, categories):
+    db.session.execute(Category.__table__.insert(), [
+        {"id": i, "name": f"category{i}"} for i in range(1, categories + 1)
+    ])
+    db.session.execute(Product.__table__.insert(), [
+        {"id": i, "name": f"商品{i}", "description": "校园文创 " * 20, "price_cents": random.randint(100, 30000),
+         "stock": 100, "rating": 4.5, "category_id": i % categories + 1}
+        for i in range(1, products + 1)
+    ])
+    db.session.commit()
+
+
+def _measure(client, urls, mode):
+    counter = _StatementCounter()
+    samples, sizes = [], []
+    etags = {}
+    if mode != "uncached":
+        for url in set(urls):
+            etags[url] = client.get(url).headers.get("ETag")
+    event.listen(db.engine, "before_cursor_execute", counter)
+    for url in urls:
+        if mode == "uncached":
+            catalog_cache._local.clear()
+        headers = {"If-None-Match": etags[url]} if mode == "304" else {}
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(response.data))
+    event.remove(db.engine, "before_cursor_execute", counter)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1], counter.count / len(urls), statistics.mean(sizes)
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    categories = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    requests_per_case = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        _seed(products, categories)
+
+    cases = {
+        "分类列表": ["/api/categories"] * requests_per_case,
+        "商品详情": [f"/api/products/{random.randint(1, min(products, 200))}" for _ in range(requests_per_case)],
+        "分类商品列表": [f"/api/categories/category{random.randint(1, categories)}/products"
+                   for _ in range(requests_per_case // 10 or 1)],
+    }
+    print(f"商品={products} 分类={categories}")
+    with app.app_context():
+        for name, urls in cases.items():
+            for mode, label in (("uncached", "不走缓存"), ("cached", "命中缓存"), ("304", "304")):
+                p50, p99, queries, size = _measure(client, urls, mode)
+                print(f"{name:<8} {label:<6} p50={p50:.3f}ms p99={p99:.3f}ms 查询/请求={queries:.2f} 响应={size:.0f}B")
+        print(catalog_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
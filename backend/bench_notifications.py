@@ -0,0 +1,141 @@
+"""
+消息中心压测：10 万用户 + 一次活动广播，对比读扩散（一行活动）与写扩散（每个用户一行）的发布代价，
+并统计翻页、未读数（计数行 vs 实时 COUNT）、批量已读的耗时
+
+用法：python bench_notifications.py [用户数] [每个用户的消息数] [采样用户数]   默认 100000 5 500
+默认使用临时 SQLite 数据库；设置 SQLALCHEMY_DATABASE_URI 可指向 MySQL 测试库（会重建表，切勿指向业务库）。
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from app import app
+from db import db
+from models.notification import Notification
+from models.notification_counter import NotificationCounter
+from models.user import User
+from services.notification_service import (
+    create_campaign,
+    list_notifications,
+    mark_read,
+    unread_counts,
+)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return f"p50={statistics.median(samples):.2f}ms p99={samples[int(len(samples) * 0.99) - 1]:.2f}ms"
+
+
+def _seed(users, per_user):
+    now = int(time.time())
+    db.session.execute(User.__table__.insert(), [
+        {"id": i, "username": f"u{i}", "password_hash": "-", "is_admin": False, "created_at": now}
+        for i in range(1, users + 1)
+    ])
+    rows, counters = [], []
+    for user_id in range(1, users + 1):
+        unread = {"system": 0, "order": 0}
+        for n in range(per_user):
+            category = "order" if n % 2 else "system"
+            is_read = random.random() < 0.5
+            unread[category] += not is_read
+            rows.append({
+                "user_id": user_id, "category": category, "title": "通知", "content": f"消息 {n}",
+                "is_read": is_read, "created_at": now - n,
+            })
+        counters.append({"user_id": user_id, "unread_system": unread["system"], "unread_order": unread["order"]})
+    db.session.execute(Notification.__table__.insert(), rows)
+    db.session.execute(NotificationCounter.__table__.insert(), counters)
+    db.session.commit()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        ms, _ = _timed(lambda: _seed(users, per_user))
+        print(f"用户={users} 用户消息={users * per_user} 初始化耗时={ms / 1000:.1f}s")
+
+        ms, campaign = _timed(lambda: create_campaign("双11大促", "全场商品5折起，满199减100"))
+        print(f"活动广播（读扩散）：写入 1 行，耗时 {ms:.2f}ms")
+
+        # 对照：写扩散为每个用户写一行消息并更新计数，写完后删除
+        def _fan_out_on_write():
+            now = int(time.time())
+            db.session.execute(Notification.__table__.insert(), [
+                {"user_id": i, "category": "system", "title": campaign.title, "content": campaign.content,
+                 "is_read": False, "created_at": now}
+                for i in range(1, users + 1)
+            ])
+            db.session.execute(
+                NotificationCounter.__table__.update().values(unread_system=NotificationCounter.unread_system + 1)
+            )
+            db.session.commit()
+
+        ms, _ = _timed(_fan_out_on_write)
+        print(f"对照（写扩散）：写入 {users} 行 + 更新 {users} 个计数，耗时 {ms:.0f}ms")
+        Notification.query.filter(Notification.title == campaign.title).delete(synchronize_session=False)
+        NotificationCounter.query.update(
+            {NotificationCounter.unread_system: NotificationCounter.unread_system - 1}, synchronize_session=False
+        )
+        db.session.commit()
+
+        sample_users = random.sample(range(1, users + 1), min(samples, users))
+        page, counts, counted, marks = [], [], [], []
+        for user_id in sample_users:
+            ms, _ = _timed(lambda: [list_notifications(user_id, c, None, 20) for c in ("system", "order", "promo")])
+            page.append(ms)
+            ms, result = _timed(lambda: unread_counts(user_id))
+            counts.append(ms)
+            ms, expected = _timed(lambda: Notification.query.filter(
+                Notification.user_id == user_id, Notification.is_read.is_(False)
+            ).count())
+            counted.append(ms)
+            if result["system"] + result["order"] != expected or result["promo"] != 1:
+                print(f"未读数不一致：user={user_id} 计数={result} COUNT={expected}")
+            db.session.rollback()
+            ms, _ = _timed(lambda: mark_read(user_id))
+            marks.append(ms)
+            if unread_counts(user_id)["total"] != 0:
+                print(f"全部已读后仍有未读：user={user_id}")
+
+        print(f"消息页（3 个分类第一页）{_summary(page)}")
+        print(f"未读数（计数行 + 活动水位）{_summary(counts)}  对照（实时 COUNT）{_summary(counted)}")
+        print(f"全部标记已读 {_summary(marks)}")
+
+        # 消息很多的用户：计数行的代价不变，实时 COUNT 随收件箱大小增长
+        heavy = sample_users[0]
+        now = int(time.time())
+        db.session.execute(Notification.__table__.insert(), [
+            {"user_id": heavy, "category": "order", "title": "通知", "content": "消息", "is_read": False, "created_at": now}
+            for _ in range(20000)
+        ])
+        db.session.execute(NotificationCounter.__table__.update().where(
+            NotificationCounter.user_id == heavy).values(unread_order=20000))
+        db.session.commit()
+        counts = [_timed(lambda: unread_counts(heavy))[0] for _ in range(50)]
+        counted = [_timed(lambda: Notification.query.filter(
+            Notification.user_id == heavy, Notification.is_read.is_(False)).count())[0] for _ in range(50)]
+        print(f"2 万条未读的用户：未读数 {_summary(counts)}  对照（实时 COUNT）{_summary(counted)}")
+
+
+if __name__ == "__main__":
+    main()
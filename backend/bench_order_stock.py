@@ -0,0 +1,66 @@
+"""
+下单并发压测：数百个并发订单抢同一个热门商品，验证不超卖并统计每秒下单数
+
+用法：python bench_order_stock.py [并发订单数] [初始库存] [线程数]   默认 500 100 32
+默认使用临时 SQLite 数据库；设置 SQLALCHEMY_DATABASE_URI 可指向 MySQL 测试库（会重建表，切勿指向业务库）。
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from app import app
+from db import db
+from models.order_item import OrderItem
+from models.product import Product
+from models.user import User
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username="bench")
+        user.set_password("bench")
+        hot = Product(name="热门商品", price_cents=990, stock=stock)
+        db.session.add_all([user, hot])
+        db.session.commit()
+        hot_id = hot.id
+    token = client.post("/api/login", json={"username": "bench", "password": "bench"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"recipient": "r", "phone": "p", "address": "a", "items": [{"product_id": hot_id, "quantity": 1}]}
+
+    def _order(_):
+        return client.post("/api/orders", json=body, headers=headers).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        codes = list(pool.map(_order, range(orders)))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        left = db.session.get(Product, hot_id).stock
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).scalar()
+
+    succeeded = codes.count(200)
+    print(f"并发订单={orders} 线程={workers} 初始库存={stock}")
+    print(f"成功={succeeded} 库存不足={codes.count(400)} 其他={orders - succeeded - codes.count(400)}")
+    print(f"剩余库存={left} 已售={sold} 耗时={elapsed:.2f}s 吞吐={orders / elapsed:.1f} 单/秒")
+
+    oversold = left < 0 or sold > stock or succeeded != sold or left + sold != stock
+    print("结果: 超卖!" if oversold else "结果: 未超卖")
+    sys.exit(1 if oversold else 0)
+
+
+if __name__ == "__main__":
+    main()
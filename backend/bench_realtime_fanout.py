@@ -0,0 +1,78 @@
+"""
+实时推送扇出压测：N 个在线用户各自订阅自己的房间，对比"推送"与"轮询"两种方式的服务端开销
+
+用法：python bench_realtime_fanout.py [在线用户数] [轮询间隔秒]   默认 5000 2
+使用 Flask-SocketIO 自带的测试客户端在进程内建立连接，测的是服务端分发（房间查找 + 编码 + 投递）的耗时，
+不含网络传输；临时 SQLite 数据库。
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from app import app
+from db import db
+from models.chat_session import ChatSession
+from services.realtime import publish_queue_changed, publish_service_reply, socketio
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    poll_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+    # 每个模拟用户一条会话密钥（相当于各自先调用过一次聊天接口），连接时凭它加入自己的房间
+    now = int(time.time())
+    tokens = [f"bench-token-{i}" for i in range(users)]
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(ChatSession), [
+            {"user_id": f"u{i}", "token": tokens[i], "created_at": now, "expires_at": now + 3600}
+            for i in range(users)
+        ])
+        db.session.commit()
+
+    start = time.perf_counter()
+    clients = [socketio.test_client(app, auth={"user_id": f"u{i}", "chat_token": tokens[i]}) for i in range(users)]
+    if not all(c.is_connected() for c in clients):
+        raise RuntimeError("部分模拟用户未能建立连接")
+    connect_s = time.perf_counter() - start
+    print(f"在线用户={users} 建立连接耗时={connect_s:.2f}s（{users / connect_s:.0f} 连接/秒）")
+
+    # 每个用户收到一条人工客服回复（逐个房间定向推送）
+    record = {"id": 0, "role": "service", "content": "您好，我是人工客服，请问有什么可以帮您？", "time": ""}
+    with app.app_context():
+        start = time.perf_counter()
+        for i in range(users):
+            publish_service_reply(f"u{i}", record)
+        targeted_s = time.perf_counter() - start
+    delivered = sum(len(c.get_received()) for c in clients)
+    print(f"定向推送 {users} 条：{targeted_s * 1000:.0f}ms，平均 {targeted_s / users * 1e6:.0f}µs/条，送达={delivered}")
+
+    # 排队变化：客服房间 + 排队中的用户
+    client = app.test_client()
+    for i in range(10):
+        client.post("/api/transfer_service", json={"user_id": f"u{i}", "chat_token": tokens[i]})
+    with app.app_context():
+        start = time.perf_counter()
+        rounds = 200
+        for _ in range(rounds):
+            publish_queue_changed()
+        queue_s = time.perf_counter() - start
+    print(f"排队变化推送：{queue_s / rounds * 1000:.2f}ms/次（含一次排队查询）")
+
+    # 对比：所有用户每 poll_interval 秒轮询一次 /api/get_queue
+    sample = min(users, 2000)
+    start = time.perf_counter()
+    for _ in range(sample):
+        client.get("/api/get_queue")
+    poll_s = (time.perf_counter() - start) / sample
+    print(f"轮询 /api/get_queue：{poll_s * 1000:.2f}ms/次，{users} 人每 {poll_interval:g}s 轮询一次 "
+          f"= {users / poll_interval:.0f} 请求/秒，约占 {users / poll_interval * poll_s:.1f} 个 CPU 核")
+
+    for c in clients:
+        c.disconnect()
+
+
+if __name__ == "__main__":
+    main()
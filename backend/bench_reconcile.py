@@ -0,0 +1,114 @@
+"""
+订单金额对账压测：百万级历史订单（每单 3 行明细，其中少量订单人为制造偏差），
+统计一遍对账的耗时，并与逐个订单加载明细在 Python 中求和的做法对比；
+另外对比订单明细序列化时整数分（cents / 100）与 Decimal 格式化的开销
+
+用法：python bench_reconcile.py [订单数] [偏差订单数]   默认 1000000 1000
+默认使用临时 SQLite 数据库；设置 SQLALCHEMY_DATABASE_URI 可指向 MySQL 测试库（会重建表，切勿指向业务库）。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from app import app
+from db import db
+from models.order import Order
+from models.order_item import OrderItem
+from models.user import User
+from services.order_reconciliation import reconcile_orders
+
+ITEMS_PER_ORDER = 3
+SEED_BATCH = 20000
+NAIVE_SAMPLE = 20000
+
+
+def _seed(orders, drifted):
+    now = int(time.time())
+    db.session.execute(User.__table__.insert(), [
+        {"id": 1, "username": "bench", "password_hash": "-", "is_admin": False, "created_at": now}
+    ])
+    bad = set(random.sample(range(1, orders + 1), drifted))
+    for start in range(1, orders + 1, SEED_BATCH):
+        order_rows, item_rows = [], []
+        for order_id in range(start, min(start + SEED_BATCH, orders + 1)):
+            total = 0
+            for n in range(ITEMS_PER_ORDER):
+                price = random.randint(100, 20000)
+                quantity = random.randint(1, 3)
+                item_rows.append({
+                    "order_id": order_id, "product_id": n + 1, "product_name": "商品",
+                    "product_price_cents": price, "quantity": quantity, "subtotal_cents": price * quantity,
+                })
+                total += price * quantity
+            if order_id in bad:
+                total += random.choice((-1, 1)) * random.randint(1, 5)
+            order_rows.append({
+                "id": order_id, "user_id": 1, "recipient": "r", "phone": "p", "address": "a",
+                "total_cents": total, "status": "paid", "created_at": now,
+            })
+        db.session.execute(Order.__table__.insert(), order_rows)
+        db.session.execute(OrderItem.__table__.insert(), item_rows)
+        db.session.commit()
+    return bad
+
+
+def _naive(limit):
+    """对照：逐个订单加载明细，在 Python 中求和比较"""
+    drifted = 0
+    for order in Order.query.filter(Order.id <= limit).order_by(Order.id.asc()).yield_per(1000):
+        items = OrderItem.query.filter_by(order_id=order.id).all()
+        if sum(i.subtotal_cents for i in items) != order.total_cents:
+            drifted += 1
+    db.session.rollback()
+    return drifted
+
+
+def _serialize(rows):
+    start = time.perf_counter()
+    for price, subtotal in rows:
+        {"product_price": price / 100, "subtotal": subtotal / 100}
+    cents_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for price, subtotal in rows:
+        {"product_price": str(Decimal(price).scaleb(-2)), "subtotal": str(Decimal(subtotal).scaleb(-2))}
+    decimal_ms = (time.perf_counter() - start) * 1000
+    return cents_ms, decimal_ms
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    drifted = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        bad = _seed(orders, min(drifted, orders))
+        print(f"订单={orders} 明细={orders * ITEMS_PER_ORDER} 偏差订单={len(bad)} 初始化耗时={time.perf_counter() - start:.1f}s")
+
+        report = reconcile_orders()
+        found = {s["order_id"] for s in reconcile_orders(samples=len(bad))["samples"]}
+        print(f"对账：核对 {report['checked_orders']} 个订单，发现 {report['drifted_orders']} 个偏差，"
+              f"偏差合计 {report['drift_amount']} 元，耗时 {report['duration_ms'] / 1000:.2f}s")
+        print(f"结果: {'与注入的偏差一致' if found == bad else '与注入的偏差不一致'}")
+
+        limit = min(NAIVE_SAMPLE, orders)
+        start = time.perf_counter()
+        _naive(limit)
+        naive_s = time.perf_counter() - start
+        print(f"对照（逐单加载明细）：{limit} 个订单耗时 {naive_s:.2f}s，推算 {orders} 个订单约 {naive_s * orders / limit:.0f}s")
+
+        rows = db.session.query(OrderItem.product_price_cents, OrderItem.subtotal_cents).limit(300000).all()
+        cents_ms, decimal_ms = _serialize(rows)
+        print(f"序列化 {len(rows)} 行明细金额：整数分 {cents_ms:.0f}ms，Decimal {decimal_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
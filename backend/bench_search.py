@@ -0,0 +1,84 @@
+"""
+商品关键词搜索基准测试：对比 LIKE 全表扫描与倒排索引的 p50/p99 延迟
+
+用法：python bench_search.py [规模1,规模2,...]   默认 10000,100000,1000000
+使用临时 SQLite 数据库，不影响业务库。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from sqlalchemy import or_
+
+from app import app
+from db import db
+from models.product import Product
+from services.search_service import rebuild_index, search_products
+
+WORDS = ["notebook", "pen", "backpack", "usb", "cable", "shirt", "jacket", "watch", "mug", "lamp"]
+CJK_WORDS = ["笔记本", "文创", "零食", "校园", "耳机", "充电宝", "台灯", "水杯", "卫衣", "书包"]
+QUERIES = ["notebook", "usb cable", "校园文创", "充电宝", "书包", "lamp 台灯", "零食", "watch"]
+ROUNDS = 50
+
+
+def _percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def _seed(n):
+    rng = random.Random(42)
+    db.drop_all()
+    db.create_all()
+    batch = []
+    for i in range(n):
+        name = f"{rng.choice(CJK_WORDS)} {rng.choice(WORDS)} {i}"
+        description = " ".join(rng.choice(WORDS + CJK_WORDS) for _ in range(8))
+        batch.append({"name": name, "description": description, "price_cents": 990, "stock": 100})
+        if len(batch) >= 10000:
+            db.session.execute(Product.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Product.__table__.insert(), batch)
+    db.session.commit()
+
+
+def _like_search(keyword):
+    like = f"%{keyword}%"
+    query = Product.query.filter(or_(Product.name.ilike(like), Product.description.ilike(like)))
+    total = query.count()
+    query.order_by(Product.id.desc()).limit(10).all()
+    return total
+
+
+def _measure(fn):
+    samples = []
+    for _ in range(ROUNDS):
+        for q in QUERIES:
+            start = time.perf_counter()
+            fn(q)
+            samples.append((time.perf_counter() - start) * 1000)
+    return _percentile(samples, 50), _percentile(samples, 99)
+
+
+def main():
+    sizes = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(",")]
+    with app.app_context():
+        for n in sizes:
+            _seed(n)
+            start = time.perf_counter()
+            rebuild_index()
+            build_ms = (time.perf_counter() - start) * 1000
+
+            like_p50, like_p99 = _measure(_like_search)
+            idx_p50, idx_p99 = _measure(lambda q: search_products(q, limit=10))
+            print(f"n={n:>8}  LIKE p50={like_p50:8.2f}ms p99={like_p99:8.2f}ms  "
+                  f"索引 p50={idx_p50:8.2f}ms p99={idx_p99:8.2f}ms  (建索引 {build_ms:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
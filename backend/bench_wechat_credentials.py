@@ -0,0 +1,110 @@
+"""
+微信凭证刷新压测：多个工作进程 × 多个线程同时在凭证过期时调用 jsapi 签名，统计实际调用微信接口的次数
+
+用法：python bench_wechat_credentials.py [进程数] [每进程线程数] [接口耗时ms]   默认 4 16 300
+在本进程内启动 fake_wechat_server.py，临时 SQLite 数据库；对比旧实现（每个进程各自缓存、无并发控制）。
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fake_wechat_server
+
+processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+latency_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+
+_server, fake_wechat, _wechat_base = fake_wechat_server.start_in_background(token_latency=latency_ms / 1000)
+os.environ["WECHAT_API_BASE"] = _wechat_base
+os.environ["WECHAT_CREDENTIAL_REFRESH_INTERVAL"] = "0"
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from app import app
+from db import db
+
+
+class LegacyCredentials:
+    """旧实现：进程内全局变量 + 过期判断，过期瞬间的并发请求都会去调用微信接口"""
+
+    def __init__(self):
+        self.access_token = None
+        self.access_token_expires = 0
+        self.jsapi_ticket = None
+        self.jsapi_ticket_expires = 0
+
+    def get_access_token(self):
+        if self.access_token and time.time() < self.access_token_expires:
+            return self.access_token
+        result = requests.get(f"{_wechat_base}/cgi-bin/token?grant_type=client_credential", timeout=5).json()
+        self.access_token = result["access_token"]
+        self.access_token_expires = time.time() + 7100
+        return self.access_token
+
+    def get_jsapi_ticket(self):
+        if self.jsapi_ticket and time.time() < self.jsapi_ticket_expires:
+            return self.jsapi_ticket
+        token = self.get_access_token()
+        result = requests.get(f"{_wechat_base}/cgi-bin/ticket/getticket?access_token={token}&type=jsapi", timeout=5).json()
+        if result.get("errcode") != 0:
+            return None
+        self.jsapi_ticket = result["ticket"]
+        self.jsapi_ticket_expires = time.time() + 7100
+        return self.jsapi_ticket
+
+
+def _worker(mode, start_at, results):
+    if mode == "legacy":
+        get_ticket = LegacyCredentials().get_jsapi_ticket
+    else:
+        from services.wechat_service import get_jsapi_ticket
+
+        def get_ticket():
+            with app.app_context():
+                return get_jsapi_ticket()
+
+    time.sleep(max(0.0, start_at - time.time()))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        tickets = list(pool.map(lambda _: get_ticket(), range(threads)))
+    results.put((sum(1 for t in tickets if t), time.perf_counter() - started))
+
+
+def _run(mode):
+    with fake_wechat.lock:
+        fake_wechat.token_requests = 0
+        fake_wechat.ticket_requests = 0
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    start_at = time.time() + 1
+    workers = [ctx.Process(target=_worker, args=(mode, start_at, results)) for _ in range(processes)]
+    for w in workers:
+        w.start()
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for w in workers:
+        w.join()
+    ok = sum(n for n, _ in outcomes)
+    slowest = max(s for _, s in outcomes)
+    print(f"{mode:<6} 成功={ok}/{processes * threads} 调用 token 接口={fake_wechat.token_requests} "
+          f"调用 ticket 接口={fake_wechat.ticket_requests} 最慢进程耗时={slowest * 1000:.0f}ms")
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()  # 子进程 fork 后各自建立连接
+    print(f"{processes} 进程 × {threads} 线程，微信接口耗时 {latency_ms}ms")
+    _run("legacy")
+    _run("shared")
+    # 共享凭证已写入数据库：新启动的进程直接读取，不再调用微信接口
+    _run("shared")
+
+
+if __name__ == "__main__":
+    main()
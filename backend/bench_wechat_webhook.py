@@ -0,0 +1,74 @@
+"""
+微信 webhook 压测：AI 回复很慢时，webhook 是否都在 5 秒内返回、微信重试是否被去重、回复是否都通过客服消息送达
+
+用法：python bench_wechat_webhook.py [消息数] [AI 耗时ms] [每条消息的重试次数]   默认 20 6000 2
+在本进程内启动 fake_llm_server.py 和 fake_wechat_server.py，临时 SQLite 数据库。
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_llm_server
+import fake_wechat_server
+
+messages_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+ai_latency_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 6000
+retries = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+_llm, _llm_url = fake_llm_server.start_in_background(first_token_ms=ai_latency_ms, chunk_interval_ms=0)
+_wechat, fake_wechat, _wechat_base = fake_wechat_server.start_in_background()
+os.environ["VOLC_API_URL"] = _llm_url
+os.environ["WECHAT_API_BASE"] = _wechat_base
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db") + "?timeout=30"
+)
+
+from app import app
+from db import db
+
+_XML = """<xml><ToUserName><![CDATA[gh_bench]]></ToUserName><FromUserName><![CDATA[{user}]]></FromUserName>
+<CreateTime>{ts}</CreateTime><MsgType><![CDATA[text]]></MsgType><Content><![CDATA[{content}]]></Content>
+<MsgId>{msg_id}</MsgId></xml>"""
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    ts = int(time.time())
+    deliveries = [
+        (f"user-{i}", _XML.format(user=f"user-{i}", ts=ts, content=f"慢问题{i}", msg_id=10000 + i).encode("utf-8"))
+        for i in range(messages_count)
+    ]
+    # 每条消息发送 1 + retries 次，模拟微信超时重试
+    posts = [body for _, body in deliveries for _ in range(1 + retries)]
+
+    def _post(body):
+        start = time.perf_counter()
+        res = client.post("/api/wechat", data=body, content_type="text/xml")
+        return (time.perf_counter() - start) * 1000, res.get_data(as_text=True)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(_post, posts))
+    latencies = sorted(ms for ms, _ in results)
+    print(f"webhook 请求={len(posts)}（{messages_count} 条消息 × {1 + retries} 次）AI 耗时={ai_latency_ms}ms")
+    print(f"webhook 响应 p50={statistics.median(latencies):.1f}ms p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}ms "
+          f"max={latencies[-1]:.1f}ms 超过5秒={sum(1 for ms in latencies if ms >= 5000)}")
+
+    deadline = time.time() + ai_latency_ms / 1000 * (messages_count / 4 + 2) + 10
+    while time.time() < deadline and len(fake_wechat.messages) < messages_count:
+        time.sleep(0.2)
+    time.sleep(1)  # 等待可能的重复发送
+
+    users = [openid for _, openid, _ in fake_wechat.messages]
+    delay = [t - start for t, _, _ in fake_wechat.messages]
+    print(f"客服消息送达={len(users)}/{messages_count} 重复送达={len(users) - len(set(users))}"
+          + (f" 送达耗时 p50={statistics.median(delay):.1f}s max={max(delay):.1f}s" if delay else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+微信 XML 编解码微基准：解析 + 渲染一条文本消息的吞吐，对比旧实现（ElementTree + 带缩进的 str.format 模板）
+
+用法：python bench_wechat_xml.py [次数]   默认 100000
+"""
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from services.wechat_codec import generate_reply_xml, parse_xml
+
+_MESSAGE = (
+    "<xml><ToUserName><![CDATA[gh_0123456789ab]]></ToUserName>"
+    "<FromUserName><![CDATA[oABCDEFGHIJKLMNOPQRSTUVWXYZ]]></FromUserName>"
+    "<CreateTime>1700000000</CreateTime><MsgType><![CDATA[text]]></MsgType>"
+    "<Content><![CDATA[请问满多少包邮？自提点在哪里]]></Content><MsgId>24123456789012345</MsgId></xml>"
+).encode("utf-8")
+_REPLY = "满99元全国包邮，不满的话运费8元哦～校园自提点在XX教学楼1楼。"
+
+_BOMB = b"""<?xml version="1.0"?><!DOCTYPE lolz [<!ENTITY lol "lol">
+<!ENTITY lol2 "&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;">
+<!ENTITY lol3 "&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;">]>
+<xml><Content>&lol3;</Content></xml>"""
+
+
+def legacy_parse_xml(xml_data):
+    root = ET.fromstring(xml_data)
+    return {child.tag: child.text for child in root}
+
+
+def legacy_generate_reply_xml(msg, reply_content):
+    xml_template = """
+    <xml>
+        <ToUserName><![CDATA[{to_user}]]></ToUserName>
+        <FromUserName><![CDATA[{from_user}]]></FromUserName>
+        <CreateTime>{create_time}</CreateTime>
+        <MsgType><![CDATA[text]]></MsgType>
+        <Content><![CDATA[{content}]]></Content>
+    </xml>
+    """
+    return xml_template.format(
+        to_user=msg["FromUserName"], from_user=msg["ToUserName"],
+        create_time=str(int(time.time())), content=reply_content,
+    )
+
+
+def _bench(name, parse, render, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        render(parse(_MESSAGE), _REPLY)
+    elapsed = time.perf_counter() - start
+    size = len(render(parse(_MESSAGE), _REPLY).encode("utf-8"))
+    print(f"{name:<8} {rounds / elapsed:>10,.0f} 条/秒  {elapsed / rounds * 1e6:6.1f}µs/条  回复 {size} 字节")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    _bench("旧实现", legacy_parse_xml, legacy_generate_reply_xml, rounds)
+    _bench("新实现", parse_xml, generate_reply_xml, rounds)
+
+    tricky = "代码片段：a[b[0]]>1"
+    rendered = generate_reply_xml(parse_xml(_MESSAGE), tricky)
+    print(f"回复含 ]]>：旧实现可解析={_parses(legacy_generate_reply_xml(parse_xml(_MESSAGE), tricky))} "
+          f"新实现还原={legacy_parse_xml(rendered)['Content'] == tricky}")
+
+    start = time.perf_counter()
+    try:
+        parse_xml(_BOMB)
+        print("XML 炸弹：未拒绝")
+    except ValueError as e:
+        print(f"XML 炸弹：已拒绝（{e}），耗时 {(time.perf_counter() - start) * 1e6:.0f}µs")
+
+
+def _parses(xml_text):
+    try:
+        ET.fromstring(xml_text)
+        return True
+    except ET.ParseError:
+        return False
+
+
+if __name__ == "__main__":
+    main()
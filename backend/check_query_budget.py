@@ -0,0 +1,106 @@
+"""
+列表接口 SQL 条数检查：每个列表接口的查询条数必须不超过固定预算，且与每页条数无关（防止 N+1 回归）
+
+用法：python check_query_budget.py
+使用临时 SQLite 数据库，不影响业务库；超出预算时以非零状态码退出。
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "budget.db")
+
+from sqlalchemy import event
+
+from app import app
+from db import db
+from models.category import Category
+from models.order import Order
+from models.order_item import OrderItem
+from models.product import Product
+from models.user import User
+from services.catalog_cache import catalog_cache
+
+# 每个接口允许的最大 SQL 条数（登录后 token 身份已缓存，鉴权不产生查询）
+QUERY_BUDGET = {
+    "/api/products": 3,
+    "/api/products?cursor=": 2,
+    "/api/products?keyword=book": 2,
+    "/api/categories/books/products": 3,
+    "/api/orders": 2,
+    "/api/admin/products": 3,
+    "/api/admin/orders": 3,
+    "/api/admin/orders?cursor=": 2,
+    "/api/admin/users": 2,
+}
+PAGE_SIZES = (5, 200)
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _before_execute)
+
+
+def _seed():
+    db.create_all()
+    admin = User(username="admin", is_admin=True)
+    admin.set_password("admin")
+    db.session.add(admin)
+    categories = [Category(name=name) for name in ("books", "food", "bags")]
+    db.session.add_all(categories)
+    db.session.flush()
+
+    products = [
+        Product(name=f"book {i}", description="校园文创", price_cents=1000, stock=100, category_id=categories[i % 3].id)
+        for i in range(300)
+    ]
+    db.session.add_all(products)
+    db.session.flush()
+
+    for i in range(300):
+        order = Order(user_id=admin.id, recipient="r", phone="p", address="a", total_cents=2000)
+        order.items = [
+            OrderItem(product_id=products[i].id, product_name="book", product_price_cents=1000, quantity=1, subtotal_cents=1000),
+            OrderItem(product_id=products[-i].id, product_name="book", product_price_cents=1000, quantity=1, subtotal_cents=1000),
+        ]
+        db.session.add(order)
+    db.session.commit()
+
+
+def main():
+    client = app.test_client()
+    with app.app_context():
+        _seed()
+        token = client.post("/api/login", json={"username": "admin", "password": "admin"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    failed = False
+    for url, budget in QUERY_BUDGET.items():
+        counts = []
+        client.get(url, headers=headers)  # 预热（如首次构建搜索索引），不计入统计
+        for per_page in PAGE_SIZES:
+            sep = "&" if "?" in url else "?"
+            catalog_cache.clear()  # 商品目录接口有读穿缓存，清空后测的是查库加载的路径
+            with app.app_context(), count_queries() as statements:
+                resp = client.get(f"{url}{sep}per_page={per_page}", headers=headers)
+            assert resp.status_code == 200, (url, resp.status_code)
+            counts.append(len(statements))
+        ok = max(counts) <= budget and len(set(counts)) == 1
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {url:<34} 查询条数={counts} 预算={budget}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,15 @@ import os
 WECHAT_TOKEN = "your_wechat_token"  # 微信公众平台设置的Token
 APPID = "your_appid"  # 公众号后台复制
 APPSECRET = "your_appsecret"  # 公众号后台复制
+WECHAT_API_BASE = os.getenv("WECHAT_API_BASE", "https://api.weixin.qq.com")  # 微信接口地址（本地调试可指向 fake_wechat_server.py）
+
+# 微信消息异步处理：微信 5 秒内收不到响应会重试，慢的 AI 回复改为后台生成后通过客服消息接口发送
+WECHAT_ASYNC_MAX_PENDING = int(os.getenv("WECHAT_ASYNC_MAX_PENDING", "200"))  # 后台待处理的消息上限，超出时直接回复稍后再试
+WECHAT_DEDUP_TTL = 3600  # 按 MsgId 去重的记录保存时间（秒），微信重试都在 15 秒内
+WECHAT_DEDUP_PRUNE_INTERVAL = int(os.getenv("WECHAT_DEDUP_PRUNE_INTERVAL", "600"))  # 清理过期去重记录的间隔（秒），0 表示不启动
+WECHAT_CREDENTIAL_REFRESH_MARGIN = int(os.getenv("WECHAT_CREDENTIAL_REFRESH_MARGIN", "300"))  # access_token/jsapi_ticket 剩余有效期低于该值（秒）时提前刷新
+WECHAT_CREDENTIAL_LEASE = 10  # 刷新凭证的租约时长（秒），同一时间只有一个进程调用微信接口
+WECHAT_CREDENTIAL_REFRESH_INTERVAL = int(os.getenv("WECHAT_CREDENTIAL_REFRESH_INTERVAL", "60"))  # 后台检查凭证是否需要提前刷新的间隔（秒），0 表示不启动
 
 # ---------------------- AI服务配置 ----------------------
 # 方案1：TRAE IDE 内置 AI 服务（无需外部配置，推荐）
@@ -34,17 +43,101 @@ TRAE_API_URL = "https://api.traecn.com/v1/chat/completions"  # TraeCN API地址
 # 选择使用的AI服务方案（1:TRAE IDE内置, 2:火山方舟, 3:TraeCN）
 AI_SERVICE_SCHEME = 2
 
+# AI 调用连接池/限流/熔断
+AI_HTTP_POOL_SIZE = 10  # 每个服务商保持的 keep-alive 连接数
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))  # 每个服务商同时进行的请求上限
+AI_QUEUE_TIMEOUT = 0.5  # 并发已满时最多等待的秒数，超时直接走备用回复
+AI_CONNECT_TIMEOUT = 3  # 连接超时（秒）
+AI_READ_TIMEOUT = 8  # 读取超时（秒）
+AI_CIRCUIT_FAILURE_THRESHOLD = 5  # 连续失败多少次后熔断
+AI_CIRCUIT_RESET_TIMEOUT = 30  # 熔断持续时间（秒），到期后放行一个试探请求
+AI_ASYNC_WORKERS = int(os.getenv("AI_ASYNC_WORKERS", "8"))  # 异步模式下执行 AI 调用的线程数
+
+# 多轮上下文：system 提示词 + 最近的会话记录 + 当前问题，按估算 token 数裁剪历史
+AI_CONTEXT_TOKEN_BUDGET = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", "1200"))  # 单次请求 prompt 的 token 上限（含 system 提示词）
+AI_CONTEXT_MAX_MESSAGES = 10  # 最多带上的历史消息条数
+AI_MAX_REPLY_TOKENS = 200  # 回复的 max_tokens
+
+# AI 回复缓存（按归一化后的问题 + 服务方案/模型缓存，重复问题不再调用付费接口）
+AI_REPLY_CACHE_TTL = int(os.getenv("AI_REPLY_CACHE_TTL", "3600"))  # 缓存时间（秒）
+AI_REPLY_CACHE_MAX_ENTRIES = int(os.getenv("AI_REPLY_CACHE_MAX_ENTRIES", "5000"))  # 最多缓存的问题数
+
+# 问答库（faq_entries 表）：各进程后台轮询增量变更并重建匹配自动机
+FAQ_REFRESH_INTERVAL = int(os.getenv("FAQ_REFRESH_INTERVAL", "3"))  # 轮询间隔（秒）
+
 # ---------------------- 系统配置 ----------------------
 DEBUG = True  # 开发模式，生产环境请设置为False
 HOST = "0.0.0.0"  # 监听地址
 PORT = 8000  # 服务端口
 
 # ---------------------- 消息记录配置 ----------------------
-MESSAGE_LOG_FILE = "wechat_messages.json"  # 消息记录文件路径
+MESSAGE_LOG_FILE = "wechat_messages.json"  # 旧版消息记录文件，启动时导入数据库 wechat_messages 表
+
+# ---------------------- 消息中心配置 ----------------------
+NOTIFICATION_PAGE_SIZE = 20  # 消息列表默认每页条数
+NOTIFICATION_CAMPAIGN_CACHE_TTL = int(os.getenv("NOTIFICATION_CAMPAIGN_CACHE_TTL", "30"))  # 进程内缓存有效活动列表的时间（秒），其他进程发布的活动最迟在该时间后可见
+
+# ---------------------- 商品搜索配置 ----------------------
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "1") != "0"  # 关闭后关键词搜索回退到 LIKE 查询
+SEARCH_INDEX_MAX_AGE = int(os.getenv("SEARCH_INDEX_MAX_AGE", "300"))  # 后台全量重建索引的间隔（秒），用于同步其他进程的修改；首次构建完成前搜索走 LIKE 查询
+
+# ---------------------- 商品目录缓存配置 ----------------------
+# 分类列表、商品详情、分类商品列表按版本号缓存序列化好的响应；后台修改时递增版本号，各进程轮询版本号后失效
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "5000"))  # 每个进程最多缓存的响应数
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "60"))  # 缓存时间（秒）；下单扣减的库存不递增版本号，详情中的库存最多滞后这么久
+CATALOG_VERSION_REFRESH_INTERVAL = int(os.getenv("CATALOG_VERSION_REFRESH_INTERVAL", "2"))  # 轮询其他进程写入的版本号的间隔（秒），0 表示不启动
+CATALOG_CACHE_REDIS_URL = os.getenv("CATALOG_CACHE_REDIS_URL", "")  # 可选：多进程共享缓存，填 redis://host:6379/1（需 pip install redis）
+
+# ---------------------- 分页配置 ----------------------
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "30"))  # 游标分页下总数缓存时间（秒）
+COUNT_CACHE_MAX_ENTRIES = 1024  # 总数缓存最多保存的筛选条件数
+
+# ---------------------- 鉴权配置 ----------------------
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))  # token 身份缓存时间（秒）
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))  # 每个进程最多缓存的 token 数
+AUTH_REVOCATION_REFRESH_INTERVAL = int(os.getenv("AUTH_REVOCATION_REFRESH_INTERVAL", "2"))  # 轮询其他进程写入的身份失效记录的间隔（秒），0 表示不启动（此时最多 AUTH_CACHE_TTL 后失效）
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", str(7 * 24 * 3600)))  # 登录 token 有效期（秒）
+MAX_TOKENS_PER_USER = int(os.getenv("MAX_TOKENS_PER_USER", "10"))  # 每个用户最多同时有效的 token 数，超出时淘汰最早的
+TOKEN_PRUNE_INTERVAL = int(os.getenv("TOKEN_PRUNE_INTERVAL", "600"))  # 后台清理过期 token 的间隔（秒），0 表示不启动
+TOKEN_PRUNE_BATCH_SIZE = 1000  # 每批删除的过期 token 行数，分批提交避免长事务锁表
+
+# ---------------------- 下单幂等配置 ----------------------
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))  # Idempotency-Key 保存时间（秒），期间重试直接重放首次响应
+IDEMPOTENCY_PENDING_TIMEOUT = 30  # 首个请求超过该时间仍未完成（如进程崩溃）时，允许重试重新执行
+IDEMPOTENCY_PRUNE_INTERVAL = int(os.getenv("IDEMPOTENCY_PRUNE_INTERVAL", "600"))  # 清理过期记录的间隔（秒），0 表示不启动
+
+# ---------------------- 购物车配置 ----------------------
+CART_MAX_ITEMS = 100  # 购物车最多的商品种类数
+CART_MAX_QUANTITY = 99  # 单个商品的最大数量
+CART_GUEST_TTL = int(os.getenv("CART_GUEST_TTL", str(30 * 24 * 3600)))  # 未登录购物车的保存时间（秒），超过后由后台清理
+CART_PRUNE_INTERVAL = int(os.getenv("CART_PRUNE_INTERVAL", "3600"))  # 清理过期未登录购物车的间隔（秒），0 表示不启动
+
+# ---------------------- 订单事件配置 ----------------------
+ORDER_EVENT_POLL_INTERVAL = float(os.getenv("ORDER_EVENT_POLL_INTERVAL", "1"))  # 后台分发订单事件的轮询间隔（秒），0 表示不启动
+ORDER_EVENT_BATCH_SIZE = 200  # 每批分发给订阅方的事件数
+ORDER_EVENT_LEASE = 30  # 持久订阅方的分发租约（秒），持有租约的进程崩溃后由其他进程接管
+ORDER_EVENT_GAP_TIMEOUT = 5  # 事件 id 出现空洞时最多等待的秒数（可能是尚未提交的事务），超时视为已回滚
+ORDER_EVENT_RETENTION = int(os.getenv("ORDER_EVENT_RETENTION", str(7 * 24 * 3600)))  # 已被所有持久订阅方处理的事件保留时间（秒），期间可重放
+ORDER_EVENT_PRUNE_INTERVAL = int(os.getenv("ORDER_EVENT_PRUNE_INTERVAL", "3600"))  # 清理过期事件的间隔（秒），0 表示不启动
+ORDER_RECONCILE_INTERVAL = int(os.getenv("ORDER_RECONCILE_INTERVAL", "0"))  # 订单金额对账的间隔（秒），0 表示不在服务进程中运行（用 cron 调用 reconcile_orders.py）
+ORDER_RECONCILE_CHUNK = 50000  # 对账时每条聚合查询覆盖的订单 id 范围
 
 # ---------------------- 人工客服配置 ----------------------
 SERVICE_STATUS = "online"  # 客服状态: online/offline
-MAX_QUEUE_LENGTH = 10  # 最大排队人数
+MAX_QUEUE_LENGTH = int(os.getenv("MAX_QUEUE_LENGTH", "10"))  # 最大排队人数，排满后拒绝新的转接
+SERVICE_QUEUE_BACKEND = os.getenv("SERVICE_QUEUE_BACKEND", "db")  # db：service_queue 表，多进程共享；memory：进程内（单进程调试用）
+
+# ---------------------- 实时推送配置 ----------------------
+# 排队变化、人工客服回复通过 WebSocket（Flask-SocketIO）推送，前端不必再轮询
+SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")  # threading；长连接很多时用 eventlet（需 pip install eventlet）
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")  # 多进程部署时填 redis://host:6379/0，各进程经它转发推送（需 pip install redis）
+
+# ---------------------- 会话记录配置 ----------------------
+# 全部消息写入 chat_messages 表；每个进程只在内存中保留每个用户最近的若干条
+CHAT_BUFFER_SIZE = int(os.getenv("CHAT_BUFFER_SIZE", "50"))  # 每个用户在内存中保留的最近消息条数
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "5000"))  # 每个进程最多缓存的会话数，超出时淘汰最久未访问的
+CHAT_RESPONSE_HISTORY = 20  # /api/ai_chat 默认随回复返回的最近消息条数
+CHAT_SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", str(24 * 3600)))  # 匿名会话密钥（chat_token）的有效期（秒），每次使用后续期
 
 # ---------------------- 数据库配置 ----------------------
 MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1") #数据库地址
@@ -0,0 +1,84 @@
+"""
+本地模拟大模型服务（兼容 Chat Completions 接口，支持 stream），用于没有真实 API Key 时调试/压测智能客服
+
+用法：python fake_llm_server.py [端口] [首字延迟ms] [分片间隔ms]   默认 9100 300 30
+启动后设置 VOLC_API_URL=http://127.0.0.1:9100/v1/chat/completions 再启动后端。
+非流式请求等到整段回复"生成完"（首字延迟 + 分片数 × 分片间隔）才返回，与真实服务的耗时一致。
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "同学你好～满99元全国包邮，校园自提点工作日10:00-21:00可取货，有问题随时问我哦！"
+
+
+def make_server(port=0, first_token_ms=300, chunk_interval_ms=30, reply=DEFAULT_REPLY, chunk_chars=2):
+    chunks = [reply[i:i + chunk_chars] for i in range(0, len(reply), chunk_chars)]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages") or [])
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply),
+                     "total_tokens": prompt_tokens + len(reply)}
+
+            if not body.get("stream"):
+                time.sleep((first_token_ms + chunk_interval_ms * (len(chunks) - 1)) / 1000)
+                data = json.dumps({
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}}],
+                    "usage": usage,
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(payload):
+                line = f"data: {payload}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            try:
+                time.sleep(first_token_ms / 1000)
+                for i, piece in enumerate(chunks):
+                    if i:
+                        time.sleep(chunk_interval_ms / 1000)
+                    send(json.dumps({"choices": [{"index": 0, "delta": {"content": piece}}]}, ensure_ascii=False))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    send(json.dumps({"choices": [], "usage": usage}))
+                send("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # 调用方中途断开
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+def start_in_background(**kwargs):
+    """在后台线程启动，返回 (server, api_url)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9100
+    first_token_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    chunk_interval_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    server = make_server(port, first_token_ms, chunk_interval_ms)
+    print(f"模拟大模型服务已启动：http://127.0.0.1:{port}/v1/chat/completions")
+    server.serve_forever()
@@ -0,0 +1,102 @@
+"""
+本地模拟微信公众平台接口（access_token、jsapi_ticket、客服消息），记录收到的客服消息，用于调试/压测异步回复
+
+用法：python fake_wechat_server.py [端口]   默认 9200
+启动后设置 WECHAT_API_BASE=http://127.0.0.1:9200 再启动后端。
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeWechat:
+    """模拟服务的状态：已签发的 token 和收到的客服消息"""
+
+    def __init__(self, token_latency=0.0):
+        self.lock = threading.Lock()
+        self.token_latency = token_latency  # 签发 token/ticket 的模拟耗时（秒），用于复现并发刷新
+        self.token_version = 0
+        self.token_requests = 0
+        self.ticket_requests = 0
+        self.messages = []  # [(收到时间, openid, content)]
+
+    def issue_token(self):
+        time.sleep(self.token_latency)
+        with self.lock:
+            self.token_version += 1
+            self.token_requests += 1
+            return f"fake-token-{self.token_version}"
+
+    def expire_token(self):
+        """让当前 token 失效（下一次客服消息返回 40001），用于验证重新获取 token"""
+        with self.lock:
+            self.token_version += 1
+
+    def token_valid(self, token):
+        with self.lock:
+            return token == f"fake-token-{self.token_version}"
+
+
+def make_server(port=0, fake=None):
+    fake = fake or FakeWechat()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, data):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/cgi-bin/token":
+                self._send_json({"access_token": fake.issue_token(), "expires_in": 7200})
+            elif url.path == "/cgi-bin/ticket/getticket":
+                time.sleep(fake.token_latency)
+                with fake.lock:
+                    fake.ticket_requests += 1
+                if not fake.token_valid((query.get("access_token") or [""])[0]):
+                    self._send_json({"errcode": 40001, "errmsg": "invalid credential"})
+                else:
+                    self._send_json({"errcode": 0, "errmsg": "ok", "ticket": "fake-ticket", "expires_in": 7200})
+            else:
+                self._send_json({"errcode": 404, "errmsg": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if url.path != "/cgi-bin/message/custom/send":
+                self._send_json({"errcode": 404, "errmsg": "not found"})
+                return
+            if not fake.token_valid((parse_qs(url.query).get("access_token") or [""])[0]):
+                self._send_json({"errcode": 40001, "errmsg": "invalid credential"})
+                return
+            data = json.loads(body or b"{}")
+            with fake.lock:
+                fake.messages.append((time.time(), data.get("touser"), (data.get("text") or {}).get("content")))
+            self._send_json({"errcode": 0, "errmsg": "ok"})
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler), fake
+
+
+def start_in_background(port=0, token_latency=0.0):
+    """在后台线程启动，返回 (server, fake, api_base)"""
+    server, fake = make_server(port, FakeWechat(token_latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9200
+    server, _ = make_server(port)
+    print(f"模拟微信接口已启动：http://127.0.0.1:{port}")
+    server.serve_forever()
@@ -2,10 +2,12 @@ import json
 import sys
 from pathlib import Path
 
-from app import app
+from app import app, migrate_money_columns
 from db import db
 from models.category import Category
 from models.product import Product
+from services.catalog_cache import CATALOG, touch_catalog
+from services.money import to_cents
 from sqlalchemy import inspect
 
 
@@ -43,6 +45,7 @@ def import_products(*, clear_existing: bool = False) -> None:
         raise ValueError("Unsupported JSON format: expected a list under 'products' or 'items'")
 
     with app.app_context():
+        migrate_money_columns()
         db.create_all()
 
         inspector = inspect(db.engine)
@@ -50,7 +53,7 @@ def import_products(*, clear_existing: bool = False) -> None:
             "id",
             "name",
             "description",
-            "price",
+            "price_cents",
             "image",
             "stock",
             "rating",
@@ -100,7 +103,7 @@ def import_products(*, clear_existing: bool = False) -> None:
 
             existing.name = p.get("name")
             existing.description = p.get("description")
-            existing.price = float(p.get("price") or 0)
+            existing.price_cents = to_cents(p.get("price"))
             existing.image = p.get("image")
             existing.stock = int(p.get("stock") or 0)
             existing.rating = float(p.get("rating") or 5.0)
@@ -108,6 +111,8 @@ def import_products(*, clear_existing: bool = False) -> None:
 
             db.session.add(existing)
 
+        # 导入是批量修改，整个目录的缓存失效（服务进程在下次轮询版本号时生效）
+        touch_catalog(CATALOG)
         db.session.commit()
 
 
@@ -0,0 +1,14 @@
+import time
+
+from db import db
+
+
+class AuthRevocation(db.Model):
+    """身份失效记录：注销 token、改密码、权限变更时与修改在同一事务中写入一行，
+    各进程轮询后清掉该用户在本进程缓存的身份，下次请求重新查库"""
+
+    __tablename__ = "auth_revocations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()), index=True)
@@ -1,5 +1,6 @@
 import time
 
+from config import TOKEN_TTL
 from db import db
 
 
@@ -10,10 +11,12 @@ class AuthToken(db.Model):
     token = db.Column(db.String(128), unique=True, nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+    expires_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()) + TOKEN_TTL, index=True)
 
     def to_dict(self) -> dict:
         return {
             "token": self.token,
             "user_id": self.user_id,
             "created_at": self.created_at,
+            "expires_at": self.expires_at,
         }
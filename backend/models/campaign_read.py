@@ -0,0 +1,12 @@
+from db import db
+
+
+class CampaignRead(db.Model):
+    """用户单独标记已读的活动（只记录 id 大于该用户已读水位的活动）"""
+
+    __tablename__ = "campaign_reads"
+    __table_args__ = (db.UniqueConstraint("user_id", "campaign_id", name="uq_campaign_reads_user_campaign"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    campaign_id = db.Column(db.Integer, nullable=False)
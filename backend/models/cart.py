@@ -0,0 +1,16 @@
+import time
+
+from db import db
+
+
+class Cart(db.Model):
+    """购物车：登录用户按 user_id 一车；未登录用户按服务端签发的 guest_token，登录后合并到用户的购物车"""
+
+    __tablename__ = "carts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, unique=True)
+    guest_token = db.Column(db.String(64), nullable=True, unique=True)
+    updated_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()), index=True)
+
+    items = db.relationship("CartItem", back_populates="cart", cascade="all, delete-orphan", lazy=True)
@@ -0,0 +1,18 @@
+import time
+
+from db import db
+
+
+class CartItem(db.Model):
+    __tablename__ = "cart_items"
+    __table_args__ = (db.UniqueConstraint("cart_id", "product_id", name="uq_cart_items_cart_product"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.Integer, db.ForeignKey("carts.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    # 加入购物车时的价格，用于提示降价/涨价；结算一律按商品当前价格
+    added_price_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    added_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+
+    cart = db.relationship("Cart", back_populates="items")
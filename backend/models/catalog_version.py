@@ -0,0 +1,14 @@
+import time
+
+from db import db
+
+
+class CatalogVersion(db.Model):
+    """商品目录缓存的版本号：每个范围（分类列表 / 某个商品 / 某个分类的商品 / 整个目录）一行"""
+
+    __tablename__ = "catalog_versions"
+
+    scope = db.Column(db.String(64), primary_key=True)
+    # 每次修改递增的全局版本号，进程只拉取 version 大于本地已知版本的行
+    version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
@@ -0,0 +1,23 @@
+import time
+
+from db import db
+
+
+class ChatMessage(db.Model):
+    __tablename__ = "chat_messages"
+    # 按用户倒序翻页（WHERE user_id = ? AND id < ?）走 (user_id, id) 联合索引
+    __table_args__ = (db.Index("ix_chat_messages_user_id_id", "user_id", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), nullable=False)
+    role = db.Column(db.String(16), nullable=False)  # user/ai/service
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "role": self.role,
+            "content": self.content,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at)),
+        }
@@ -0,0 +1,15 @@
+import time
+
+from db import db
+
+
+class ChatSession(db.Model):
+    """匿名客服会话的密钥：聊天接口第一次见到某个 user_id 时签发，WebSocket 连接时凭它加入该用户的房间"""
+
+    __tablename__ = "chat_sessions"
+
+    user_id = db.Column(db.String(64), primary_key=True)
+    token = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+    # 每次带着密钥使用聊天接口都会续期；过期后该 user_id 可以重新签发
+    expires_at = db.Column(db.Integer, nullable=False, index=True)
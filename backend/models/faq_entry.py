@@ -0,0 +1,28 @@
+import time
+
+from db import db
+
+
+class FaqEntry(db.Model):
+    __tablename__ = "faq_entries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    keyword = db.Column(db.String(128), unique=True, nullable=False)
+    answer = db.Column(db.Text, nullable=False)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+
+    # 删除为软删除，保证各进程增量刷新时能感知到删除
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False)
+    # 每次写入递增的全局版本号，进程只拉取 version 大于本地快照版本的行
+    version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "keyword": self.keyword,
+            "answer": self.answer,
+            "priority": self.priority,
+            "version": self.version,
+            "updated_at": self.updated_at,
+        }
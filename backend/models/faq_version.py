@@ -0,0 +1,10 @@
+from db import db
+
+
+class FaqVersion(db.Model):
+    """问答版本号计数器（只有一行）：每次修改问答时加 1，分配全局递增、不重复的版本号"""
+
+    __tablename__ = "faq_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,20 @@
+import time
+
+from db import db
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (db.UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    request_path = db.Column(db.String(128), nullable=False)
+
+    # status_code 为空表示首个请求仍在处理中
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+    expires_at = db.Column(db.Integer, nullable=False, index=True)
@@ -0,0 +1,32 @@
+import time
+
+from db import db
+
+
+class Notification(db.Model):
+    """发给单个用户的站内消息（系统/订单）；面向全体用户的活动消息见 NotificationCampaign"""
+
+    __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index("ix_notifications_user_category_id", "user_id", "category", "id"),
+        db.Index("ix_notifications_user_category_read", "user_id", "category", "is_read"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    category = db.Column(db.String(16), nullable=False)
+    title = db.Column(db.String(128), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+    # 由订单事件生成的消息记录事件 id，事件重复投递或回放时据此去重
+    source_event_id = db.Column(db.Integer, nullable=True, unique=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "content": self.content,
+            "createTime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at)),
+            "isRead": bool(self.is_read),
+        }
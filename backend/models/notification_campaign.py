@@ -0,0 +1,27 @@
+import time
+
+from db import db
+
+
+class NotificationCampaign(db.Model):
+    """活动广播：每次活动一行，用户读取时再合并（不为每个用户写一行）"""
+
+    __tablename__ = "notification_campaigns"
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(128), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+    expires_at = db.Column(db.Integer, nullable=True)  # 为空表示不过期
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "content": self.content,
+            "is_active": bool(self.is_active),
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
@@ -0,0 +1,13 @@
+from db import db
+
+
+class NotificationCounter(db.Model):
+    """每个用户的未读计数，写入/标记已读时增减，不需要每次 COUNT"""
+
+    __tablename__ = "notification_counters"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    unread_system = db.Column(db.Integer, nullable=False, default=0)
+    unread_order = db.Column(db.Integer, nullable=False, default=0)
+    # 活动已读水位：id 不大于该值的活动都视为已读（"全部已读" 只需更新这一个字段）
+    campaign_read_upto = db.Column(db.Integer, nullable=False, default=0)
@@ -13,7 +13,7 @@ class Order(db.Model):
     phone = db.Column(db.String(32), nullable=False)
     address = db.Column(db.String(255), nullable=False)
 
-    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)  # 订单明细 subtotal_cents 之和
     status = db.Column(db.String(32), nullable=False, default="pending")
 
     created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
@@ -27,7 +27,7 @@ class Order(db.Model):
             "recipient": self.recipient,
             "phone": self.phone,
             "address": self.address,
-            "total_amount": self.total_amount,
+            "total_amount": self.total_cents / 100,
             "status": self.status,
             "created_at": self.created_at,
         }
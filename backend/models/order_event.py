@@ -0,0 +1,30 @@
+import time
+
+from db import db
+
+
+class OrderEvent(db.Model):
+    """订单事件（outbox）：与订单状态变更在同一事务中写入，由后台分发给各订阅方"""
+
+    __tablename__ = "order_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(32), nullable=False)  # created / paid / status_changed / deleted
+    from_status = db.Column(db.String(32), nullable=True)
+    to_status = db.Column(db.String(32), nullable=True)
+    payload = db.Column(db.Text, nullable=True)  # JSON，事件附带的信息（如商品件数、金额）
+    created_at = db.Column(db.Float, nullable=False, default=time.time, index=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "user_id": self.user_id,
+            "event_type": self.event_type,
+            "from_status": self.from_status,
+            "to_status": self.to_status,
+            "payload": self.payload,
+            "created_at": self.created_at,
+        }
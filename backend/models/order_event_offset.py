@@ -0,0 +1,13 @@
+from db import db
+
+
+class OrderEventOffset(db.Model):
+    """持久订阅方的消费进度：last_id 之前的事件都已处理；lease_until/owner 保证同一时间只有一个进程在分发"""
+
+    __tablename__ = "order_event_offsets"
+
+    consumer = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    owner = db.Column(db.String(128), nullable=True)
+    lease_until = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.Float, nullable=False, default=0)
@@ -9,9 +9,9 @@ class OrderItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False, index=True)
 
     product_name = db.Column(db.String(200), nullable=False)
-    product_price = db.Column(db.Float, nullable=False, default=0.0)
+    product_price_cents = db.Column(db.BigInteger, nullable=False, default=0)
     quantity = db.Column(db.Integer, nullable=False, default=1)
-    subtotal = db.Column(db.Float, nullable=False, default=0.0)
+    subtotal_cents = db.Column(db.BigInteger, nullable=False, default=0)  # product_price_cents * quantity
 
     order = db.relationship("Order", back_populates="items")
 
@@ -21,7 +21,7 @@ class OrderItem(db.Model):
             "order_id": self.order_id,
             "product_id": self.product_id,
             "product_name": self.product_name,
-            "product_price": self.product_price,
+            "product_price": self.product_price_cents / 100,
             "quantity": self.quantity,
-            "subtotal": self.subtotal,
+            "subtotal": self.subtotal_cents / 100,
         }
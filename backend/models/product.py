@@ -7,7 +7,7 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
-    price = db.Column(db.Float, nullable=False, default=0.0)
+    price_cents = db.Column(db.BigInteger, nullable=False, default=0)  # 金额一律存整数分
     image = db.Column(db.String(500), nullable=True)
     stock = db.Column(db.Integer, nullable=False, default=0)
     rating = db.Column(db.Float, nullable=True)
@@ -19,7 +19,7 @@ class Product(db.Model):
         return {
             "id": self.id,
             "name": self.name,
-            "price": self.price,
+            "price": self.price_cents / 100,
             "description": self.description,
             "image": self.image,
             "stock": self.stock,
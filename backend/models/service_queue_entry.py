@@ -0,0 +1,13 @@
+import time
+
+from db import db
+
+
+class ServiceQueueEntry(db.Model):
+    """人工客服排队：自增 id 即排队顺序号，user_id 唯一保证同一用户只排一次"""
+
+    __tablename__ = "service_queue"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), unique=True, nullable=False)
+    enqueued_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
@@ -0,0 +1,13 @@
+from db import db
+
+
+class WechatCredential(db.Model):
+    """微信接口凭证（access_token / jsapi_ticket），多个工作进程共用一行，lease_until 是刷新租约"""
+
+    __tablename__ = "wechat_credentials"
+
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.String(512), nullable=True)
+    expires_at = db.Column(db.Integer, nullable=False, default=0)
+    lease_until = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,26 @@
+import time
+
+from db import db
+
+
+class WechatMessage(db.Model):
+    __tablename__ = "wechat_messages"
+    # 按用户查询最近消息走 (user_id, timestamp) 联合索引，后台全量查询走 timestamp 索引
+    __table_args__ = (db.Index("ix_wechat_messages_user_time", "user_id", "timestamp"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), nullable=False)
+    content = db.Column(db.Text, nullable=True)
+    reply_content = db.Column(db.Text, nullable=True)
+    message_type = db.Column(db.String(32), nullable=False, default="text")
+    timestamp = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()), index=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "content": self.content,
+            "reply_content": self.reply_content,
+            "message_type": self.message_type,
+            "timestamp": self.timestamp,
+        }
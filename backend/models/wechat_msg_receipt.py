@@ -0,0 +1,14 @@
+import time
+
+from db import db
+
+
+class WechatMsgReceipt(db.Model):
+    """已接收的微信消息（按 MsgId 去重），微信超时重试同一条消息时不会重复处理"""
+
+    __tablename__ = "wechat_msg_receipts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    msg_id = db.Column(db.String(64), unique=True, nullable=False)
+    user_id = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()), index=True)
@@ -0,0 +1,23 @@
+"""
+订单金额对账：扫一遍全部订单，核对每个订单的 total_cents 是否等于明细 subtotal_cents 之和，输出偏差报告
+
+用法：python reconcile_orders.py [样例数]   默认列出偏差最大的 20 个订单
+有偏差时退出码为 1，可以放在 cron 中定时运行并据此告警。
+"""
+import json
+import sys
+
+from app import app
+from services.order_reconciliation import reconcile_orders
+
+
+def main(argv):
+    samples = int(argv[0]) if argv else 20
+    with app.app_context():
+        report = reconcile_orders(samples=samples)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report["drifted_orders"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""
+订单事件运维工具：查看订阅方进度/积压、查看事件、回放（把持久订阅方的进度退回到指定事件）
+
+用法：
+  python replay_order_events.py status                      各订阅方的进度与积压
+  python replay_order_events.py show [起始事件id] [条数]     查看事件，默认最近 20 条
+  python replay_order_events.py rewind <订阅方> <起始事件id>  从该事件起重新投递（运行中的后台分发线程会接着处理）
+  python replay_order_events.py dispatch                    在本进程立即分发一次积压的事件
+只有持久订阅方（进度保存在 order_event_offsets 表）可以回放；订阅方需保证幂等，重复投递不会产生重复数据。
+"""
+import json
+import sys
+
+from app import app
+from models.order_event import OrderEvent
+from services.order_events import order_events
+
+
+def _status():
+    print(json.dumps(order_events.stats(), ensure_ascii=False, indent=2))
+
+
+def _show(from_id=None, limit=20):
+    query = OrderEvent.query
+    if from_id is None:
+        events = query.order_by(OrderEvent.id.desc()).limit(limit).all()[::-1]
+    else:
+        events = query.filter(OrderEvent.id >= from_id).order_by(OrderEvent.id.asc()).limit(limit).all()
+    for e in events:
+        print(json.dumps(e.to_dict(), ensure_ascii=False))
+
+
+def _rewind(consumer, from_id):
+    subscribers = order_events.subscribers()
+    if consumer not in subscribers:
+        print(f"未知的订阅方：{consumer}，可选：{', '.join(subscribers)}")
+        return 1
+    if not subscribers[consumer]:
+        print(f"{consumer} 是进程内订阅方，进度不持久化，无法从命令行回放")
+        return 1
+    if not order_events.rewind(consumer, from_id):
+        print(f"{consumer} 还没有消费记录（后台分发线程首次运行后才会创建）")
+        return 1
+    print(f"{consumer} 将从事件 {from_id} 开始重新投递")
+    return 0
+
+
+def main(argv):
+    command = argv[0] if argv else "status"
+    with app.app_context():
+        if command == "status":
+            _status()
+        elif command == "show":
+            _show(int(argv[1]) if len(argv) > 1 else None, int(argv[2]) if len(argv) > 2 else 20)
+        elif command == "rewind" and len(argv) == 3:
+            return _rewind(argv[1], int(argv[2]))
+        elif command == "dispatch":
+            print(f"已分发 {order_events.dispatch_pending()} 个事件")
+            _status()
+        else:
+            print(__doc__)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,53 +1,80 @@
-import secrets
 import os
+import time
 
 from flask import Blueprint, jsonify, request
-from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 
 from db import db
 from models.auth_token import AuthToken
 from models.category import Category
+from models.faq_entry import FaqEntry
+from models.notification_campaign import NotificationCampaign
 from models.order import Order
 from models.order_item import OrderItem
 from models.product import Product
 from models.user import User
-from state import token_to_user_id
+from services.ai_client import provider_stats
+from services.ai_context import token_usage
+from services.ai_stream import stream_latency
+from services.auth_service import (
+    auth_cache,
+    get_current_user,
+    issue_token,
+    record_revocation,
+    revoke_user_tokens,
+    token_table_samples,
+)
+from services.catalog_cache import (
+    CATALOG,
+    CATEGORIES,
+    catalog_cache,
+    category_scope,
+    commit_catalog,
+    product_scope,
+)
+from services.chat_store import chat_store
+from services.faq_store import faq_stats, next_faq_version
+from services.notification_service import (
+    USER_CATEGORIES,
+    add_notification,
+    create_campaign,
+    deactivate_campaign,
+)
+from services.money import to_cents
+from services.order_events import order_events, record_order_event
+from services.order_reconciliation import last_report
+from services.pagination import cached_count, keyset_paginate
+from services.product_query import list_products_by_cursor, list_products_page
+from services.reply_cache import reply_cache
+from services.search_service import index_product, unindex_product
+from services.wechat_async import wechat_dispatcher
+from services.wechat_service import credential_stats
 
 
 admin_bp = Blueprint("admin", __name__)
 
 
-def _get_bearer_token() -> str:
-    auth = request.headers.get("Authorization") or ""
-    if auth.lower().startswith("bearer "):
-        return auth[7:].strip()
-    return ""
-
-
-def _get_current_user():
-    token = _get_bearer_token()
-    if not token:
-        return None
-
-    auth_row = AuthToken.query.filter_by(token=token).first()
-    if auth_row:
-        return User.query.get(int(auth_row.user_id))
-
-    user_id = token_to_user_id.get(token)
-    if not user_id:
-        return None
-    return User.query.get(int(user_id))
-
-
 def _require_admin():
-    user = _get_current_user()
+    user = get_current_user()
     if not user:
         return None, (jsonify({"success": False, "error": "unauthorized"}), 401)
-    if not bool(getattr(user, "is_admin", False)):
+    if not user.is_admin:
         return None, (jsonify({"success": False, "error": "forbidden"}), 403)
     return user, None
 
 
+def _with_count() -> bool:
+    return request.args.get("with_count", 0, type=int) == 1
+
+
+def _cursor_response(results, next_cursor, total_count=None):
+    """游标分页响应：?cursor= 开启，with_count=1 时才带总数（来自短时缓存）"""
+    resp = {"success": True, "results": results, "next_cursor": next_cursor}
+    if total_count is not None:
+        resp["count"] = total_count
+    return jsonify(resp)
+
+
 @admin_bp.route("/api/admin/login", methods=["POST"])
 def admin_login():
     data = request.get_json(silent=True) or {}
@@ -64,12 +91,13 @@ def admin_login():
     if not bool(getattr(user, "is_admin", False)):
         return jsonify({"success": False, "error": "not an admin"}), 403
 
-    token = secrets.token_urlsafe(32)
-    token_to_user_id[token] = user.id
-    db.session.add(AuthToken(token=token, user_id=user.id))
-    db.session.commit()
-
-    return jsonify({"success": True, "user": user.to_public_dict(), "token": token})
+    auth_token = issue_token(user)
+    return jsonify({
+        "success": True,
+        "user": user.to_public_dict(),
+        "token": auth_token.token,
+        "expires_at": auth_token.expires_at,
+    })
 
 
 @admin_bp.route("/api/admin/init", methods=["POST"])
@@ -94,11 +122,42 @@ def admin_init():
     else:
         user.is_admin = True
         user.set_password(password)
+        record_revocation(user.id)
         db.session.commit()
+        auth_cache.invalidate_user(user.id)
 
     return jsonify({"success": True, "user": user.to_public_dict()})
 
 
+@admin_bp.route("/api/admin/metrics", methods=["GET"])
+def admin_metrics():
+    _, err = _require_admin()
+    if err:
+        return err
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "auth_cache": auth_cache.stats(),
+            "ai_providers": provider_stats(),
+            "ai_reply_cache": reply_cache.stats(),
+            "ai_tokens": token_usage.stats(),
+            "ai_stream": stream_latency.stats(),
+            "faq": faq_stats(),
+            "chat_sessions": chat_store.stats(),
+            "wechat_async": wechat_dispatcher.stats(),
+            "wechat_credentials": credential_stats(),
+            "order_events": order_events.stats(),
+            "order_reconciliation": last_report(),
+            "catalog_cache": catalog_cache.stats(),
+            "auth_tokens": {
+                "rows": AuthToken.query.count(),
+                "samples": list(token_table_samples),
+            },
+        },
+    })
+
+
 @admin_bp.route("/api/admin/products", methods=["GET"])
 def admin_list_products():
     _, err = _require_admin()
@@ -116,27 +175,17 @@ def admin_list_products():
     category_id = request.args.get("category_id", None, type=int)
     keyword = request.args.get("keyword", "", type=str) or request.args.get("q", "", type=str)
 
-    query = Product.query
-    if category_id is not None:
-        query = query.filter(Product.category_id == category_id)
-
-    if keyword:
-        like = f"%{keyword.strip()}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(like),
-                Product.description.ilike(like),
+    cursor = request.args.get("cursor", None, type=str)
+    if cursor is not None:
+        try:
+            items, next_cursor, total_count = list_products_by_cursor(
+                cursor, category_id, keyword, per_page, with_count=_with_count()
             )
-        )
-
-    total_count = query.count()
-    items = (
-        query.order_by(Product.id.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-        .all()
-    )
+        except ValueError:
+            return jsonify({"success": False, "error": "invalid cursor"}), 400
+        return _cursor_response([p.to_dict() for p in items], next_cursor, total_count)
 
+    total_count, items = list_products_page(category_id, keyword, page, per_page)
     return jsonify({"success": True, "count": total_count, "results": [p.to_dict() for p in items]})
 
 
@@ -150,11 +199,15 @@ def admin_create_product():
     name = (payload.get("name") or "").strip()
     if not name:
         return jsonify({"success": False, "error": "name required"}), 400
+    try:
+        price_cents = to_cents(payload.get("price"))
+    except ValueError:
+        return jsonify({"success": False, "error": "invalid price"}), 400
 
     product = Product(
         name=name,
         description=payload.get("description"),
-        price=float(payload.get("price") or 0),
+        price_cents=price_cents,
         image=payload.get("image"),
         stock=int(payload.get("stock") or 0),
         rating=payload.get("rating"),
@@ -162,7 +215,9 @@ def admin_create_product():
     )
 
     db.session.add(product)
-    db.session.commit()
+    db.session.flush()
+    commit_catalog(product_scope(product.id), category_scope(product.category_id))
+    index_product(product)
     return jsonify({"success": True, "data": product.to_dict()})
 
 
@@ -177,13 +232,17 @@ def admin_update_product(product_id: int):
         return jsonify({"success": False, "error": "Product not found"}), 404
 
     payload = request.get_json(silent=True) or {}
+    old_category_id = product.category_id
 
     if "name" in payload:
         product.name = (payload.get("name") or "").strip()
     if "description" in payload:
         product.description = payload.get("description")
     if "price" in payload:
-        product.price = float(payload.get("price") or 0)
+        try:
+            product.price_cents = to_cents(payload.get("price"))
+        except ValueError:
+            return jsonify({"success": False, "error": "invalid price"}), 400
     if "image" in payload:
         product.image = payload.get("image")
     if "stock" in payload:
@@ -196,7 +255,8 @@ def admin_update_product(product_id: int):
     if not product.name:
         return jsonify({"success": False, "error": "name required"}), 400
 
-    db.session.commit()
+    commit_catalog(product_scope(product.id), category_scope(old_category_id), category_scope(product.category_id))
+    index_product(product)
     return jsonify({"success": True, "data": product.to_dict()})
 
 
@@ -210,8 +270,10 @@ def admin_delete_product(product_id: int):
     if not product:
         return jsonify({"success": False, "error": "Product not found"}), 404
 
+    category_id = product.category_id
     db.session.delete(product)
-    db.session.commit()
+    commit_catalog(product_scope(product_id), category_scope(category_id))
+    unindex_product(product_id)
     return jsonify({"success": True})
 
 
@@ -232,7 +294,7 @@ def admin_reset_products_stock():
         return jsonify({"success": False, "error": "stock must be >= 0"}), 400
 
     Product.query.update({Product.stock: stock})
-    db.session.commit()
+    commit_catalog(CATALOG)
     return jsonify({"success": True, "stock": stock})
 
 
@@ -263,7 +325,7 @@ def admin_create_category():
 
     category = Category(name=name, image=payload.get("image"))
     db.session.add(category)
-    db.session.commit()
+    commit_catalog(CATEGORIES)
     return jsonify({"success": True, "data": category.to_dict()})
 
 
@@ -294,7 +356,7 @@ def admin_update_category(category_id: int):
     if "image" in payload:
         category.image = payload.get("image")
 
-    db.session.commit()
+    commit_catalog(CATEGORIES, category_scope(category.id))
     return jsonify({"success": True, "data": category.to_dict()})
 
 
@@ -309,7 +371,7 @@ def admin_delete_category(category_id: int):
         return jsonify({"success": False, "error": "Category not found"}), 404
 
     db.session.delete(category)
-    db.session.commit()
+    commit_catalog(CATEGORIES, category_scope(category_id))
     return jsonify({"success": True})
 
 
@@ -328,6 +390,16 @@ def admin_list_users():
         per_page = 200
 
     query = User.query
+
+    cursor = request.args.get("cursor", None, type=str)
+    if cursor is not None:
+        try:
+            items, next_cursor = keyset_paginate(query, User.id, cursor, per_page)
+        except ValueError:
+            return jsonify({"success": False, "error": "invalid cursor"}), 400
+        total_count = cached_count(("users",), query) if _with_count() else None
+        return _cursor_response([u.to_public_dict() for u in items], next_cursor, total_count)
+
     total_count = query.count()
     items = (
         query.order_by(User.id.desc())
@@ -354,10 +426,19 @@ def admin_update_user(user_id: int):
     if "is_admin" in payload:
         user.is_admin = bool(payload.get("is_admin"))
 
-    if "password" in payload and payload.get("password"):
+    password_changed = bool("password" in payload and payload.get("password"))
+    if password_changed:
         user.set_password(payload.get("password"))
 
-    db.session.commit()
+    if password_changed:
+        db.session.commit()
+        # 改密码后该用户所有已登录设备需要重新登录
+        revoke_user_tokens(user.id)
+    else:
+        # 权限变更与失效记录一起提交：本进程立即、其他进程轮询到后丢弃该用户缓存的身份，下次请求重新查库
+        record_revocation(user.id)
+        db.session.commit()
+        auth_cache.invalidate_user(user.id)
     return jsonify({"success": True, "data": user.to_public_dict()})
 
 
@@ -377,12 +458,26 @@ def admin_list_orders():
     status = (request.args.get("status") or "").strip()
     user_id = request.args.get("user_id", None, type=int)
 
-    query = Order.query
+    # 订单明细按页批量加载（一条 IN 查询），避免逐个订单懒加载
+    query = Order.query.options(selectinload(Order.items))
     if status:
         query = query.filter(Order.status == status)
     if user_id is not None:
         query = query.filter(Order.user_id == user_id)
 
+    cursor = request.args.get("cursor", None, type=str)
+    if cursor is not None:
+        try:
+            items, next_cursor = keyset_paginate(query, Order.id, cursor, per_page)
+        except ValueError:
+            return jsonify({"success": False, "error": "invalid cursor"}), 400
+        total_count = cached_count(("orders", status, user_id), query) if _with_count() else None
+        return _cursor_response(
+            [{**o.to_dict(), "items": [i.to_dict() for i in o.items]} for o in items],
+            next_cursor,
+            total_count,
+        )
+
     total_count = query.count()
     items = (
         query.order_by(Order.id.desc())
@@ -439,6 +534,8 @@ def admin_update_order(order_id: int):
         status = (payload.get("status") or "").strip()
         if not status:
             return jsonify({"success": False, "error": "status required"}), 400
+        if status != order.status:
+            record_order_event(order, "status_changed", from_status=order.status, to_status=status)
         order.status = status
 
     if "recipient" in payload:
@@ -469,6 +566,175 @@ def admin_delete_order(order_id: int):
         return jsonify({"success": False, "error": "order not found"}), 404
 
     OrderItem.query.filter(OrderItem.order_id == order.id).delete()
+    record_order_event(order, "deleted", from_status=order.status)
     db.session.delete(order)
     db.session.commit()
     return jsonify({"success": True})
+
+
+@admin_bp.route("/api/admin/faq", methods=["GET"])
+def admin_list_faq():
+    _, err = _require_admin()
+    if err:
+        return err
+
+    entries = FaqEntry.query.filter(FaqEntry.is_deleted.is_(False)).order_by(FaqEntry.id.asc()).all()
+    return jsonify({"success": True, "data": [e.to_dict() for e in entries]})
+
+
+@admin_bp.route("/api/admin/faq", methods=["POST"])
+def admin_create_faq():
+    _, err = _require_admin()
+    if err:
+        return err
+
+    payload = request.get_json(silent=True) or {}
+    keyword = (payload.get("keyword") or "").strip()
+    answer = (payload.get("answer") or "").strip()
+    if not keyword or not answer:
+        return jsonify({"success": False, "error": "keyword/answer required"}), 400
+    try:
+        priority = int(payload.get("priority") or 0)
+    except Exception:
+        return jsonify({"success": False, "error": "invalid priority"}), 400
+
+    entry = FaqEntry.query.filter_by(keyword=keyword).first()
+    if entry is not None and not entry.is_deleted:
+        return jsonify({"success": False, "error": "keyword already exists"}), 409
+    if entry is None:
+        entry = FaqEntry(keyword=keyword)
+        db.session.add(entry)
+
+    # 已删除的同名关键词直接复用原行
+    entry.answer = answer
+    entry.priority = priority
+    entry.is_deleted = False
+    entry.version = next_faq_version()
+    entry.updated_at = int(time.time())
+    db.session.commit()
+    return jsonify({"success": True, "data": entry.to_dict()})
+
+
+@admin_bp.route("/api/admin/faq/<int:faq_id>", methods=["PUT"])
+def admin_update_faq(faq_id: int):
+    _, err = _require_admin()
+    if err:
+        return err
+
+    entry = FaqEntry.query.get(faq_id)
+    if not entry or entry.is_deleted:
+        return jsonify({"success": False, "error": "FAQ not found"}), 404
+
+    payload = request.get_json(silent=True) or {}
+
+    if "keyword" in payload:
+        keyword = (payload.get("keyword") or "").strip()
+        if not keyword:
+            return jsonify({"success": False, "error": "keyword required"}), 400
+        exists = FaqEntry.query.filter(FaqEntry.keyword == keyword, FaqEntry.id != entry.id).first()
+        if exists:
+            return jsonify({"success": False, "error": "keyword already exists"}), 409
+        entry.keyword = keyword
+    if "answer" in payload:
+        answer = (payload.get("answer") or "").strip()
+        if not answer:
+            return jsonify({"success": False, "error": "answer required"}), 400
+        entry.answer = answer
+    if "priority" in payload:
+        try:
+            entry.priority = int(payload.get("priority") or 0)
+        except Exception:
+            return jsonify({"success": False, "error": "invalid priority"}), 400
+
+    entry.version = next_faq_version()
+    entry.updated_at = int(time.time())
+    db.session.commit()
+    return jsonify({"success": True, "data": entry.to_dict()})
+
+
+@admin_bp.route("/api/admin/faq/<int:faq_id>", methods=["DELETE"])
+def admin_delete_faq(faq_id: int):
+    _, err = _require_admin()
+    if err:
+        return err
+
+    entry = FaqEntry.query.get(faq_id)
+    if not entry or entry.is_deleted:
+        return jsonify({"success": False, "error": "FAQ not found"}), 404
+
+    entry.is_deleted = True
+    entry.version = next_faq_version()
+    entry.updated_at = int(time.time())
+    db.session.commit()
+    return jsonify({"success": True})
+
+
+@admin_bp.route("/api/admin/campaigns", methods=["GET"])
+def admin_list_campaigns():
+    _, err = _require_admin()
+    if err:
+        return err
+
+    campaigns = NotificationCampaign.query.order_by(NotificationCampaign.id.desc()).limit(200).all()
+    return jsonify({"success": True, "data": [c.to_dict() for c in campaigns]})
+
+
+@admin_bp.route("/api/admin/campaigns", methods=["POST"])
+def admin_create_campaign():
+    """发布活动消息（广播给所有用户，只写一行）"""
+    _, err = _require_admin()
+    if err:
+        return err
+
+    payload = request.get_json(silent=True) or {}
+    title = (payload.get("title") or "").strip()
+    content = (payload.get("content") or "").strip()
+    if not title or not content:
+        return jsonify({"success": False, "error": "title/content required"}), 400
+    expires_at = payload.get("expires_at")
+    if expires_at is not None:
+        try:
+            expires_at = int(expires_at)
+        except Exception:
+            return jsonify({"success": False, "error": "invalid expires_at"}), 400
+
+    campaign = create_campaign(title, content, expires_at)
+    return jsonify({"success": True, "data": campaign.to_dict()})
+
+
+@admin_bp.route("/api/admin/campaigns/<int:campaign_id>", methods=["DELETE"])
+def admin_delete_campaign(campaign_id: int):
+    _, err = _require_admin()
+    if err:
+        return err
+
+    if deactivate_campaign(campaign_id) is None:
+        return jsonify({"success": False, "error": "campaign not found"}), 404
+    return jsonify({"success": True})
+
+
+@admin_bp.route("/api/admin/notifications", methods=["POST"])
+def admin_send_notification():
+    """给指定用户发送系统/订单消息"""
+    _, err = _require_admin()
+    if err:
+        return err
+
+    payload = request.get_json(silent=True) or {}
+    category = (payload.get("category") or "system").strip()
+    title = (payload.get("title") or "").strip()
+    content = (payload.get("content") or "").strip()
+    if category not in USER_CATEGORIES:
+        return jsonify({"success": False, "error": "invalid category"}), 400
+    if not title or not content:
+        return jsonify({"success": False, "error": "title/content required"}), 400
+    try:
+        user_id = int(payload.get("user_id"))
+    except Exception:
+        return jsonify({"success": False, "error": "invalid user_id"}), 400
+    if not User.query.get(user_id):
+        return jsonify({"success": False, "error": "user not found"}), 404
+
+    notification = add_notification(user_id, category, title, content)
+    db.session.commit()
+    return jsonify({"success": True, "data": notification.to_dict()})
@@ -1,9 +1,13 @@
-import time
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
-from flask import Blueprint, jsonify, request
-
-from services.ai_service import get_ai_reply
-from state import chat_records, online_service
+from config import CHAT_RESPONSE_HISTORY
+from services.ai_service import generate_ai_reply, stream_ai_reply
+from services.ai_stream import sse_event
+from services.chat_session import issue_chat_token
+from services.chat_store import chat_store
+from services.realtime import publish_queue_changed, publish_service_reply, publish_service_taken
+from services.service_queue import QueueFullError, service_queue
+from state import online_service
 
 ai_bp = Blueprint("ai", __name__)
 
@@ -18,8 +22,15 @@ def ai_chat():
     if not user_id or not user_msg:
         return jsonify({"code": 400, "msg": "参数缺失"})
 
+    # 只随回复返回最近 history_limit 条记录（0 表示不返回），更早的通过 /api/ai_chat/history 翻页获取
+    try:
+        history_limit = int(data.get("history_limit", CHAT_RESPONSE_HISTORY))
+    except (TypeError, ValueError):
+        return jsonify({"code": 400, "msg": "history_limit 无效"})
+
     # 获取智能回复
-    ai_reply = get_ai_reply(user_msg, user_id)
+    reply = generate_ai_reply(user_msg, user_id)
+    ai_reply = reply.text
 
     # 判断是否需要转接人工
     need_transfer = "转接人工客服" in ai_reply or "人工客服" in user_msg
@@ -28,7 +39,57 @@ def ai_chat():
         "code": 200,
         "ai_reply": ai_reply,
         "need_transfer": need_transfer,
-        "chat_records": chat_records.get(user_id, [])
+        "usage": reply.usage,
+        "chat_records": chat_store.recent(user_id, history_limit),
+        "chat_token": issue_chat_token(user_id, data.get("chat_token"))
+    })
+
+
+@ai_bp.route("/api/ai_chat/stream", methods=["GET", "POST"])
+def ai_chat_stream():
+    """流式智能客服（SSE）：先推送若干 delta 事件（回复片段），最后推送 done 事件（完整回复、token 用量、耗时）。
+
+    POST 传 JSON（与 /api/ai_chat 相同），GET 传 query 参数以便浏览器直接使用 EventSource。
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    user_id = data.get("user_id")
+    user_msg = data.get("msg")
+    if not user_id or not user_msg:
+        return jsonify({"code": 400, "msg": "参数缺失"})
+
+    chat_token = issue_chat_token(user_id, data.get("chat_token"))
+
+    def events():
+        for event, payload in stream_ai_reply(user_msg, user_id):
+            if event == "done":
+                payload["need_transfer"] = "转接人工客服" in payload["reply"] or "人工客服" in user_msg
+                payload["chat_token"] = chat_token
+            yield sse_event(event, payload)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@ai_bp.route("/api/ai_chat/history", methods=["GET"])
+def ai_chat_history():
+    """分页获取完整会话记录（按时间倒序翻页，cursor 为上一页返回的 next_cursor）"""
+    user_id = request.args.get("user_id")
+    if not user_id:
+        return jsonify({"code": 400, "msg": "用户ID缺失"})
+    per_page = max(1, min(request.args.get("per_page", 20, type=int) or 20, 100))
+
+    try:
+        records, next_cursor = chat_store.history(user_id, request.args.get("cursor"), per_page)
+    except ValueError:
+        return jsonify({"code": 400, "msg": "cursor 无效"})
+
+    return jsonify({
+        "code": 200,
+        "chat_records": records,
+        "next_cursor": next_cursor
     })
 
 
@@ -41,20 +102,32 @@ def transfer_service():
     if not user_id:
         return jsonify({"code": 400, "msg": "用户ID缺失"})
 
+    # WebSocket 连接凭这个密钥接收排队序号和客服回复
+    chat_token = issue_chat_token(user_id, data.get("chat_token"))
+
     # 1. 检查客服状态
     if online_service["status"] != "online":
-        return jsonify({"code": 200, "msg": "当前人工客服离线，请稍后再试", "queue_num": -1})
-
-    # 2. 加入排队列表
-    if user_id not in online_service["queue"]:
-        online_service["queue"].append(user_id)
-    queue_num = online_service["queue"].index(user_id) + 1  # 排队序号
+        return jsonify({"code": 200, "msg": "当前人工客服离线，请稍后再试", "queue_num": -1, "chat_token": chat_token})
+
+    # 2. 加入排队列表（已在队中时返回当前序号）
+    try:
+        queue_num = service_queue.enqueue(user_id)
+    except QueueFullError:
+        return jsonify({
+            "code": 200,
+            "msg": "当前排队人数已满，请稍后再试",
+            "queue_num": -1,
+            "service_status": online_service["status"],
+            "chat_token": chat_token
+        })
+    publish_queue_changed()
 
     return jsonify({
         "code": 200,
         "msg": f"已转接人工客服，你当前排队序号：{queue_num}",
         "queue_num": queue_num,
-        "service_status": online_service["status"]
+        "service_status": online_service["status"],
+        "chat_token": chat_token
     })
 
 
@@ -67,30 +140,46 @@ def service_reply():
     if not user_id or not service_msg:
         return jsonify({"code": 400, "msg": "参数缺失"})
 
-    # 记录人工客服回复
-    if user_id not in chat_records:
-        chat_records[user_id] = []
-    chat_records[user_id].append({
-        "role": "service", "content": service_msg, "time": time.strftime("%Y-%m-%d %H:%M:%S")
-    })
+    # 记录人工客服回复，并推送给在线的用户（不用再轮询会话记录）
+    records = chat_store.append(user_id, [("service", service_msg)])
+    if records:
+        publish_service_reply(user_id, records[0])
 
     # 回复后移出排队列表
-    if user_id in online_service["queue"]:
-        online_service["queue"].remove(user_id)
+    if service_queue.remove(user_id):
+        publish_queue_changed()
 
     return jsonify({
         "code": 200,
         "service_msg": service_msg,
-        "chat_records": chat_records[user_id]
+        "chat_records": chat_store.recent(user_id, CHAT_RESPONSE_HISTORY)
     })
 
 
 @ai_bp.route("/api/get_queue", methods=["GET"])
 def get_queue():
     """获取当前排队用户列表（客服端调用）"""
+    queue = service_queue.users()
     return jsonify({
         "code": 200,
-        "queue": online_service["queue"],
-        "queue_length": len(online_service["queue"]),
+        "queue": queue,
+        "queue_length": len(queue),
         "service_status": online_service["status"]
     })
+
+
+@ai_bp.route("/api/service_next", methods=["POST"])
+def service_next():
+    """客服接待下一位：取出排在最前面的用户（多个客服同时调用时不会取到同一个人）"""
+    user_id = service_queue.pop()
+    if user_id is None:
+        return jsonify({"code": 200, "msg": "当前没有排队用户", "user_id": None, "queue_length": 0})
+    publish_service_taken(user_id)
+    publish_queue_changed()
+
+    return jsonify({
+        "code": 200,
+        "user_id": user_id,
+        "chat_records": chat_store.recent(user_id, CHAT_RESPONSE_HISTORY),
+        "queue_length": service_queue.length()
+    })
@@ -1,11 +1,10 @@
-import secrets
-
 from flask import Blueprint, jsonify, request
 
 from db import db
-from models.auth_token import AuthToken
 from models.user import User
-from state import token_to_user_id
+from services.auth_service import get_bearer_token, get_current_user, issue_token, revoke_token, revoke_user_tokens
+from services.cart_service import merge_guest_cart
+from services.notification_service import notify_user
 
 
 auth_bp = Blueprint("auth", __name__)
@@ -28,12 +27,15 @@ def register():
     user.set_password(password)
     db.session.add(user)
     db.session.commit()
+    notify_user(user.id, "system", "系统通知", "尊敬的用户，您的账号已成功注册")
 
-    token = secrets.token_urlsafe(32)
-    token_to_user_id[token] = user.id
-    db.session.add(AuthToken(token=token, user_id=user.id))
-    db.session.commit()
-    return jsonify({"success": True, "user": user.to_public_dict(), "token": token})
+    auth_token = issue_token(user)
+    return jsonify({
+        "success": True,
+        "user": user.to_public_dict(),
+        "token": auth_token.token,
+        "expires_at": auth_token.expires_at,
+    })
 
 
 @auth_bp.route("/api/login", methods=["POST"])
@@ -49,8 +51,31 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({"success": False, "error": "invalid username or password"}), 401
 
-    token = secrets.token_urlsafe(32)
-    token_to_user_id[token] = user.id
-    db.session.add(AuthToken(token=token, user_id=user.id))
-    db.session.commit()
-    return jsonify({"success": True, "user": user.to_public_dict(), "token": token})
+    # 登录时合并未登录期间的购物车（body 的 cart_token 或 X-Cart-Token 头）
+    guest_token = data.get("cart_token") or request.headers.get("X-Cart-Token")
+    if guest_token:
+        merge_guest_cart(user.id, guest_token)
+
+    auth_token = issue_token(user)
+    return jsonify({
+        "success": True,
+        "user": user.to_public_dict(),
+        "token": auth_token.token,
+        "expires_at": auth_token.expires_at,
+    })
+
+
+@auth_bp.route("/api/logout", methods=["POST"])
+def logout():
+    """注销当前 token；传 {"all": true} 时注销该用户所有设备上的 token"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    if data.get("all"):
+        revoked = revoke_user_tokens(user.id)
+    else:
+        revoke_token(get_bearer_token())
+        revoked = 1
+    return jsonify({"success": True, "revoked": revoked})
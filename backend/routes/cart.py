@@ -0,0 +1,158 @@
+from flask import Blueprint, jsonify, request
+
+from services.auth_service import get_current_user
+from services.cart_service import (
+    CartError,
+    add_item,
+    checkout,
+    clear_cart,
+    get_cart,
+    load_cart_lines,
+    merge_guest_cart,
+    set_item_quantity,
+    summarize,
+)
+from services.idempotency import idempotent
+from services.money import to_cents
+from services.order_service import OrderError
+
+
+cart_bp = Blueprint("cart", __name__)
+
+
+def _current_cart(create=False):
+    """登录用户用自己的购物车（请求仍带着游客 token 时先合并）；未登录用 X-Cart-Token 对应的游客购物车"""
+    user = get_current_user()
+    guest_token = request.headers.get("X-Cart-Token") or None
+    if user:
+        if guest_token:
+            merge_guest_cart(user.id, guest_token)
+        return get_cart(user_id=user.id, create=create)
+    return get_cart(guest_token=guest_token, create=create)
+
+
+def _cart_response(cart, **extra):
+    data = summarize(load_cart_lines(cart)) if cart else summarize([])
+    data.update(extra)
+    if cart is not None and cart.guest_token:
+        data["cart_token"] = cart.guest_token  # 前端保存，之后的请求放在 X-Cart-Token 头里
+    return jsonify({"success": True, "data": data})
+
+
+def _parse_quantity(value, allow_zero=False):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise CartError("invalid quantity")
+    if quantity < 0 or (quantity == 0 and not allow_zero):
+        raise CartError("invalid quantity")
+    return quantity
+
+
+@cart_bp.route("/api/cart", methods=["GET"])
+def get_cart_detail():
+    """购物车详情：按商品当前价格和库存重新计算（一次查询）"""
+    return _cart_response(_current_cart())
+
+
+@cart_bp.route("/api/cart/items", methods=["POST"])
+def add_cart_item():
+    payload = request.get_json(silent=True) or {}
+    try:
+        product_id = int(payload.get("product_id"))
+        quantity = _parse_quantity(payload.get("quantity", 1))
+        cart = _current_cart(create=True)
+        add_item(cart, product_id, quantity)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "invalid product_id"}), 400
+    except CartError as e:
+        return jsonify({"success": False, "error": e.message}), e.status_code
+    return _cart_response(cart)
+
+
+@cart_bp.route("/api/cart/items/<int:product_id>", methods=["PUT"])
+def update_cart_item(product_id: int):
+    payload = request.get_json(silent=True) or {}
+    try:
+        quantity = _parse_quantity(payload.get("quantity"), allow_zero=True)
+        cart = _current_cart(create=quantity > 0)
+        if cart is None or not set_item_quantity(cart, product_id, quantity):
+            return jsonify({"success": False, "error": "item not in cart"}), 404
+    except CartError as e:
+        return jsonify({"success": False, "error": e.message}), e.status_code
+    return _cart_response(cart)
+
+
+@cart_bp.route("/api/cart/items/<int:product_id>", methods=["DELETE"])
+def delete_cart_item(product_id: int):
+    cart = _current_cart()
+    if cart is None or not set_item_quantity(cart, product_id, 0):
+        return jsonify({"success": False, "error": "item not in cart"}), 404
+    return _cart_response(cart)
+
+
+@cart_bp.route("/api/cart", methods=["DELETE"])
+def delete_cart():
+    cart = _current_cart()
+    if cart is not None:
+        clear_cart(cart)
+    return _cart_response(cart)
+
+
+@cart_bp.route("/api/cart/merge", methods=["POST"])
+def merge_cart():
+    """登录后合并游客购物车：{"cart_token": "..."}（也可以在请求头 X-Cart-Token 中传）"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+    payload = request.get_json(silent=True) or {}
+    guest_token = payload.get("cart_token") or request.headers.get("X-Cart-Token")
+    merged = merge_guest_cart(user.id, guest_token) if guest_token else 0
+    return _cart_response(get_cart(user_id=user.id), merged=merged)
+
+
+@cart_bp.route("/api/cart/checkout", methods=["POST"])
+@idempotent
+def checkout_cart():
+    """结算购物车：{"recipient", "phone", "address", "product_ids"（可选，只结算部分商品）, "expected_total"（可选）}"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    recipient = (payload.get("recipient") or "").strip()
+    phone = (payload.get("phone") or "").strip()
+    address = (payload.get("address") or "").strip()
+    if not recipient or not phone or not address:
+        return jsonify({"success": False, "error": "recipient/phone/address required"}), 400
+
+    product_ids = payload.get("product_ids")
+    expected_total = payload.get("expected_total")
+    expected_cents = None
+    try:
+        if product_ids is not None:
+            product_ids = [int(i) for i in product_ids]
+        if expected_total is not None:
+            expected_cents = to_cents(expected_total)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "invalid product_ids/expected_total"}), 400
+
+    cart = _current_cart()
+    if cart is None:
+        return jsonify({"success": False, "error": "cart is empty"}), 400
+    try:
+        order = checkout(cart, user.id, recipient, phone, address, product_ids, expected_cents)
+    except (CartError, OrderError) as e:
+        body = {"success": False, "error": e.message}
+        if e.status_code == 409 or isinstance(e, OrderError):
+            # 价格/库存已变化：附上重新计算后的购物车，前端据此提示用户确认
+            body["cart"] = summarize(load_cart_lines(cart, product_ids))
+        return jsonify(body), e.status_code
+
+    return jsonify({
+        "success": True,
+        "data": {
+            **order.to_dict(),
+            "items": [i.to_dict() for i in order.items],
+        }
+    })
@@ -0,0 +1,93 @@
+from flask import Blueprint, jsonify, request
+
+from config import NOTIFICATION_PAGE_SIZE
+from models.user import User
+from services.auth_service import get_current_user
+from services.notification_service import CATEGORIES, list_notifications, mark_read, unread_counts
+
+
+messages_bp = Blueprint("messages", __name__)
+
+
+def _per_page():
+    return max(1, min(request.args.get("per_page", NOTIFICATION_PAGE_SIZE, type=int) or NOTIFICATION_PAGE_SIZE, 100))
+
+
+# 用户消息中心接口 - 用于前端消息列表展示
+@messages_bp.route("/api/messages/<user_id>", methods=["GET"])
+def get_user_messages(user_id):
+    """获取当前登录用户的消息列表（系统消息、订单消息、活动消息）。
+
+    不带 category 时返回每个分类的第一页（前端消息页的结构）；
+    带 category 时只返回该分类，cursor 为上一页返回的 next_cursor。
+    路径中的 user_id 需与登录用户一致（id 或用户名），未登录访问 guest 返回空列表。
+    """
+    user = get_current_user()
+    if not user:
+        if user_id == "guest":
+            return jsonify({
+                "success": True,
+                "data": {**{c: [] for c in CATEGORIES}, "unread": {**{c: 0 for c in CATEGORIES}, "total": 0}},
+            })
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+    if user_id != str(user.id) and not User.query.filter_by(id=user.id, username=user_id).first():
+        return jsonify({"success": False, "error": "forbidden"}), 403
+
+    category = (request.args.get("category") or "").strip()
+    per_page = _per_page()
+    try:
+        if category:
+            if category not in CATEGORIES:
+                return jsonify({"success": False, "error": "invalid category"}), 400
+            items, next_cursor = list_notifications(user.id, category, request.args.get("cursor"), per_page)
+            return jsonify({
+                "success": True,
+                "data": {"category": category, "items": items, "next_cursor": next_cursor},
+            })
+
+        data = {"next_cursor": {}}
+        for c in CATEGORIES:
+            data[c], data["next_cursor"][c] = list_notifications(user.id, c, None, per_page)
+        data["unread"] = unread_counts(user.id)
+        return jsonify({"success": True, "data": data})
+    except ValueError:
+        return jsonify({"success": False, "error": "invalid cursor"}), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"获取消息失败: {str(e)}"
+        })
+
+
+@messages_bp.route("/api/messages/unread_count", methods=["GET"])
+def get_unread_count():
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+    return jsonify({"success": True, "data": unread_counts(user.id)})
+
+
+@messages_bp.route("/api/messages/read", methods=["POST"])
+def mark_messages_read():
+    """批量标记已读：{"category": "order", "ids": [1, 2]}；不传 ids 标记该分类全部，都不传标记所有消息"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "unauthorized"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    category = (payload.get("category") or "").strip() or None
+    ids = payload.get("ids")
+    if category is not None and category not in CATEGORIES:
+        return jsonify({"success": False, "error": "invalid category"}), 400
+    if ids is not None:
+        if not category:
+            return jsonify({"success": False, "error": "category required when ids given"}), 400
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "invalid ids"}), 400
+        if len(ids) > 500:
+            return jsonify({"success": False, "error": "too many ids"}), 400
+
+    marked = mark_read(user.id, category, ids)
+    return jsonify({"success": True, "data": {"marked": marked, "unread": unread_counts(user.id)}})
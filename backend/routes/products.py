@@ -1,17 +1,23 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 
 from db import db
 from models.category import Category
 from models.product import Product
+from services.catalog_cache import CATEGORIES, cached_json_response, category_scope, product_scope
+from services.product_query import list_products_by_cursor, list_products_page
 
 products_bp = Blueprint("products", __name__)
 
 
 @products_bp.route("/api/categories", methods=["GET"])
 def get_categories():
-    categories = Category.query.order_by(Category.id.asc()).all()
-    return jsonify({"success": True, "data": [c.to_dict() for c in categories]})
+    """分类列表（读穿缓存，支持 If-None-Match）"""
+    def load():
+        categories = Category.query.order_by(Category.id.asc()).all()
+        return {"success": True, "data": [c.to_dict() for c in categories]}, 200, (CATEGORIES,)
+
+    return cached_json_response(("categories",), load)
 
 
 @products_bp.route("/api/products", methods=["GET"])
@@ -20,50 +26,58 @@ def get_products():
     category_id = request.args.get("category_id", None, type=int)
     keyword = request.args.get("keyword", "", type=str) or request.args.get("q", "", type=str)
     per_page = request.args.get("per_page", 10, type=int)
+    cursor = request.args.get("cursor", None, type=str)
 
     if per_page <= 0:
         per_page = 10
     if per_page > 200:
         per_page = 200
 
-    query = Product.query
-    if category_id is not None:
-        query = query.filter(Product.category_id == category_id)
-
-    if keyword:
-        like = f"%{keyword.strip()}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(like),
-                Product.description.ilike(like),
+    if cursor is not None:
+        # 游标分页：默认不返回总数，with_count=1 时返回缓存的总数
+        with_count = request.args.get("with_count", 0, type=int) == 1
+        try:
+            items, next_cursor, total_count = list_products_by_cursor(
+                cursor, category_id, keyword, per_page, with_count=with_count
             )
-        )
-
-    total_count = query.count()
-    items = (
-        query.order_by(Product.id.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-        .all()
-    )
-
+        except ValueError:
+            return jsonify({"success": False, "error": "invalid cursor"}), 400
+        resp = {"success": True, "results": [p.to_dict() for p in items], "next_cursor": next_cursor}
+        if with_count:
+            resp["count"] = total_count
+        return jsonify(resp)
+
+    total_count, items = list_products_page(category_id, keyword, page, per_page)
     return jsonify({"success": True, "count": total_count, "results": [p.to_dict() for p in items]})
 
 
 @products_bp.route("/api/products/<int:product_id>", methods=["GET"])
 def get_product(product_id):
-    product = Product.query.get(product_id)
-    if product:
-        return jsonify({"success": True, "data": product.to_dict()})
+    """商品详情（读穿缓存）：详情里带分类名，所以也依赖分类列表的版本；不存在的商品同样缓存 404"""
+    def load():
+        product = db.session.get(Product, product_id)
+        if product is None:
+            return {"success": False, "error": "Product not found"}, 404, (product_scope(product_id),)
+        return {"success": True, "data": product.to_dict()}, 200, (product_scope(product_id), CATEGORIES)
 
-    return jsonify({"success": False, "error": "Product not found"}), 404
+    return cached_json_response(("product", product_id), load)
 
 
 @products_bp.route("/api/categories/<string:category_name>/products", methods=["GET"])
 def get_products_by_category(category_name):
-    category = Category.query.filter(db.func.lower(Category.name) == category_name.lower()).first()
-    if category is None:
-        return jsonify({"success": True, "data": []})
+    """分类下的商品（读穿缓存）：分类名 -> 分类的对应关系依赖分类列表的版本，商品依赖该分类的版本"""
+    name = category_name.lower()
+
+    def load():
+        category = Category.query.filter(db.func.lower(Category.name) == name).first()
+        if category is None:
+            return {"success": True, "data": []}, 200, (CATEGORIES,)
+        products = (
+            Product.query.options(selectinload(Product.category))
+            .filter(Product.category_id == category.id)
+            .order_by(Product.id.desc())
+            .all()
+        )
+        return {"success": True, "data": [p.to_dict() for p in products]}, 200, (CATEGORIES, category_scope(category.id))
 
-    products = Product.query.filter(Product.category_id == category.id).order_by(Product.id.desc()).all()
-    return jsonify({"success": True, "data": [p.to_dict() for p in products]})
+    return cached_json_response(("category_products", name), load)
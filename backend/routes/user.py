@@ -1,38 +1,18 @@
 from flask import Blueprint, jsonify, request
 
 from db import db
-from models.auth_token import AuthToken
 from models.user import User
 from models.user_profile import UserProfile
-from state import token_to_user_id
+from services.auth_service import get_current_user
 
 
 user_bp = Blueprint("user", __name__)
 
 
-def _get_bearer_token() -> str:
-    auth = request.headers.get("Authorization") or ""
-    if auth.lower().startswith("bearer "):
-        return auth[7:].strip()
-    return ""
-
-
-def _get_current_user():
-    token = _get_bearer_token()
-    if not token:
-        return None
-    auth_row = AuthToken.query.filter_by(token=token).first()
-    if auth_row:
-        return User.query.get(int(auth_row.user_id))
-    user_id = token_to_user_id.get(token)
-    if not user_id:
-        return None
-    return User.query.get(int(user_id))
-
-
 @user_bp.route("/api/user", methods=["GET"])
 def get_user():
-    user = _get_current_user()
+    current = get_current_user()
+    user = User.query.get(current.id) if current else None
     if not user:
         return jsonify({"success": False, "error": "unauthorized"}), 401
 
@@ -49,7 +29,8 @@ def get_user():
 
 @user_bp.route("/api/user", methods=["PUT"])
 def update_user():
-    user = _get_current_user()
+    current = get_current_user()
+    user = User.query.get(current.id) if current else None
     if not user:
         return jsonify({"success": False, "error": "unauthorized"}), 401
 
@@ -1,16 +1,23 @@
 import hashlib
-import time
 
 from flask import Blueprint, jsonify, make_response, request
 
 from config import WECHAT_TOKEN
-from services.ai_service import SHOP_QA, get_ai_reply
-from services.messages import load_messages, log_wechat_message
-from services.wechat_service import generate_reply_xml, make_jsapi_signature, parse_xml
-from state import chat_records, online_service
+from services.ai_service import answer_quickly, get_ai_reply
+from services.chat_store import chat_store
+from services.faq_store import match_faq
+from services.messages import log_wechat_message, query_messages
+from services.realtime import publish_queue_changed
+from services.service_queue import QueueFullError, service_queue
+from services.wechat_async import claim_message, message_dedup_key, transfer_if_unanswerable, wechat_dispatcher
+from services.wechat_codec import generate_reply_xml, parse_xml
+from services.wechat_service import make_jsapi_signature
 
 wechat_bp = Blueprint("wechat", __name__)
 
+# 微信推送的消息必须带的字段
+REQUIRED_MESSAGE_FIELDS = ('FromUserName', 'ToUserName', 'MsgType')
+
 
 # 测试回复接口（用于前端调试）
 @wechat_bp.route('/api/wechat/test-reply', methods=['POST'])
@@ -24,11 +31,10 @@ def test_reply():
         is_custom = False
 
         # 检查是否匹配自定义问答
-        for key, answer in SHOP_QA.items():
-            if key in message:
-                reply = answer
-                is_custom = True
-                break
+        matched = match_faq(message)
+        if matched:
+            reply = matched[1]
+            is_custom = True
 
         if not reply:
             # 使用青云客智能回复
@@ -84,42 +90,48 @@ def wechat_handler():
             return echostr
         return '验证失败'
 
-    # POST请求：处理用户发送的消息
-    xml_data = request.data
-    msg = parse_xml(xml_data)
+    # POST请求：处理用户发送的消息（只解析已知字段，拒绝超大/带 DTD 的 XML）
+    try:
+        msg = parse_xml(request.get_data())
+    except ValueError:
+        return 'invalid xml', 400
+    # 被动回复要用到 FromUserName/ToUserName，缺少任一必需字段直接拒绝，不能等到生成回复时才出错
+    if any(not msg.get(field) for field in REQUIRED_MESSAGE_FIELDS):
+        return 'invalid message', 400
     user_id = msg['FromUserName']
 
+    # 微信 5 秒内收不到响应会重试同一条消息，已经在处理的直接返回 success
+    if not claim_message(message_dedup_key(msg), user_id):
+        return 'success'
+
     # 只处理文本消息（购物客服核心）
     if msg['MsgType'] == 'text':
-        question = msg['Content'].strip()
+        question = (msg.get('Content') or '').strip()
 
         # 检查是否需要人工客服
-        if '人工客服' in question or user_id in online_service['queue']:
+        queue_num = service_queue.position(user_id)
+        if '人工客服' in question or queue_num is not None:
             # 加入排队列表
-            if user_id not in online_service['queue']:
-                online_service['queue'].append(user_id)
-            queue_num = online_service['queue'].index(user_id) + 1
-            reply_content = f'已为你转接人工客服，当前排队序号：{queue_num}，客服将尽快为你服务～'
+            try:
+                queue_num = service_queue.enqueue(user_id)
+                publish_queue_changed()
+                reply_content = f'已为你转接人工客服，当前排队序号：{queue_num}，客服将尽快为你服务～'
+            except QueueFullError:
+                reply_content = '当前人工客服排队人数已满，请稍后再试，也可以继续问我哦～'
 
             # 记录人工客服请求
-            if user_id not in chat_records:
-                chat_records[user_id] = []
-            chat_records[user_id].append({
-                'role': 'user', 'content': question, 'time': time.strftime('%Y-%m-%d %H:%M:%S')
-            })
-            chat_records[user_id].append({
-                'role': 'service', 'content': reply_content, 'time': time.strftime('%Y-%m-%d %H:%M:%S')
-            })
+            chat_store.append(user_id, [('user', question), ('service', reply_content)])
         else:
-            # 调用智能客服
-            reply_content = get_ai_reply(question, user_id)
-
-            # 检查是否需要转接人工
-            if '转接人工客服' in reply_content:
-                if user_id not in online_service['queue']:
-                    online_service['queue'].append(user_id)
-                queue_num = online_service['queue'].index(user_id) + 1
-                reply_content = f'该问题我无法解答，已为你转接人工客服，当前排队序号：{queue_num}，客服将尽快为你服务～'
+            # 问答库/缓存命中时直接被动回复；否则交给后台生成 AI 回复，再通过客服消息接口发送，
+            # webhook 立即返回 success，不会因为 AI 调用慢而超过微信的 5 秒时限
+            quick = answer_quickly(question, user_id)
+            if quick is None:
+                if wechat_dispatcher.submit(user_id, question):
+                    return 'success'
+                reply_content = '当前咨询的同学比较多，请稍后再发一次哦～'
+            else:
+                # 检查是否需要转接人工
+                reply_content = transfer_if_unanswerable(user_id, quick.text)
 
         # 记录消息
         log_wechat_message(
@@ -160,18 +172,15 @@ def get_messages():
         offset = request.args.get('offset', 0, type=int)
         user_id = request.args.get('user_id')
 
-        messages = load_messages()
-
-        # 按用户ID筛选
-        if user_id:
-            messages = [msg for msg in messages if msg['user_id'] == user_id]
-
-        # 按时间倒序排序
-        messages.sort(key=lambda x: x['timestamp'], reverse=True)
+        if limit <= 0:
+            limit = 50
+        if limit > 200:
+            limit = 200
+        if offset < 0:
+            offset = 0
 
-        # 分页
-        total = len(messages)
-        paginated_messages = messages[offset:offset + limit]
+        # 按用户ID筛选、按时间倒序分页（走数据库索引）
+        total, paginated_messages = query_messages(user_id=user_id, limit=limit, offset=offset)
 
         return jsonify({
             'code': 0,
@@ -0,0 +1,182 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    AI_ASYNC_WORKERS,
+    AI_CIRCUIT_FAILURE_THRESHOLD,
+    AI_CIRCUIT_RESET_TIMEOUT,
+    AI_CONNECT_TIMEOUT,
+    AI_HTTP_POOL_SIZE,
+    AI_MAX_CONCURRENCY,
+    AI_QUEUE_TIMEOUT,
+    AI_READ_TIMEOUT,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断中，直接跳过该服务商"""
+
+
+class ProviderBusyError(RuntimeError):
+    """该服务商并发已满，等待超时"""
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断 reset_timeout 秒；到期后放行一个试探请求，成功则恢复"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.time() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.time() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.time()
+            self._probing = False
+
+
+class ProviderClient:
+    """单个上游服务商：复用连接池的 Session + 并发上限 + 熔断器"""
+
+    def __init__(self, name, max_concurrency=AI_MAX_CONCURRENCY, pool_size=AI_HTTP_POOL_SIZE,
+                 timeout=(AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT)):
+        self.name = name
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_RESET_TIMEOUT)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.short_circuited = 0
+
+    def _acquire(self):
+        """先拿并发名额，再向熔断器申请放行。
+
+        half_open 时 allow() 会把本次请求当作试探请求；若先放行再排队，排队超时就没人回报结果，
+        熔断器会一直停在 half_open。熔断中（open）时直接拒绝，不必排队。
+        """
+        if self.breaker.state == "open":
+            self.short_circuited += 1
+            raise CircuitOpenError(f"{self.name} 熔断中")
+        if not self._slots.acquire(timeout=AI_QUEUE_TIMEOUT):
+            self.rejected += 1
+            raise ProviderBusyError(f"{self.name} 并发已满")
+        if not self.breaker.allow():
+            self._slots.release()
+            self.short_circuited += 1
+            raise CircuitOpenError(f"{self.name} 熔断中")
+
+    def request(self, method, url, **kwargs):
+        self._acquire()
+        try:
+            self.calls += 1
+            kwargs.setdefault("timeout", self.timeout)
+            res = self.session.request(method, url, **kwargs)
+            res.raise_for_status()
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+            return res
+        finally:
+            self._slots.release()
+
+    def stream_lines(self, method, url, **kwargs):
+        """流式请求，逐行产出响应体（已解码的 str）。
+
+        并发名额一直占用到读完或生成器被关闭为止；读取中途出错同样计入熔断失败次数。
+        """
+        self._acquire()
+        res = None
+        try:
+            self.calls += 1
+            kwargs.setdefault("timeout", self.timeout)
+            res = self.session.request(method, url, stream=True, **kwargs)
+            res.raise_for_status()
+            if "charset" not in res.headers.get("Content-Type", ""):
+                res.encoding = "utf-8"  # text/event-stream 未声明编码时 requests 默认按 ISO-8859-1 解码
+            # chunk_size=None：收到多少转发多少，不等凑满缓冲区，保证首字尽快返回
+            for line in res.iter_lines(chunk_size=None, decode_unicode=True):
+                yield line
+        except GeneratorExit:
+            # 客户端中途断开：服务商已正常响应，不计入失败
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            if res is not None:
+                res.close()
+            self._slots.release()
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "short_circuited": self.short_circuited,
+        }
+
+
+# 大模型服务（按 AI_SERVICE_SCHEME 选择的接口）与青云客备用接口各自独立限流/熔断
+llm_provider = ProviderClient("llm")
+fallback_provider = ProviderClient("qingyunke", timeout=(AI_CONNECT_TIMEOUT, 3))
+
+# 异步模式：耗时的 AI 调用放到独立线程池执行，不占用 Web 工作线程
+ai_executor = ThreadPoolExecutor(max_workers=AI_ASYNC_WORKERS, thread_name_prefix="ai-reply")
+
+
+def provider_stats():
+    return {p.name: p.stats() for p in (llm_provider, fallback_provider)}
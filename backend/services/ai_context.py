@@ -0,0 +1,76 @@
+import re
+import threading
+from collections import deque
+
+
+# 会话记录中的角色 -> Chat Completions 消息角色（人工客服的回复也作为 assistant 发给模型）
+_ROLE_MAP = {"user": "user", "ai": "assistant", "service": "assistant"}
+# 中日韩文字及全角标点，分词器基本是一字一个 token
+_WIDE_RE = re.compile("[\u3000-\u9fff\uf900-\uffef]")
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符按 1 个/字，其他字符按 4 个字符 1 个 token，每条消息另加 4 个格式开销"""
+    text = text or ""
+    cjk = len(_WIDE_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4 + 4
+
+
+def build_chat_messages(system_prompt, history, question, token_budget):
+    """拼装 messages：system + 裁剪后的历史 + 当前问题，返回 (messages, 估算的 prompt token 数)。
+
+    history 为按时间正序的会话记录；从最近的一条往前取，累计超过 token_budget 即停止，
+    始终保留 system 和当前问题。历史开头若是 assistant 消息则一并丢掉，保证对话从用户提问开始。
+    """
+    used = estimate_tokens(system_prompt) + estimate_tokens(question)
+    turns = []
+    for record in reversed(history or []):
+        role = _ROLE_MAP.get(record.get("role"))
+        content = record.get("content")
+        if not role or not content:
+            continue
+        cost = estimate_tokens(content)
+        if used + cost > token_budget:
+            break
+        turns.append({"role": role, "content": content})
+        used += cost
+    turns.reverse()
+    while turns and turns[0]["role"] != "user":
+        used -= estimate_tokens(turns.pop(0)["content"])
+
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(turns)
+    messages.append({"role": "user", "content": question})
+    return messages, used
+
+
+class TokenUsageStats:
+    """累计每次大模型调用的 prompt/completion token 数，保留最近若干次调用明细供后台查看"""
+
+    def __init__(self, recent_size=100):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.recent = deque(maxlen=recent_size)
+
+    def record(self, usage):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage["completion_tokens"]
+            self.recent.append(usage)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.calls, 1) if self.calls else 0.0,
+                "avg_completion_tokens": round(self.completion_tokens / self.calls, 1) if self.calls else 0.0,
+                "recent": list(self.recent),
+            }
+
+
+token_usage = TokenUsageStats()
@@ -0,0 +1,64 @@
+import json
+import threading
+from collections import deque
+
+
+def parse_stream_line(line):
+    """解析上游 Chat Completions 流式响应的一行，返回 (delta 文本, usage, 是否结束)"""
+    if not line or not line.startswith("data:"):
+        return "", None, False
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return "", None, True
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return "", None, False
+    delta = ((chunk.get("choices") or [{}])[0].get("delta") or {}).get("content") or ""
+    return delta, chunk.get("usage"), False
+
+
+def sse_event(event, data):
+    """格式化一条发给浏览器的 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class StreamLatencyStats:
+    """流式回复的首字耗时（TTFT）与总耗时，保留最近若干次样本计算分位数"""
+
+    def __init__(self, sample_size=500):
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=sample_size)
+        self._total = deque(maxlen=sample_size)
+        self.streams = 0
+        self.interrupted = 0
+
+    def record(self, ttft_ms, total_ms, interrupted=False):
+        with self._lock:
+            self.streams += 1
+            if interrupted:
+                self.interrupted += 1
+            self._ttft.append(ttft_ms)
+            self._total.append(total_ms)
+
+    def stats(self):
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+            return {
+                "streams": self.streams,
+                "interrupted": self.interrupted,
+                "ttft_ms_p50": _percentile(ttft, 0.5),
+                "ttft_ms_p99": _percentile(ttft, 0.99),
+                "total_ms_p50": _percentile(total, 0.5),
+                "total_ms_p99": _percentile(total, 0.99),
+            }
+
+
+stream_latency = StreamLatencyStats()
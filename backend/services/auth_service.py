@@ -0,0 +1,245 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from flask import request
+
+from config import (
+    AUTH_CACHE_MAX_ENTRIES,
+    AUTH_CACHE_TTL,
+    AUTH_REVOCATION_REFRESH_INTERVAL,
+    MAX_TOKENS_PER_USER,
+    TOKEN_PRUNE_BATCH_SIZE,
+    TOKEN_PRUNE_INTERVAL,
+    TOKEN_TTL,
+)
+from db import db
+from models.auth_revocation import AuthRevocation
+from models.auth_token import AuthToken
+from models.user import User
+from services.background import delete_in_batches, start_periodic
+
+
+# 当前登录身份（鉴权只需要这两个字段，需要完整用户信息的接口再按 id 查询 User）
+CurrentUser = namedtuple("CurrentUser", ["id", "is_admin"])
+
+
+class AuthCache:
+    """token -> CurrentUser 的进程内缓存：TTL 过期 + LRU 淘汰，内存有上限"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token -> (CurrentUser, expires_at)
+        self._user_tokens = {}  # user_id -> set(token)，用于按用户失效
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._drop(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, identity, token_expires_at=None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if token in self._entries:
+                self._drop(token)
+            self._entries[token] = (identity, expires_at)
+            self._user_tokens.setdefault(identity.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate_token(self, token):
+        with self._lock:
+            self._drop(token)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in list(self._user_tokens.get(user_id, ())):
+                self._drop(token)
+
+    def _drop(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._user_tokens.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._user_tokens[entry[0].id]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+auth_cache = AuthCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL)
+
+# ---------------------- 跨进程失效 ----------------------
+# 轮询时回看的秒数：失效记录按 created_at 取，写入后晚提交的行在这段时间内仍能被读到；
+# 已处理过的记录 id 保留到移出窗口为止，不会重复清缓存
+AUTH_REVOCATION_LOOKBACK = 30
+
+_revocation_lock = threading.Lock()
+_seen_revocations = {}  # 记录 id -> created_at（窗口内已处理的）
+
+
+def record_revocation(user_id):
+    """在当前事务中写入失效记录，由调用方与权限/密码/token 的修改一起提交；
+    本进程的缓存由调用方在提交后清掉，其他进程在 AUTH_REVOCATION_REFRESH_INTERVAL 秒内轮询到后清掉"""
+    db.session.add(AuthRevocation(user_id=user_id, created_at=int(time.time())))
+
+
+def refresh_auth_revocations():
+    """拉取最近的失效记录，清掉对应用户在本进程缓存的身份；返回本次处理的记录数"""
+    since = int(time.time()) - AUTH_REVOCATION_LOOKBACK
+    rows = (
+        db.session.query(AuthRevocation.id, AuthRevocation.user_id, AuthRevocation.created_at)
+        .filter(AuthRevocation.created_at >= since)
+        .all()
+    )
+    db.session.rollback()
+    handled = 0
+    with _revocation_lock:
+        for row in rows:
+            if row.id in _seen_revocations:
+                continue
+            _seen_revocations[row.id] = row.created_at
+            auth_cache.invalidate_user(row.user_id)
+            handled += 1
+        for revocation_id, created_at in list(_seen_revocations.items()):
+            if created_at < since:
+                del _seen_revocations[revocation_id]
+    return handled
+
+
+def start_auth_revocation_refresher(app):
+    return start_periodic(app, "auth-revocation-refresher", AUTH_REVOCATION_REFRESH_INTERVAL, refresh_auth_revocations)
+
+
+def get_bearer_token() -> str:
+    auth = request.headers.get("Authorization") or ""
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+    return ""
+
+
+def issue_token(user):
+    """签发登录 token：写库、淘汰超出数量上限的旧 token，并直接写入缓存（后续请求无需查库）"""
+    now = int(time.time())
+    auth_token = AuthToken(token=secrets.token_urlsafe(32), user_id=user.id, created_at=now, expires_at=now + TOKEN_TTL)
+    db.session.add(auth_token)
+
+    # 每个用户只保留最近 MAX_TOKENS_PER_USER 个 token（含本次签发的）
+    stale = (
+        db.session.query(AuthToken.id, AuthToken.token)
+        .filter(AuthToken.user_id == user.id)
+        .order_by(AuthToken.id.desc())
+        .offset(max(MAX_TOKENS_PER_USER, 1))
+        .all()
+    )
+    if stale:
+        AuthToken.query.filter(AuthToken.id.in_([row.id for row in stale])).delete(synchronize_session=False)
+        record_revocation(user.id)
+    db.session.commit()
+
+    for row in stale:
+        auth_cache.invalidate_token(row.token)
+    auth_cache.put(auth_token.token, CurrentUser(user.id, bool(user.is_admin)), auth_token.expires_at)
+    return auth_token
+
+
+def revoke_token(token):
+    """注销单个 token（其他进程轮询到失效记录后清掉该用户缓存的身份）"""
+    row = db.session.query(AuthToken.user_id).filter(AuthToken.token == token).first()
+    AuthToken.query.filter(AuthToken.token == token).delete(synchronize_session=False)
+    if row is not None:
+        record_revocation(row.user_id)
+    db.session.commit()
+    auth_cache.invalidate_token(token)
+
+
+def revoke_user_tokens(user_id):
+    """注销某个用户的全部 token"""
+    count = AuthToken.query.filter(AuthToken.user_id == user_id).delete(synchronize_session=False)
+    record_revocation(user_id)
+    db.session.commit()
+    auth_cache.invalidate_user(user_id)
+    return count
+
+
+def get_current_user():
+    """解析 Authorization 头，返回 CurrentUser 或 None；缓存命中时不访问数据库"""
+    return identify_token(get_bearer_token())
+
+
+def identify_token(token):
+    """按 token 返回 CurrentUser，token 无效或已过期时返回 None"""
+    if not token:
+        return None
+
+    identity = auth_cache.get(token)
+    if identity is not None:
+        return identity
+
+    row = (
+        db.session.query(AuthToken.user_id, AuthToken.expires_at, User.is_admin)
+        .join(User, User.id == AuthToken.user_id)
+        .filter(AuthToken.token == token, AuthToken.expires_at > int(time.time()))
+        .first()
+    )
+    if row is None:
+        return None
+    identity = CurrentUser(int(row.user_id), bool(row.is_admin))
+    auth_cache.put(token, identity, row.expires_at)
+    return identity
+
+
+# ---------------------- 过期 token 清理 ----------------------
+# 每次清理后记录一次表大小，供 /api/admin/metrics 观察 auth_tokens 的增长趋势
+token_table_samples = deque(maxlen=288)
+
+
+def prune_expired_tokens(batch_size=TOKEN_PRUNE_BATCH_SIZE, max_batches=None):
+    """分批删除过期 token，返回删除行数"""
+    now = int(time.time())
+    deleted = delete_in_batches(AuthToken, AuthToken.expires_at <= now, batch_size, max_batches)
+    # 失效记录只需保留到各进程都轮询过（缓存的身份最多存活 AUTH_CACHE_TTL）
+    delete_in_batches(AuthRevocation, AuthRevocation.created_at <= now - max(AUTH_CACHE_TTL, AUTH_REVOCATION_LOOKBACK) * 2,
+                      batch_size, max_batches)
+
+    token_table_samples.append({
+        "time": now,
+        "rows": AuthToken.query.count(),
+        "pruned": deleted,
+    })
+    return deleted
+
+
+def start_token_pruner(app):
+    return start_periodic(app, "token-pruner", TOKEN_PRUNE_INTERVAL, prune_expired_tokens)
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from db import db
+
+
+def start_periodic(app, name, interval, fn):
+    """启动后台守护线程，每隔 interval 秒在应用上下文中执行一次 fn；interval<=0 时不启动"""
+    if interval <= 0:
+        return None
+
+    def _run():
+        while True:
+            with app.app_context():
+                try:
+                    fn()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"后台任务 {name} 执行失败: {str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def delete_in_batches(model, criterion, batch_size=1000, max_batches=None):
+    """按主键分批删除满足条件的行，每批单独提交，避免一次大删除长时间锁表；返回删除行数"""
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = [
+            row.id
+            for row in db.session.query(model.id)
+            .filter(criterion)
+            .order_by(model.id.asc())
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            break
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        batches += 1
+    return deleted
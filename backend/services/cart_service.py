@@ -0,0 +1,243 @@
+import secrets
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config import CART_GUEST_TTL, CART_MAX_ITEMS, CART_MAX_QUANTITY, CART_PRUNE_INTERVAL
+from db import db
+from models.cart import Cart
+from models.cart_item import CartItem
+from models.product import Product
+from services.background import start_periodic
+from services.money import cents_to_yuan
+from services.order_service import OrderError, place_order
+
+
+class CartError(Exception):
+    """购物车操作失败（参数/数量上限等），status_code 为对应的 HTTP 状态码"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def get_cart(user_id=None, guest_token=None, create=False):
+    """登录用户按 user_id 取购物车，否则按 guest_token；create=True 时不存在则新建（未登录时签发新 token）"""
+    if user_id is not None:
+        cart = Cart.query.filter_by(user_id=user_id).first()
+    elif guest_token:
+        cart = Cart.query.filter_by(guest_token=guest_token).first()
+    else:
+        cart = None
+    if cart is not None or not create:
+        return cart
+
+    cart = Cart(user_id=user_id, guest_token=None if user_id is not None else secrets.token_urlsafe(24))
+    db.session.add(cart)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 同一用户并发创建，用已存在的那一行
+        db.session.rollback()
+        cart = Cart.query.filter_by(user_id=user_id).first()
+    return cart
+
+
+def _touch(cart):
+    cart.updated_at = int(time.time())
+
+
+def _get_product(product_id):
+    product = db.session.get(Product, product_id)
+    if product is None:
+        raise CartError(f"product not found: {product_id}", 404)
+    return product
+
+
+def add_item(cart, product_id, quantity, _retry=True):
+    """加入购物车（已存在时数量累加）"""
+    product = _get_product(product_id)
+    item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
+    if item is None:
+        if CartItem.query.filter_by(cart_id=cart.id).count() >= CART_MAX_ITEMS:
+            raise CartError(f"cart is full (max {CART_MAX_ITEMS} items)")
+        item = CartItem(cart_id=cart.id, product_id=product_id, quantity=0, added_price_cents=product.price_cents)
+        db.session.add(item)
+    item.quantity = min(item.quantity + quantity, CART_MAX_QUANTITY)
+    _touch(cart)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 同一商品被并发加入两次，改为在已存在的行上累加
+        db.session.rollback()
+        if not _retry:
+            raise
+        add_item(cart, product_id, quantity, _retry=False)
+
+
+def set_item_quantity(cart, product_id, quantity):
+    """修改数量，0 表示移除；返回商品是否在购物车中"""
+    item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
+    if item is None:
+        if quantity <= 0:
+            return False
+        add_item(cart, product_id, quantity)
+        return True
+    if quantity <= 0:
+        db.session.delete(item)
+    else:
+        item.quantity = min(quantity, CART_MAX_QUANTITY)
+    _touch(cart)
+    db.session.commit()
+    return True
+
+
+def clear_cart(cart):
+    CartItem.query.filter_by(cart_id=cart.id).delete(synchronize_session=False)
+    _touch(cart)
+    db.session.commit()
+
+
+def merge_guest_cart(user_id, guest_token):
+    """登录后把未登录时的购物车并入用户购物车（同一商品数量相加），并删除游客购物车；返回并入的商品种类数"""
+    guest = get_cart(guest_token=guest_token) if guest_token else None
+    if guest is None:
+        return 0
+    cart = get_cart(user_id=user_id, create=True)
+    existing = {item.product_id: item for item in CartItem.query.filter_by(cart_id=cart.id)}
+    merged = 0
+    for item in CartItem.query.filter_by(cart_id=guest.id).all():
+        target = existing.get(item.product_id)
+        if target is not None:
+            target.quantity = min(target.quantity + item.quantity, CART_MAX_QUANTITY)
+        elif len(existing) < CART_MAX_ITEMS:
+            existing[item.product_id] = CartItem(
+                cart_id=cart.id, product_id=item.product_id, quantity=item.quantity,
+                added_price_cents=item.added_price_cents,
+            )
+            db.session.add(existing[item.product_id])
+        else:
+            continue
+        merged += 1
+    CartItem.query.filter_by(cart_id=guest.id).delete(synchronize_session=False)
+    db.session.delete(guest)
+    _touch(cart)
+    db.session.commit()
+    return merged
+
+
+class CartLine:
+    """按商品当前价格/库存重新计算后的购物车行"""
+
+    __slots__ = ("item", "product")
+
+    def __init__(self, item, product):
+        self.item = item
+        self.product = product
+
+    @property
+    def available(self):
+        return self.product is not None and int(self.product.stock) >= self.item.quantity
+
+    @property
+    def subtotal_cents(self):
+        return self.product.price_cents * self.item.quantity if self.product is not None else 0
+
+    def to_dict(self):
+        product = self.product
+        return {
+            "product_id": self.item.product_id,
+            "name": product.name if product else None,
+            "image": product.image if product else None,
+            "quantity": self.item.quantity,
+            "price": cents_to_yuan(product.price_cents) if product else None,
+            "added_price": cents_to_yuan(self.item.added_price_cents),
+            "price_changed": product is not None and product.price_cents != self.item.added_price_cents,
+            "stock": int(product.stock) if product else 0,
+            "available": self.available,
+            "subtotal": cents_to_yuan(self.subtotal_cents),
+        }
+
+
+def load_cart_lines(cart, product_ids=None):
+    """一条 JOIN 查询取回购物车行及商品当前价格/库存（商品已删除时 product 为 None），行数多少都只查一次"""
+    query = (
+        db.session.query(CartItem, Product)
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .filter(CartItem.cart_id == cart.id)
+    )
+    if product_ids is not None:
+        query = query.filter(CartItem.product_id.in_(product_ids))
+    return [CartLine(item, product) for item, product in query.order_by(CartItem.id.asc()).all()]
+
+
+def total_cents(lines):
+    """可结算行的合计（分）"""
+    return sum(line.subtotal_cents for line in lines if line.available)
+
+
+def summarize(lines):
+    valid = [line for line in lines if line.available]
+    return {
+        "items": [line.to_dict() for line in lines],
+        "total_quantity": sum(line.item.quantity for line in valid),
+        "total_amount": cents_to_yuan(total_cents(valid)),
+        "unavailable": len(lines) - len(valid),
+    }
+
+
+def checkout(cart, user_id, recipient, phone, address, product_ids=None, expected_cents=None):
+    """结算购物车（可只结算部分商品）：用 load_cart_lines 的快照直接下单，下单成功后在同一事务中移除已结算的行。
+
+    商品已下架/库存不足时抛出 CartError（409，附重新计算后的购物车），
+    传入 expected_cents（前端展示的合计，单位分）且与按当前价格计算的总额不一致时同样返回 409，由用户确认新价格后重新提交。
+    """
+    lines = load_cart_lines(cart, product_ids)
+    if not lines:
+        raise CartError("cart is empty")
+    if not all(line.available for line in lines):
+        raise CartError("some items are unavailable", 409)
+    if expected_cents is not None and expected_cents != total_cents(lines):
+        raise CartError("price changed", 409)
+
+    order_lines = [(line.item.product_id, line.item.quantity) for line in lines]
+    products = {line.product.id: line.product for line in lines}
+    purchased = [line.item.id for line in lines]
+
+    # 先删除已结算的行（尚未提交），与订单在同一事务中提交，下单失败时一起回滚
+    CartItem.query.filter(CartItem.id.in_(purchased)).delete(synchronize_session=False)
+    _touch(cart)
+    try:
+        return place_order(user_id, recipient, phone, address, order_lines, products=products)
+    except OrderError:
+        db.session.rollback()
+        raise
+
+
+def prune_guest_carts(batch_size=500, max_batches=None):
+    """分批删除长时间未更新的游客购物车及其商品行"""
+    cutoff = int(time.time()) - CART_GUEST_TTL
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = [
+            row.id
+            for row in db.session.query(Cart.id)
+            .filter(Cart.user_id.is_(None), Cart.updated_at <= cutoff)
+            .order_by(Cart.id.asc())
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            break
+        CartItem.query.filter(CartItem.cart_id.in_(ids)).delete(synchronize_session=False)
+        Cart.query.filter(Cart.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        batches += 1
+    return deleted
+
+
+def start_guest_cart_pruner(app):
+    return start_periodic(app, "guest-cart-pruner", CART_PRUNE_INTERVAL, prune_guest_carts)
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import threading
+import time
+
+from flask import current_app, request
+from sqlalchemy.exc import IntegrityError
+
+from config import (
+    CATALOG_CACHE_MAX_ENTRIES,
+    CATALOG_CACHE_REDIS_URL,
+    CATALOG_CACHE_TTL,
+    CATALOG_VERSION_REFRESH_INTERVAL,
+)
+from db import db
+from models.catalog_version import CatalogVersion
+from services.background import start_periodic
+from services.lru_cache import TTLLRUCache
+
+# 增量拉取版本号时多回看的版本数（版本号由计数行按提交顺序分配，回看只是保险）
+CATALOG_VERSION_OVERLAP = 10
+
+# 版本范围：分类列表 / 整个目录（批量修改时使用，所有条目失效）
+CATEGORIES = "categories"
+CATALOG = "catalog"
+# 版本号计数行：不是缓存范围，只用来分配全局递增、不重复的版本号
+VERSION_COUNTER = "_counter"
+
+
+def product_scope(product_id):
+    return f"product:{product_id}" if product_id is not None else None
+
+
+def category_scope(category_id):
+    """某个分类下的商品列表"""
+    return f"category:{category_id}" if category_id is not None else None
+
+
+class CachedResponse:
+    """序列化好的 JSON 响应。version 为加载前本进程已知的最大版本号，
+    deps 中任一范围（或整个目录）的版本号大于 version 时，说明加载后数据被改过，条目失效"""
+
+    __slots__ = ("body", "status", "etag", "version", "deps")
+
+    def __init__(self, body, status, etag, version, deps):
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.version = version
+        self.deps = deps
+
+    def dumps(self):
+        return json.dumps({
+            "body": self.body.decode("utf-8"), "status": self.status, "etag": self.etag,
+            "version": self.version, "deps": list(self.deps),
+        })
+
+    @classmethod
+    def loads(cls, raw):
+        data = json.loads(raw)
+        return cls(data["body"].encode("utf-8"), data["status"], data["etag"], data["version"], tuple(data["deps"]))
+
+
+class RedisBackend:
+    """可选的共享缓存：各进程加载过的响应写入 Redis，其他进程命中时不必再查数据库"""
+
+    def __init__(self, url, ttl, prefix="catalog:"):
+        import redis  # 可选依赖，只有配置了 CATALOG_CACHE_REDIS_URL 才需要安装
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix + ":".join(str(part) for part in key)
+
+    def get(self, key):
+        raw = self._client.get(self._key(key))
+        return CachedResponse.loads(raw) if raw is not None else None
+
+    def set(self, key, entry):
+        self._client.set(self._key(key), entry.dumps(), ex=self.ttl)
+
+
+class CatalogCache:
+    """
+    商品目录的读穿缓存：进程内 LRU（可选再加一层共享后端），条目按版本号判断是否失效。
+
+    后台修改商品/分类时，在同一事务中递增受影响范围的版本号（catalog_versions 表）；
+    本进程提交后立即刷新版本号，其他进程每 CATALOG_VERSION_REFRESH_INTERVAL 秒增量拉取一次。
+    """
+
+    def __init__(self, max_entries, ttl, backend=None):
+        self._local = TTLLRUCache(max_entries, ttl)
+        self.backend = backend
+        self.version = 0  # 本进程已知的最大版本号
+        self._versions = {}  # scope -> version
+        self._lock = threading.Lock()
+        self._stats = {
+            "loads": 0, "stale": 0, "shared_hits": 0, "not_modified": 0,
+            "backend_errors": 0, "last_backend_error": None, "refreshes": 0, "last_refresh_at": 0,
+        }
+
+    def _fresh(self, entry):
+        versions = self._versions
+        if versions.get(CATALOG, 0) > entry.version:
+            return False
+        return all(versions.get(scope, 0) <= entry.version for scope in entry.deps)
+
+    def get(self, key, load):
+        """读穿：有未失效的条目时直接返回，否则调用 load() -> (payload, status, deps) 序列化后缓存"""
+        entry = self._local.get(key)
+        if entry is not None and not self._fresh(entry):
+            self._local.invalidate(key)
+            self._stats["stale"] += 1
+            entry = None
+        if entry is None and self.backend is not None:
+            entry = self._backend_call(self.backend.get, key)
+            if entry is not None and self._fresh(entry):
+                self._stats["shared_hits"] += 1
+                self._local.put(key, entry)
+            else:
+                entry = None
+        if entry is not None:
+            return entry
+
+        # 版本号在查询数据库之前读取：加载期间提交的修改版本号更大，会让这个条目立即失效
+        seen = self.version
+        payload, status, deps = load()
+        body = current_app.json.response(payload).get_data()
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        entry = CachedResponse(body, status, etag, seen, tuple(scope for scope in deps if scope))
+        self._local.put(key, entry)
+        if self.backend is not None:
+            self._backend_call(self.backend.set, key, entry)
+        self._stats["loads"] += 1
+        return entry
+
+    def _backend_call(self, fn, *args):
+        # 共享后端不可用时退回到进程内缓存 + 数据库，不影响页面
+        try:
+            return fn(*args)
+        except Exception as e:
+            self._stats["backend_errors"] += 1
+            self._stats["last_backend_error"] = f"{type(e).__name__}: {e}"
+            return None
+
+    def refresh(self):
+        """拉取 version 大于本地已知版本的行；返回变化的范围数"""
+        since = max(self.version - CATALOG_VERSION_OVERLAP, 0)
+        rows = (
+            db.session.query(CatalogVersion.scope, CatalogVersion.version)
+            .filter(CatalogVersion.version > since)
+            .all()
+        )
+        changed = 0
+        with self._lock:
+            for scope, version in rows:
+                if scope != VERSION_COUNTER and version > self._versions.get(scope, 0):
+                    self._versions[scope] = version
+                    changed += 1
+                if version > self.version:
+                    self.version = version
+        self._stats["refreshes"] += 1
+        self._stats["last_refresh_at"] = int(time.time())
+        return changed
+
+    def clear(self):
+        """清空本进程的缓存条目（共享后端中的条目按 TTL 过期）"""
+        self._local.clear()
+
+    def note_not_modified(self):
+        self._stats["not_modified"] += 1
+
+    def stats(self):
+        return {
+            **self._local.stats(),
+            **self._stats,
+            "version": self.version,
+            "scopes": len(self._versions),
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+        }
+
+
+catalog_cache = CatalogCache(
+    CATALOG_CACHE_MAX_ENTRIES,
+    CATALOG_CACHE_TTL,
+    RedisBackend(CATALOG_CACHE_REDIS_URL, CATALOG_CACHE_TTL) if CATALOG_CACHE_REDIS_URL else None,
+)
+
+
+def cached_json_response(key, load):
+    """返回缓存的 JSON 响应；200 响应带 ETag，浏览器带 If-None-Match 且内容未变时返回 304"""
+    entry = catalog_cache.get(key, load)
+    response = current_app.response_class(entry.body, status=entry.status, mimetype="application/json")
+    if entry.status != 200:
+        return response
+    response.set_etag(entry.etag)
+    response.cache_control.no_cache = True  # 浏览器可以保存，但每次使用前都要带 ETag 验证
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        catalog_cache.note_not_modified()
+    return response
+
+
+def _next_version():
+    """分配新的版本号：计数行 UPDATE version = version + 1。
+    行锁持有到事务提交，并发的写入依次拿到不同的版本号，并且按版本号顺序提交，
+    读到较小版本号的进程不会把之后才提交的修改当作已经看到"""
+    counter = CatalogVersion.query.filter_by(scope=VERSION_COUNTER)
+    if not counter.update({CatalogVersion.version: CatalogVersion.version + 1}, synchronize_session=False):
+        # 第一次写入：计数行从现有的最大版本号开始；并发创建时用已存在的那一行
+        start = db.session.query(db.func.coalesce(db.func.max(CatalogVersion.version), 0)).scalar()
+        try:
+            with db.session.begin_nested():
+                db.session.add(CatalogVersion(scope=VERSION_COUNTER, version=start + 1, updated_at=int(time.time())))
+        except IntegrityError:
+            counter.update({CatalogVersion.version: CatalogVersion.version + 1}, synchronize_session=False)
+    return counter.with_entities(CatalogVersion.version).scalar()
+
+
+def touch_catalog(*scopes):
+    """在当前事务中递增这些范围的版本号（不提交），与商品/分类的修改一起提交"""
+    scopes = {scope for scope in scopes if scope}
+    if not scopes:
+        return
+    version = _next_version()
+    now = int(time.time())
+    existing = {row.scope: row for row in CatalogVersion.query.filter(CatalogVersion.scope.in_(scopes))}
+    for scope in scopes:
+        row = existing.get(scope)
+        if row is None:
+            db.session.add(CatalogVersion(scope=scope, version=version, updated_at=now))
+        else:
+            row.version = version
+            row.updated_at = now
+
+
+def commit_catalog(*scopes):
+    """递增版本号并提交，随后立即刷新本进程的版本号（其他进程在下次轮询时失效）"""
+    touch_catalog(*scopes)
+    db.session.commit()
+    catalog_cache.refresh()
+
+
+def start_catalog_version_refresher(app):
+    return start_periodic(app, "catalog-version-refresher", CATALOG_VERSION_REFRESH_INTERVAL, catalog_cache.refresh)
@@ -0,0 +1,60 @@
+import hmac
+import secrets
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config import CHAT_SESSION_TTL
+from db import db
+from models.chat_session import ChatSession
+
+
+def issue_chat_token(user_id, presented=None):
+    """
+    返回 user_id 的会话密钥，聊天接口随响应下发，客户端连接 WebSocket 时带上。
+
+    密钥只签发给第一个使用该 user_id 的客户端：会话有效期内再次请求必须带上原密钥（返回原密钥并续期），
+    只知道别人的 user_id 拿不到密钥（返回 None）；会话过期后才重新签发。
+    """
+    user_id = str(user_id)
+    now = int(time.time())
+    row = db.session.get(ChatSession, user_id)
+    if row is None:
+        token = secrets.token_urlsafe(24)
+        try:
+            with db.session.begin_nested():
+                db.session.add(ChatSession(user_id=user_id, token=token, created_at=now, expires_at=now + CHAT_SESSION_TTL))
+        except IntegrityError:
+            return None  # 并发请求中另一个客户端先拿到了这个 user_id
+        db.session.commit()
+        return token
+
+    if row.expires_at > now:
+        if not presented or not hmac.compare_digest(row.token, str(presented)):
+            return None
+        row.expires_at = now + CHAT_SESSION_TTL
+        db.session.commit()
+        return row.token
+
+    # 已过期：条件更新换新密钥，并发时只有一个请求成功
+    token = secrets.token_urlsafe(24)
+    replaced = (
+        ChatSession.query
+        .filter(ChatSession.user_id == user_id, ChatSession.token == row.token, ChatSession.expires_at <= now)
+        .update({ChatSession.token: token, ChatSession.created_at: now, ChatSession.expires_at: now + CHAT_SESSION_TTL},
+                synchronize_session=False)
+    )
+    db.session.commit()
+    return token if replaced else None
+
+
+def verify_chat_token(user_id, token):
+    """会话密钥与 user_id 匹配且未过期时返回 True"""
+    if not user_id or not token:
+        return False
+    row = (
+        db.session.query(ChatSession.token)
+        .filter(ChatSession.user_id == str(user_id), ChatSession.expires_at > int(time.time()))
+        .first()
+    )
+    return row is not None and hmac.compare_digest(row.token, str(token))
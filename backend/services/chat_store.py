@@ -0,0 +1,158 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import func
+
+from config import CHAT_BUFFER_SIZE, CHAT_MAX_SESSIONS
+from db import db
+from models.chat_message import ChatMessage
+from services.pagination import keyset_paginate
+
+
+def _record_size(record):
+    """估算单条消息在内存中的字节数（dict 本身 + 各字段值）"""
+    return sys.getsizeof(record) + sum(sys.getsizeof(v) for v in record.values())
+
+
+class _Session:
+    __slots__ = ("records", "last_id", "bytes")
+
+    def __init__(self, buffer_size):
+        self.records = deque(maxlen=buffer_size)
+        self.last_id = 0  # 缓冲区对应的数据库中该用户最新一条消息的 id
+        self.bytes = 0
+
+    def extend(self, records):
+        for record in records:
+            if len(self.records) == self.records.maxlen:
+                self.bytes -= _record_size(self.records[0])
+            self.records.append(record)
+            self.bytes += _record_size(record)
+            self.last_id = max(self.last_id, record["id"])
+
+
+class ChatSessionStore:
+    """客服会话记录：chat_messages 表保存完整历史，进程内按用户保留最近 buffer_size 条的环形缓冲。
+
+    缓冲区记录了对应的最新消息 id，读写前先查一次该用户最新 id（索引查询），
+    与其他进程写入的结果不一致时丢弃并从数据库重新加载，因此多进程下看到的历史一致。
+    会话数超过 max_sessions 时淘汰最久未访问的用户，内存占用有上限。
+    """
+
+    def __init__(self, buffer_size, max_sessions):
+        self.buffer_size = buffer_size
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # user_id -> _Session
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _latest_id(self, user_id, before_id=None):
+        query = db.session.query(func.max(ChatMessage.id)).filter(ChatMessage.user_id == user_id)
+        if before_id is not None:
+            query = query.filter(ChatMessage.id < before_id)
+        return query.scalar() or 0
+
+    def _drop(self, user_id):
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            self._bytes -= session.bytes
+
+    def _store(self, user_id, session):
+        self._drop(user_id)
+        self._sessions[user_id] = session
+        self._bytes += session.bytes
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _load(self, user_id):
+        rows = (
+            ChatMessage.query.filter(ChatMessage.user_id == user_id)
+            .order_by(ChatMessage.id.desc())
+            .limit(self.buffer_size)
+            .all()
+        )
+        session = _Session(self.buffer_size)
+        session.extend([m.to_dict() for m in reversed(rows)])
+        return session
+
+    def append(self, user_id, messages):
+        """追加消息 [(role, content)]，写库后同步更新本进程的缓冲区，返回写入的记录"""
+        user_id = str(user_id)
+        now = int(time.time())
+        rows = [ChatMessage(user_id=user_id, role=role, content=content or "", created_at=now) for role, content in messages]
+        try:
+            db.session.add_all(rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"保存会话记录失败: {str(e)}")
+            return []
+
+        records = [m.to_dict() for m in rows]
+        if not records:
+            return records
+        # 本次写入之前该用户的最新消息，与缓冲区一致才能直接追加
+        latest_id = self._latest_id(user_id, records[0]["id"])
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and session.last_id == latest_id:
+                self._bytes -= session.bytes
+                session.extend(records)
+                self._bytes += session.bytes
+                self._sessions.move_to_end(user_id)
+            else:
+                # 缓冲区落后于其他进程的写入，下次读取时重新加载
+                self._drop(user_id)
+        return records
+
+    def recent(self, user_id, limit=None):
+        """返回最近 limit 条消息（按时间正序），limit 不超过 buffer_size"""
+        user_id = str(user_id)
+        limit = self.buffer_size if limit is None else max(0, min(int(limit), self.buffer_size))
+        if limit == 0:
+            return []
+
+        latest_id = self._latest_id(user_id)
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and session.last_id == latest_id:
+                self._sessions.move_to_end(user_id)
+                self.hits += 1
+                return list(session.records)[-limit:]
+            self.misses += 1
+
+        session = self._load(user_id)
+        with self._lock:
+            self._store(user_id, session)
+        return list(session.records)[-limit:]
+
+    def history(self, user_id, cursor=None, per_page=20):
+        """从数据库按时间倒序翻页，返回 (records, next_cursor)，每页内按时间正序；游标不合法时抛出 ValueError"""
+        query = ChatMessage.query.filter(ChatMessage.user_id == str(user_id))
+        rows, next_cursor = keyset_paginate(query, ChatMessage.id, cursor, per_page)
+        return [m.to_dict() for m in reversed(rows)], next_cursor
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "buffer_size": self.buffer_size,
+                "messages": sum(len(s.records) for s in self._sessions.values()),
+                "approx_bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+chat_store = ChatSessionStore(CHAT_BUFFER_SIZE, CHAT_MAX_SESSIONS)
@@ -0,0 +1,79 @@
+from collections import deque
+
+
+class FaqMatcher:
+    """问答关键词多模式匹配（Aho–Corasick 自动机）。
+
+    构建一次后，一遍扫描即可找出问题中出现的所有关键词；
+    多个关键词命中时取最长的一个，长度相同按 priority 从高到低，再按出现位置先后。
+    """
+
+    def __init__(self, entries):
+        """entries: 可迭代的 (keyword, answer) 或 (keyword, answer, priority)"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # 以该节点结尾的最长关键词（含失配链上的），存 entries 下标
+        self._entries = []
+
+        for entry in entries:
+            keyword, answer = entry[0], entry[1]
+            priority = entry[2] if len(entry) > 2 else 0
+            if not keyword:
+                continue
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                node = nxt
+            index = len(self._entries)
+            self._entries.append((keyword, answer, priority))
+            current = self._best[node]
+            if current is None or priority > self._entries[current][2]:
+                self._best[node] = index
+        self._build_fail_links()
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                if self._best[child] is None:
+                    # 自身不是关键词时，继承失配链上最长的关键词（BFS 保证失配节点已处理）
+                    self._best[child] = self._best[self._fail[child]]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def find_all(self, text):
+        """返回 [(end_pos, keyword, answer, priority)]：每个位置上结尾的最长关键词"""
+        found = []
+        goto, fail, best = self._goto, self._fail, self._best
+        node = 0
+        for pos, ch in enumerate(text or ""):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if best[node] is not None:
+                found.append((pos,) + self._entries[best[node]])
+        return found
+
+    def match(self, text):
+        """返回最佳匹配 (keyword, answer)，没有命中时返回 None"""
+        best = None
+        best_rank = None
+        for pos, keyword, answer, priority in self.find_all(text):
+            rank = (len(keyword), priority, -(pos - len(keyword)))
+            if best_rank is None or rank > best_rank:
+                best, best_rank = (keyword, answer), rank
+        return best
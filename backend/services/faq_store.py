@@ -0,0 +1,132 @@
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config import FAQ_REFRESH_INTERVAL
+from db import db
+from models.faq_entry import FaqEntry
+from models.faq_version import FaqVersion
+from services.background import start_periodic
+from services.faq_matcher import FaqMatcher
+
+
+# 2. 购物场景自定义问答（优先匹配，提高准确性）
+# 默认问答：首次启动写入 faq_entries 表，之后通过后台 /api/admin/faq 维护，各进程几秒内自动生效
+SHOP_QA = {
+    "商品多少钱": "我们的商品价格从99元到299元不等，具体看款式哦～",
+    "怎么下单": "点击公众号菜单的「立即购买」，选择商品后填写收货地址即可下单～",
+    "包邮吗": "满99元全国包邮，不满的话运费8元哦～",
+    "售后怎么处理": "签收后7天内无理由退货，质量问题包运费，联系人工客服即可处理～",
+    "人工客服": "请留下你的问题和联系方式，客服会在1小时内回复你～",
+    "如何购买": "点击商品详情页的「立即购买」按钮，按照提示完成支付即可",
+    "如何购买商品": "点击商品详情页的「立即购买」按钮，按照提示完成支付即可",
+    "退货政策": "签收后7天内无理由退货，15天内质量问题包退换，退货时商品需保持完好，不影响二次销售～",
+    "配送时间": "我们的配送时间为工作日9:00-18:00，通常下单后24小时内发货",
+    "客服热线": "您可以拨打我们的客服热线：400-123-4567",
+    "订单查询": "您可以在「个人中心」-「我的订单」中查询订单状态",
+    "支付方式": "我们支持微信支付、支付宝、银行卡等多种支付方式",
+    "优惠券使用": "在结算页面选择可用优惠券，系统将自动抵扣金额",
+    "物流查询": "您可以在订单详情页点击「查看物流」获取最新物流信息",
+    "商品质量": "我们的商品均经过严格质检，质量有保障，请放心购买",
+    "发票开具": "下单时可以选择开具发票，我们会随商品一起寄出",
+    "缺货怎么办": "如果商品缺货，您可以选择等待补货或申请退款，我们会尽快处理",
+    "修改订单": "下单后10分钟内可以修改订单信息，超过时间请联系客服处理",
+    "取消订单": "未发货的订单可以在「我的订单」中直接取消，已发货的订单需要联系客服处理",
+    "自提点在哪里": "我们在学校各个校区都设有自提点，具体位置可以在公众号菜单的「自提点查询」中查看～",
+    "退货怎么操作": "退货流程：1. 在「我的订单」中找到对应订单；2. 点击「申请退货」；3. 填写退货原因并上传照片；4. 等待审核通过后寄回商品；5. 收到商品后退款到原支付账户～",
+    "自提点营业时间": "自提点营业时间为周一至周日的9:00-18:00，节假日正常营业～",
+    "怎么查询自提点": "在公众号菜单点击「自提点查询」，选择校区即可查看该校区所有自提点的位置和营业时间～",
+    "自提点可以存放多久": "自提点可以存放3天，超过时间未取的商品会被退回仓库～",
+    "忘记取货码怎么办": "可以在订单详情页面重新获取取货码，或者联系自提点工作人员核实身份后取货～",
+}
+
+# 增量刷新时多回看的版本数（版本号由计数行按提交顺序分配，回看只是保险）
+FAQ_VERSION_OVERLAP = 10
+# 计数行的主键（faq_version 表只有这一行）
+FAQ_VERSION_COUNTER_ID = 1
+
+
+class FaqSnapshot:
+    """某个版本的问答快照（条目 + 编译好的自动机），只读，刷新时整体替换"""
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries  # id -> (keyword, answer, priority)
+        self.matcher = FaqMatcher(entries.values())
+
+
+# 从数据库加载前先用默认问答，保证启动后第一个请求就能匹配
+_snapshot = FaqSnapshot(0, {-i: (k, a, 0) for i, (k, a) in enumerate(SHOP_QA.items(), start=1)})
+_refresh_stats = {"refreshes": 0, "last_refresh_at": 0, "last_build_ms": 0.0}
+
+
+def match_faq(question):
+    """匹配问答，返回 (关键词, 回复) 或 None；只读取当前快照，不会触发重建"""
+    return _snapshot.matcher.match(question)
+
+
+def refresh_faq():
+    """拉取 version 大于本地快照的行，增量合并后在当前线程重建自动机并替换快照；返回是否有变更"""
+    global _snapshot
+    current = _snapshot
+    since = max(current.version - FAQ_VERSION_OVERLAP, 0)
+    rows = FaqEntry.query.filter(FaqEntry.version > since).order_by(FaqEntry.version.asc(), FaqEntry.id.asc()).all()
+    if not rows:
+        return False
+
+    # 首次加载时丢弃默认问答，以数据库为准
+    entries = {} if current.version == 0 else dict(current.entries)
+    changed = current.version == 0
+    for row in rows:
+        value = (row.keyword, row.answer, row.priority)
+        if row.is_deleted:
+            changed = entries.pop(row.id, None) is not None or changed
+        elif entries.get(row.id) != value:
+            entries[row.id] = value
+            changed = True
+    if not changed:
+        return False
+
+    start = time.perf_counter()
+    _snapshot = FaqSnapshot(max(current.version, rows[-1].version), entries)
+    _refresh_stats["refreshes"] += 1
+    _refresh_stats["last_refresh_at"] = int(time.time())
+    _refresh_stats["last_build_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return True
+
+
+def next_faq_version():
+    """分配新的版本号：计数行 UPDATE version = version + 1。
+    行锁持有到事务提交，并发的修改依次拿到不同的版本号并按版本号顺序提交，
+    刷新时不会因为较小的版本号晚提交而漏掉修改"""
+    counter = FaqVersion.query.filter_by(id=FAQ_VERSION_COUNTER_ID)
+    if not counter.update({FaqVersion.version: FaqVersion.version + 1}, synchronize_session=False):
+        # 第一次写入：计数行从现有的最大版本号开始；并发创建时用已存在的那一行
+        start = db.session.query(db.func.coalesce(db.func.max(FaqEntry.version), 0)).scalar()
+        try:
+            with db.session.begin_nested():
+                db.session.add(FaqVersion(id=FAQ_VERSION_COUNTER_ID, version=start + 1))
+        except IntegrityError:
+            counter.update({FaqVersion.version: FaqVersion.version + 1}, synchronize_session=False)
+    return counter.with_entities(FaqVersion.version).scalar()
+
+
+def seed_default_faq():
+    """问答表为空时写入默认问答"""
+    if FaqEntry.query.first() is not None:
+        return 0
+    version = next_faq_version()
+    now = int(time.time())
+    for keyword, answer in SHOP_QA.items():
+        db.session.add(FaqEntry(keyword=keyword, answer=answer, version=version, updated_at=now))
+    db.session.commit()
+    return len(SHOP_QA)
+
+
+def faq_stats():
+    snapshot = _snapshot
+    return {"version": snapshot.version, "entries": len(snapshot.entries), **_refresh_stats}
+
+
+def start_faq_refresher(app):
+    return start_periodic(app, "faq-refresher", FAQ_REFRESH_INTERVAL, refresh_faq)
@@ -0,0 +1,106 @@
+import time
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError
+
+from config import IDEMPOTENCY_KEY_TTL, IDEMPOTENCY_PENDING_TIMEOUT, IDEMPOTENCY_PRUNE_INTERVAL
+from db import db
+from models.idempotency_key import IdempotencyKey
+from services.auth_service import get_current_user
+from services.background import delete_in_batches, start_periodic
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def _replay(record):
+    response = Response(record.response_body or "", status=record.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _release(claim_id):
+    """首个请求执行失败（5xx/异常）时删除占位记录，允许客户端重试"""
+    db.session.rollback()
+    IdempotencyKey.query.filter(IdempotencyKey.id == claim_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def idempotent(view):
+    """按 (用户, Idempotency-Key) 保存首次响应，TTL 内的重试直接重放，不再重复执行下单/支付事务。
+
+    未带该请求头或未登录时按原逻辑执行；首个请求尚未完成时，并发的重试返回 409。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 64:
+            return jsonify({"success": False, "error": "Idempotency-Key too long"}), 400
+
+        user = get_current_user()
+        if not user:
+            return view(*args, **kwargs)
+
+        now = int(time.time())
+        record = IdempotencyKey.query.filter_by(user_id=user.id, key=key).first()
+        if record is not None:
+            abandoned = record.status_code is None and record.created_at <= now - IDEMPOTENCY_PENDING_TIMEOUT
+            if record.expires_at <= now or abandoned:
+                db.session.delete(record)
+                db.session.commit()
+                record = None
+        if record is not None:
+            if record.request_path != request.path:
+                return jsonify({"success": False, "error": "Idempotency-Key already used for another request"}), 422
+            if record.status_code is None:
+                return jsonify({"success": False, "error": "request with this Idempotency-Key is in progress"}), 409
+            return _replay(record)
+
+        # 先提交占位记录，唯一约束保证同一个 key 只有一个请求真正执行
+        claim = IdempotencyKey(
+            user_id=user.id,
+            key=key,
+            request_path=request.path,
+            created_at=now,
+            expires_at=now + IDEMPOTENCY_KEY_TTL,
+        )
+        db.session.add(claim)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"success": False, "error": "request with this Idempotency-Key is in progress"}), 409
+        claim_id = claim.id
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(claim_id)
+            raise
+
+        if response.status_code >= 500:
+            _release(claim_id)
+            return response
+
+        IdempotencyKey.query.filter(IdempotencyKey.id == claim_id).update(
+            {
+                IdempotencyKey.status_code: response.status_code,
+                IdempotencyKey.response_body: response.get_data(as_text=True),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return response
+
+    return wrapper
+
+
+def prune_expired_idempotency_keys(batch_size=1000, max_batches=None):
+    return delete_in_batches(IdempotencyKey, IdempotencyKey.expires_at <= int(time.time()), batch_size, max_batches)
+
+
+def start_idempotency_pruner(app):
+    return start_periodic(app, "idempotency-pruner", IDEMPOTENCY_PRUNE_INTERVAL, prune_expired_idempotency_keys)
@@ -3,32 +3,25 @@ import os
 import time
 
 from config import MESSAGE_LOG_FILE
+from db import db
+from models.wechat_message import WechatMessage
 
 
-# 4. 消息记录功能
-def load_messages():
-    """加载消息记录"""
-    if os.path.exists(MESSAGE_LOG_FILE):
-        try:
-            with open(MESSAGE_LOG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"加载消息记录失败: {str(e)}")
-    return []
-
-
+# 4. 消息记录功能（数据库追加写入，按用户+时间索引查询）
 def save_message(message):
-    """保存单条消息记录"""
-    messages = load_messages()
-    messages.append(message)
-    # 只保留最近1000条消息
-    if len(messages) > 1000:
-        messages = messages[-1000:]
+    """保存单条消息记录（只追加一行，不再读写整个文件）"""
     try:
-        with open(MESSAGE_LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(messages, f, ensure_ascii=False, indent=2)
+        db.session.add(WechatMessage(
+            user_id=str(message.get("user_id") or ""),
+            content=message.get("content"),
+            reply_content=message.get("reply_content"),
+            message_type=message.get("message_type") or "text",
+            timestamp=int(message.get("timestamp") or time.time()),
+        ))
+        db.session.commit()
         return True
     except Exception as e:
+        db.session.rollback()
         print(f"保存消息记录失败: {str(e)}")
         return False
 
@@ -43,3 +36,47 @@ def log_wechat_message(user_id, content, reply_content, message_type="text"):
         "timestamp": int(time.time())
     }
     return save_message(message)
+
+
+def query_messages(user_id=None, limit=50, offset=0):
+    """按时间倒序分页查询消息记录，返回 (total, messages)"""
+    query = WechatMessage.query
+    if user_id:
+        query = query.filter(WechatMessage.user_id == user_id)
+
+    total = query.count()
+    rows = (
+        query.order_by(WechatMessage.timestamp.desc(), WechatMessage.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return total, [m.to_dict() for m in rows]
+
+
+def import_legacy_messages():
+    """把旧版 JSON 文件中的消息导入数据库（仅执行一次，导入后文件重命名为 .imported）"""
+    if not os.path.exists(MESSAGE_LOG_FILE):
+        return 0
+    try:
+        with open(MESSAGE_LOG_FILE, 'r', encoding='utf-8') as f:
+            messages = json.load(f)
+    except Exception as e:
+        print(f"加载旧消息记录失败: {str(e)}")
+        return 0
+
+    rows = [
+        {
+            "user_id": str(m.get("user_id") or ""),
+            "content": m.get("content"),
+            "reply_content": m.get("reply_content"),
+            "message_type": m.get("message_type") or "text",
+            "timestamp": int(m.get("timestamp") or 0),
+        }
+        for m in messages if isinstance(m, dict)
+    ]
+    if rows:
+        db.session.execute(WechatMessage.__table__.insert(), rows)
+        db.session.commit()
+    os.replace(MESSAGE_LOG_FILE, MESSAGE_LOG_FILE + ".imported")
+    return len(rows)
@@ -0,0 +1,25 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+
+def to_cents(value):
+    """把金额（元，数字或字符串）转换为整数分，四舍五入到分；只在接口/导入等输入边界使用。
+
+    经 str 再转 Decimal，9.9 这类浮点输入按字面值换算（990），不会因为 9.9 * 100 = 989.999... 少一分。
+    """
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f"invalid amount: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    try:
+        cents = (Decimal(str(value).strip()) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        return int(cents)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"invalid amount: {value!r}")
+
+
+def cents_to_yuan(cents):
+    """整数分转为元（JSON 数字）：cents / 100 就是离该两位小数最近的浮点数，json 输出最短表示（990 -> 9.9），
+    序列化时不需要逐行构造 Decimal"""
+    return cents / 100
@@ -0,0 +1,272 @@
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config import NOTIFICATION_CAMPAIGN_CACHE_TTL
+from db import db
+from models.campaign_read import CampaignRead
+from models.notification import Notification
+from models.notification_campaign import NotificationCampaign
+from models.notification_counter import NotificationCounter
+from services.order_events import event_payload, order_events
+from services.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+
+# 消息中心：系统/订单消息按用户写入 notifications 表；活动消息是广播，
+# 每次活动只写 notification_campaigns 一行，用户读取时与自己的已读状态合并（读扩散）
+USER_CATEGORIES = ("system", "order")
+CAMPAIGN_CATEGORY = "promo"
+CATEGORIES = USER_CATEGORIES + (CAMPAIGN_CATEGORY,)
+
+_UNREAD_COLUMNS = {
+    "system": NotificationCounter.unread_system,
+    "order": NotificationCounter.unread_order,
+}
+_counters = NotificationCounter.__table__
+
+
+def _bump_unread(user_id, category, delta):
+    """在当前事务中增减未读计数；计数行不存在时补建（并发补建冲突时改为更新）"""
+    column = _UNREAD_COLUMNS[category]
+    update = _counters.update().where(_counters.c.user_id == user_id).values({column.key: column + delta})
+    if db.session.execute(update).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(NotificationCounter(user_id=user_id, **{column.key: max(delta, 0)}))
+    except IntegrityError:
+        db.session.execute(update)
+
+
+def add_notification(user_id, category, title, content, source_event_id=None):
+    """写入一条用户消息并累加未读数，不提交（随调用方的事务一起提交）"""
+    if category not in USER_CATEGORIES:
+        raise ValueError(f"invalid category: {category}")
+    notification = Notification(
+        user_id=user_id, category=category, title=title, content=content,
+        created_at=int(time.time()), source_event_id=source_event_id,
+    )
+    db.session.add(notification)
+    _bump_unread(user_id, category, 1)
+    return notification
+
+
+def notify_user(user_id, category, title, content):
+    """写入一条用户消息并提交，失败时只记录日志，不影响调用方的业务"""
+    try:
+        notification = add_notification(user_id, category, title, content)
+        db.session.commit()
+        return notification
+    except Exception as e:
+        db.session.rollback()
+        print(f"写入用户消息失败: {str(e)}")
+        return None
+
+
+# 订单事件 -> 订单消息（事件类型: (标题, 内容模板)）
+_ORDER_EVENT_MESSAGES = {
+    "created": ("订单提交成功", "您的订单#{order_id}已提交，共{items}件商品，请尽快完成支付"),
+    "paid": ("订单支付成功", "您的订单#{order_id}已支付成功，商家正在处理中"),
+    "status_changed": ("订单状态更新", "您的订单#{order_id}状态已更新为：{to_status}"),
+}
+
+
+def notify_order_events(events):
+    """订单事件的持久订阅方：为下单用户写入订单消息，按事件 id 去重，重复投递或回放不会重复发消息"""
+    events = [e for e in events if e.event_type in _ORDER_EVENT_MESSAGES]
+    if not events:
+        return
+    done = {
+        row.source_event_id
+        for row in db.session.query(Notification.source_event_id).filter(
+            Notification.source_event_id.in_([e.id for e in events])
+        )
+    }
+    for event in events:
+        if event.id in done:
+            continue
+        title, template = _ORDER_EVENT_MESSAGES[event.event_type]
+        fields = {"items": "", **event_payload(event), "order_id": event.order_id, "to_status": event.to_status}
+        add_notification(event.user_id, "order", title, template.format(**fields), source_event_id=event.id)
+
+
+order_events.subscribe("notifications", notify_order_events)
+
+
+# 有效活动列表：所有用户共用，进程内缓存 NOTIFICATION_CAMPAIGN_CACHE_TTL 秒，本进程发布/下线活动时立即失效
+_campaigns = (0.0, [])  # (加载时间, [活动 dict，按 id 倒序])
+_campaigns_lock = threading.Lock()
+
+
+def _active_campaigns():
+    global _campaigns
+    now = time.time()
+    loaded_at, campaigns = _campaigns
+    if now - loaded_at < NOTIFICATION_CAMPAIGN_CACHE_TTL:
+        return [c for c in campaigns if c["expires_at"] is None or c["expires_at"] > now]
+
+    with _campaigns_lock:
+        loaded_at, campaigns = _campaigns
+        if now - loaded_at >= NOTIFICATION_CAMPAIGN_CACHE_TTL:
+            rows = (
+                NotificationCampaign.query.filter(
+                    NotificationCampaign.is_active.is_(True),
+                    db.or_(NotificationCampaign.expires_at.is_(None), NotificationCampaign.expires_at > int(now)),
+                )
+                .order_by(NotificationCampaign.id.desc())
+                .all()
+            )
+            campaigns = [row.to_dict() for row in rows]
+            _campaigns = (now, campaigns)
+    return [c for c in campaigns if c["expires_at"] is None or c["expires_at"] > now]
+
+
+def invalidate_campaign_cache():
+    global _campaigns
+    _campaigns = (0.0, [])
+
+
+def create_campaign(title, content, expires_at=None):
+    """发布活动广播：只写一行，与用户数无关"""
+    campaign = NotificationCampaign(title=title, content=content, expires_at=expires_at, created_at=int(time.time()))
+    db.session.add(campaign)
+    db.session.commit()
+    invalidate_campaign_cache()
+    return campaign
+
+
+def deactivate_campaign(campaign_id):
+    campaign = NotificationCampaign.query.get(campaign_id)
+    if campaign is None or not campaign.is_active:
+        return None
+    campaign.is_active = False
+    db.session.commit()
+    invalidate_campaign_cache()
+    return campaign
+
+
+def _campaign_state(user_id):
+    """返回 (已读水位, 计数行)；计数行不存在时水位为 0"""
+    counter = db.session.get(NotificationCounter, user_id)
+    return (counter.campaign_read_upto if counter else 0), counter
+
+
+def _campaign_message(campaign, is_read):
+    return {
+        "id": campaign["id"],
+        "title": campaign["title"],
+        "content": campaign["content"],
+        "createTime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(campaign["created_at"])),
+        "isRead": is_read,
+    }
+
+
+def _read_campaign_ids(user_id, campaign_ids):
+    if not campaign_ids:
+        return set()
+    rows = db.session.query(CampaignRead.campaign_id).filter(
+        CampaignRead.user_id == user_id, CampaignRead.campaign_id.in_(campaign_ids)
+    )
+    return {row.campaign_id for row in rows}
+
+
+def list_notifications(user_id, category, cursor=None, per_page=20):
+    """按时间倒序翻页，返回 (消息列表, next_cursor)；游标不合法时抛出 ValueError"""
+    if category in USER_CATEGORIES:
+        query = Notification.query.filter(Notification.user_id == user_id, Notification.category == category)
+        rows, next_cursor = keyset_paginate(query, Notification.id, cursor, per_page)
+        return [row.to_dict() for row in rows], next_cursor
+
+    last_id = decode_cursor(cursor, mode="id").get("id")
+    campaigns = _active_campaigns()
+    if last_id is not None:
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise ValueError("invalid cursor")
+        campaigns = [c for c in campaigns if c["id"] < last_id]
+    page = campaigns[:per_page]
+    next_cursor = encode_cursor(mode="id", id=page[-1]["id"]) if len(campaigns) > per_page else None
+
+    read_upto, _ = _campaign_state(user_id)
+    read_ids = _read_campaign_ids(user_id, [c["id"] for c in page if c["id"] > read_upto])
+    return [_campaign_message(c, c["id"] <= read_upto or c["id"] in read_ids) for c in page], next_cursor
+
+
+def unread_counts(user_id):
+    """各类未读数：用户消息直接读计数行，活动消息 = 水位之上的有效活动数 - 其中单独标记已读的数量"""
+    read_upto, counter = _campaign_state(user_id)
+    unread_ids = [c["id"] for c in _active_campaigns() if c["id"] > read_upto]
+    counts = {
+        "system": max(counter.unread_system, 0) if counter else 0,
+        "order": max(counter.unread_order, 0) if counter else 0,
+        "promo": len(unread_ids) - len(_read_campaign_ids(user_id, unread_ids)),
+    }
+    counts["total"] = sum(counts.values())
+    return counts
+
+
+def _ensure_counter(user_id):
+    counter = db.session.get(NotificationCounter, user_id)
+    if counter is not None:
+        return counter
+    try:
+        with db.session.begin_nested():
+            counter = NotificationCounter(user_id=user_id)
+            db.session.add(counter)
+    except IntegrityError:
+        counter = db.session.get(NotificationCounter, user_id)
+    return counter
+
+
+def mark_read(user_id, category=None, ids=None):
+    """批量标记已读：ids 为空时标记该分类全部消息，category 为空时标记所有分类；返回标记的条数"""
+    if ids is not None and not category:
+        raise ValueError("category required when ids given")  # 各分类的 id 互不相关
+    categories = [category] if category else list(CATEGORIES)
+    marked = 0
+    for cat in categories:
+        if cat in USER_CATEGORIES:
+            marked += _mark_user_notifications_read(user_id, cat, ids)
+        else:
+            marked += _mark_campaigns_read(user_id, ids)
+    db.session.commit()
+    return marked
+
+
+def _mark_user_notifications_read(user_id, category, ids):
+    # 与计数更新在同一事务中：只统计本次真正由未读变为已读的行，并发重复标记不会把计数减多
+    query = Notification.query.filter(
+        Notification.user_id == user_id, Notification.category == category, Notification.is_read.is_(False)
+    )
+    if ids is not None:
+        query = query.filter(Notification.id.in_(ids))
+    marked = query.update({Notification.is_read: True}, synchronize_session=False)
+    if marked:
+        _bump_unread(user_id, category, -marked)
+    return marked
+
+
+def _mark_campaigns_read(user_id, ids):
+    counter = _ensure_counter(user_id)
+    unread = [c["id"] for c in _active_campaigns() if c["id"] > counter.campaign_read_upto]
+    already = _read_campaign_ids(user_id, unread)
+    if ids is None:
+        # 全部已读：水位移到最新的活动，水位以下的单独已读记录不再需要
+        if unread:
+            counter.campaign_read_upto = max(unread)
+        CampaignRead.query.filter(
+            CampaignRead.user_id == user_id, CampaignRead.campaign_id <= counter.campaign_read_upto
+        ).delete(synchronize_session=False)
+        return len(unread) - len(already)
+
+    marked = 0
+    for campaign_id in ({int(i) for i in ids} & set(unread)) - already:
+        try:
+            with db.session.begin_nested():
+                db.session.add(CampaignRead(user_id=user_id, campaign_id=campaign_id))
+            marked += 1
+        except IntegrityError:
+            pass  # 并发的重复标记
+    return marked
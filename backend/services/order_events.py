@@ -0,0 +1,236 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config import (
+    ORDER_EVENT_BATCH_SIZE,
+    ORDER_EVENT_GAP_TIMEOUT,
+    ORDER_EVENT_LEASE,
+    ORDER_EVENT_POLL_INTERVAL,
+    ORDER_EVENT_PRUNE_INTERVAL,
+    ORDER_EVENT_RETENTION,
+)
+from db import db
+from models.order_event import OrderEvent
+from models.order_event_offset import OrderEventOffset
+from services.background import delete_in_batches, start_periodic
+from services.pagination import invalidate_counts
+
+
+def record_order_event(order, event_type, from_status=None, to_status=None, **payload):
+    """在当前事务中写入一条订单事件，不提交（与订单变更一起提交，要么都成功要么都不写）"""
+    event = OrderEvent(
+        order_id=order.id,
+        user_id=order.user_id,
+        event_type=event_type,
+        from_status=from_status,
+        to_status=to_status,
+        payload=json.dumps(payload, ensure_ascii=False) if payload else None,
+        created_at=time.time(),
+    )
+    db.session.add(event)
+    return event
+
+
+def event_payload(event):
+    return json.loads(event.payload) if event.payload else {}
+
+
+class OrderEventDispatcher:
+    """
+    把 order_events 表中的事件按 id 顺序成批分发给进程内的订阅方（至少一次）。
+
+    - 持久订阅方（durable=True）：进度保存在 order_event_offsets 表，多进程下靠租约只由一个进程分发；
+      处理函数在同一个数据库会话中写入的数据与进度一起提交，失败则一起回滚、下次重试
+    - 本进程订阅方（durable=False）：进度只在内存中，从进程启动后的新事件开始，每个进程各自收到一份
+      （适合清理进程内缓存）
+    处理函数收到一批 OrderEvent，可能收到重复的事件，需要自行保证幂等。
+    """
+
+    def __init__(self, batch_size=ORDER_EVENT_BATCH_SIZE, lease_seconds=ORDER_EVENT_LEASE,
+                 gap_timeout=ORDER_EVENT_GAP_TIMEOUT):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.gap_timeout = gap_timeout
+        self._subscribers = {}  # name -> (handler, durable)
+        self._local_offsets = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def owner(self):
+        # fork 出的工作进程各不相同
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def subscribe(self, name, handler, durable=True):
+        self._subscribers[name] = (handler, durable)
+        self._stats[name] = {"delivered": 0, "batches": 0, "failures": 0, "last_error": None, "last_dispatch_at": 0}
+
+    def subscribers(self):
+        """{订阅方名称: 是否持久}"""
+        return {name: durable for name, (_, durable) in self._subscribers.items()}
+
+    def dispatch_pending(self, max_batches=10):
+        """给每个订阅方分发积压的事件（每个订阅方最多 max_batches 批），返回分发的事件数"""
+        with self._lock:
+            return sum(self._dispatch(name, max_batches) for name in list(self._subscribers))
+
+    def _dispatch(self, name, max_batches):
+        handler, durable = self._subscribers[name]
+        if durable:
+            last_id = self._acquire_lease(name)
+            if last_id is None:
+                return 0
+        else:
+            last_id = self._local_offsets.get(name)
+            if last_id is None:
+                last_id = self._local_offsets[name] = self._max_event_id()
+
+        delivered = 0
+        for _ in range(max_batches):
+            events = self._next_batch(last_id)
+            if not events:
+                break
+            try:
+                handler(events)
+                if durable:
+                    OrderEventOffset.query.filter_by(consumer=name).update(
+                        {"last_id": events[-1].id, "updated_at": time.time()}, synchronize_session=False
+                    )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._record(name, failures=1, last_error=f"{type(e).__name__}: {e}")
+                print(f"订单事件分发失败（{name}，事件 {events[0].id}-{events[-1].id}）: {str(e)}")
+                break
+            last_id = events[-1].id
+            if not durable:
+                self._local_offsets[name] = last_id
+            delivered += len(events)
+            self._record(name, delivered=len(events), batches=1)
+        self._stats[name]["last_dispatch_at"] = time.time()
+        return delivered
+
+    def _next_batch(self, last_id):
+        """取 last_id 之后的一批事件；遇到 id 空洞时先停在空洞前，空洞超过 gap_timeout 才跳过
+        （先分配 id 的事务可能晚提交，直接跳过会漏掉它的事件）"""
+        events = (
+            OrderEvent.query.filter(OrderEvent.id > last_id)
+            .order_by(OrderEvent.id.asc())
+            .limit(self.batch_size)
+            .all()
+        )
+        expected = last_id + 1
+        for i, event in enumerate(events):
+            if event.id != expected and event.created_at > time.time() - self.gap_timeout:
+                return events[:i]
+            expected = event.id + 1
+        return events
+
+    def _acquire_lease(self, name):
+        """抢到（或续期）租约时返回该订阅方的进度 last_id，否则返回 None"""
+        now = time.time()
+        owner = self.owner
+        updated = OrderEventOffset.query.filter(
+            OrderEventOffset.consumer == name,
+            db.or_(OrderEventOffset.lease_until < now, OrderEventOffset.owner == owner),
+        ).update({"owner": owner, "lease_until": now + self.lease_seconds}, synchronize_session=False)
+        if not updated:
+            if db.session.get(OrderEventOffset, name) is not None:
+                db.session.rollback()
+                return None
+            try:
+                # 新订阅方从头消费保留期内的事件（处理函数幂等），服务启动后的第一批事件不会因此漏掉
+                db.session.add(OrderEventOffset(
+                    consumer=name, last_id=0, owner=owner,
+                    lease_until=now + self.lease_seconds, updated_at=now,
+                ))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return None
+        else:
+            db.session.commit()
+        return db.session.get(OrderEventOffset, name).last_id
+
+    def _max_event_id(self):
+        return db.session.query(db.func.coalesce(db.func.max(OrderEvent.id), 0)).scalar()
+
+    def _record(self, name, delivered=0, batches=0, failures=0, last_error=None):
+        stats = self._stats[name]
+        stats["delivered"] += delivered
+        stats["batches"] += batches
+        stats["failures"] += failures
+        if last_error:
+            stats["last_error"] = last_error
+
+    def rewind(self, name, from_id):
+        """回放：把订阅方的进度退回到 from_id 之前，下次分发时从 from_id 开始重新投递"""
+        _, durable = self._subscribers[name]
+        if durable:
+            updated = OrderEventOffset.query.filter_by(consumer=name).update(
+                {"last_id": max(from_id - 1, 0), "updated_at": time.time()}, synchronize_session=False
+            )
+            db.session.commit()
+            return bool(updated)
+        self._local_offsets[name] = max(from_id - 1, 0)
+        return True
+
+    def stats(self):
+        """各订阅方的进度与积压：lag_events 为未处理的事件数，lag_seconds 为最早未处理事件的等待时间"""
+        now = time.time()
+        max_id = self._max_event_id()
+        offsets = {row.consumer: row for row in OrderEventOffset.query.all()}
+        result = {}
+        for name, (_, durable) in self._subscribers.items():
+            if durable:
+                row = offsets.get(name)
+                last_id = row.last_id if row else None
+            else:
+                last_id = self._local_offsets.get(name)
+            oldest = None
+            if last_id is not None and last_id < max_id:
+                oldest = db.session.query(db.func.min(OrderEvent.created_at)).filter(OrderEvent.id > last_id).scalar()
+            result[name] = {
+                **self._stats[name],
+                "durable": durable,
+                "owner": offsets[name].owner if durable and name in offsets else None,
+                "last_id": last_id,
+                "lag_events": max_id - last_id if last_id is not None else 0,
+                "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            }
+        return {"max_event_id": max_id, "subscribers": result}
+
+
+order_events = OrderEventDispatcher()
+
+
+def _invalidate_order_counts(events):
+    # 订单新增/删除/状态变化后，后台订单列表的总数缓存失效（每个进程各自清理）
+    invalidate_counts("orders")
+
+
+order_events.subscribe("order-count-cache", _invalidate_order_counts, durable=False)
+
+
+def start_order_event_dispatcher(app):
+    return start_periodic(app, "order-event-dispatcher", ORDER_EVENT_POLL_INTERVAL, order_events.dispatch_pending)
+
+
+def prune_order_events(batch_size=1000, max_batches=None):
+    """删除超过保留时间、且已被所有持久订阅方处理的事件"""
+    consumed = db.session.query(db.func.min(OrderEventOffset.last_id)).scalar()
+    if consumed is None:
+        return 0
+    cutoff = time.time() - ORDER_EVENT_RETENTION
+    return delete_in_batches(
+        OrderEvent, db.and_(OrderEvent.id <= consumed, OrderEvent.created_at <= cutoff), batch_size, max_batches
+    )
+
+
+def start_order_event_pruner(app):
+    return start_periodic(app, "order-event-pruner", ORDER_EVENT_PRUNE_INTERVAL, prune_order_events)
@@ -0,0 +1,117 @@
+import time
+
+from sqlalchemy import case
+
+from db import db
+from models.order import Order
+from models.order_item import OrderItem
+from models.product import Product
+from services.money import cents_to_yuan
+from services.order_events import record_order_event
+
+
+class OrderError(Exception):
+    """下单失败（参数/库存等业务错误），status_code 为对应的 HTTP 状态码"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_order_items(items):
+    """校验请求中的商品行，返回 [(product_id, quantity)]，同一商品的多行会合并"""
+    if not isinstance(items, list) or not items:
+        raise OrderError("items required")
+
+    quantities = {}
+    for idx, it in enumerate(items):
+        try:
+            product_id = int(it.get("product_id"))
+            quantity = int(it.get("quantity"))
+        except Exception:
+            raise OrderError(f"invalid item at index {idx}")
+
+        if quantity <= 0:
+            raise OrderError(f"quantity must be >0 at index {idx}")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return list(quantities.items())
+
+
+def reserve_stock(quantities):
+    """一条条件 UPDATE 扣减多个商品的库存：
+    UPDATE products SET stock = stock - CASE id WHEN .. THEN q END WHERE id IN (..) AND stock >= CASE id ...
+    每行单独判断库存，并发下不会超卖；返回是否全部扣减成功（失败时调用方需回滚）"""
+    needed = case(quantities, value=Product.id)
+    result = db.session.execute(
+        Product.__table__.update()
+        .where(Product.id.in_(list(quantities)), Product.stock >= needed)
+        .values(stock=Product.stock - needed)
+    )
+    return result.rowcount == len(quantities)
+
+
+def _stock_error(quantities):
+    """扣减失败后（已回滚）找出库存不足的商品，生成与逐个扣减时相同的错误信息"""
+    products = Product.query.filter(Product.id.in_(list(quantities))).order_by(Product.id.asc()).all()
+    for product in products:
+        if int(product.stock) < quantities[product.id]:
+            return OrderError(
+                f"stock not enough: {product.id} ({product.name}), stock={int(product.stock)}, need={quantities[product.id]}"
+            )
+    return OrderError("stock changed, please retry", 409)
+
+
+def place_order(user_id, recipient, phone, address, lines, products=None):
+    """创建订单并扣减库存（同一事务）。
+
+    products 为调用方已批量查好的 {商品ID: Product}（购物车结算时传入），不传则在这里一次查询取回；
+    所有商品的库存在一条条件 UPDATE 中扣减，语句数与商品种类数无关。失败时回滚并抛出 OrderError。
+    """
+    product_ids = sorted(product_id for product_id, _ in lines)
+    if products is None:
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(product_ids)).all()}
+    for product_id in product_ids:
+        if product_id not in products:
+            raise OrderError(f"product not found: {product_id}", 404)
+
+    quantities = dict(lines)
+    if not reserve_stock(quantities):
+        db.session.rollback()
+        raise _stock_error(quantities)
+
+    order = Order(
+        user_id=user_id,
+        recipient=recipient,
+        phone=phone,
+        address=address,
+        status="pending",
+        created_at=int(time.time()),
+    )
+
+    # 金额全部是整数分，合计精确等于各行小计之和
+    total_cents = 0
+    item_rows = []
+    for product_id, quantity in lines:
+        product = products[product_id]
+        subtotal_cents = product.price_cents * quantity
+        total_cents += subtotal_cents
+        item_rows.append({
+            "product_id": product.id,
+            "product_name": product.name,
+            "product_price_cents": product.price_cents,
+            "quantity": quantity,
+            "subtotal_cents": subtotal_cents,
+        })
+
+    order.total_cents = total_cents
+    db.session.add(order)
+    db.session.flush()
+    # 订单明细一条 executemany 写入（ORM 逐行 INSERT 以取回自增主键，语句数会随商品种类增长）
+    db.session.execute(OrderItem.__table__.insert(), [{**row, "order_id": order.id} for row in item_rows])
+    record_order_event(
+        order, "created", to_status=order.status,
+        items=sum(quantity for _, quantity in lines), total_amount=cents_to_yuan(total_cents),
+    )
+    db.session.commit()
+    return order
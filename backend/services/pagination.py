@@ -0,0 +1,78 @@
+import base64
+import json
+import threading
+import time
+
+from config import COUNT_CACHE_MAX_ENTRIES, COUNT_CACHE_TTL
+
+
+# 游标分页：游标对前端是不透明字符串，内部为 base64(JSON)，mode 字段标明分页方式
+# （"id"：按 id keyset 翻页；"rank"：按搜索结果位置翻页），不同方式的游标不能混用
+def encode_cursor(**fields):
+    raw = json.dumps(fields, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, mode=None):
+    """解析游标，空游标表示第一页；格式不合法、或传了 mode 而游标的 mode 不一致时抛出 ValueError"""
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fields = json.loads(raw.decode("utf-8"))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(fields, dict):
+        raise ValueError("invalid cursor")
+    if mode is not None and fields.get("mode") != mode:
+        raise ValueError("invalid cursor")
+    return fields
+
+
+def keyset_paginate(query, id_column, cursor, per_page):
+    """按 id 倒序的 keyset 分页（WHERE id < last_id），深翻页代价与页码无关，返回 (items, next_cursor)"""
+    last_id = decode_cursor(cursor, mode="id").get("id")
+    if last_id is not None:
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise ValueError("invalid cursor")
+        query = query.filter(id_column < last_id)
+
+    rows = query.order_by(id_column.desc()).limit(per_page + 1).all()
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        return rows, encode_cursor(mode="id", id=rows[-1].id)
+    return rows, None
+
+
+# 总数缓存：游标模式下按需返回总数，短时间内复用同一筛选条件的 COUNT 结果
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def cached_count(key, query):
+    now = time.time()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[1] > now:
+            return hit[0]
+
+    value = query.order_by(None).count()
+
+    with _count_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            # 先清理过期项，仍然超限则整体清空（条目很小，重新计数代价可接受）
+            for k in [k for k, (_, exp) in _count_cache.items() if exp <= now]:
+                del _count_cache[k]
+            if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+                _count_cache.clear()
+        _count_cache[key] = (value, now + COUNT_CACHE_TTL)
+    return value
+
+
+def invalidate_counts(kind):
+    """数据变化后清除某类总数缓存（缓存键的第一项，如 "orders"）"""
+    with _count_lock:
+        for k in [k for k in _count_cache if k[0] == kind]:
+            del _count_cache[k]
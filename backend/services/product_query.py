@@ -0,0 +1,68 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+
+from models.product import Product
+from services.pagination import cached_count, decode_cursor, encode_cursor, keyset_paginate
+from services.search_service import search_products
+
+
+# 商品列表查询（前台 /api/products 与后台 /api/admin/products 共用）
+def filter_products(category_id=None, keyword=""):
+    # 分类一次批量加载，避免 to_dict() 逐个商品懒加载
+    query = Product.query.options(selectinload(Product.category))
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+
+    if keyword:
+        # 搜索索引不可用时回退到 LIKE 查询
+        like = f"%{keyword.strip()}%"
+        query = query.filter(
+            or_(
+                Product.name.ilike(like),
+                Product.description.ilike(like),
+            )
+        )
+    return query
+
+
+def list_products_page(category_id, keyword, page, per_page):
+    """页码分页，返回 (total_count, products)"""
+    if keyword:
+        found = search_products(keyword, category_id=category_id, offset=(page - 1) * per_page, limit=per_page)
+        if found is not None:
+            return found
+
+    query = filter_products(category_id, keyword)
+    total_count = query.count()
+    items = (
+        query.order_by(Product.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    return total_count, items
+
+
+def list_products_by_cursor(cursor, category_id, keyword, per_page, with_count=False):
+    """游标分页，返回 (products, next_cursor, total_count)；未要求总数时 total_count 为 None。游标不合法时抛出 ValueError"""
+    fields = decode_cursor(cursor)
+    if keyword and (not fields or fields.get("mode") == "rank"):
+        # 相关度排序的搜索结果没有单调的 id 顺序，游标里记录的是结果位置（mode="rank"）
+        offset = fields.get("offset", 0)
+        if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+            raise ValueError("invalid cursor")
+        found = search_products(keyword, category_id=category_id, offset=offset, limit=per_page)
+        if found is not None:
+            total_count, items = found
+            has_more = offset + len(items) < total_count
+            next_cursor = encode_cursor(mode="rank", offset=offset + per_page) if has_more else None
+            return items, next_cursor, (total_count if with_count else None)
+        if fields:
+            # 索引不可用时按位置的游标无法继续，直接报错，避免从第一页重新开始
+            raise ValueError("invalid cursor")
+
+    # 按 id keyset 翻页（无关键词，或索引不可用时的 LIKE 回退）；其他 mode 的游标由 keyset_paginate 拒绝
+    query = filter_products(category_id, keyword)
+    items, next_cursor = keyset_paginate(query, Product.id, cursor, per_page)
+    total_count = cached_count(("products", category_id, keyword), query) if with_count else None
+    return items, next_cursor, total_count
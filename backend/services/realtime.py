@@ -0,0 +1,82 @@
+from flask import request
+from flask_socketio import SocketIO, join_room
+
+from config import SOCKETIO_ASYNC_MODE, SOCKETIO_MESSAGE_QUEUE
+from services.auth_service import identify_token
+from services.chat_session import verify_chat_token
+from services.service_queue import service_queue
+
+
+# 客服端统一加入 agents 房间；每个用户加入自己的 user:<user_id> 房间，推送只发给对应的人
+AGENT_ROOM = "agents"
+
+socketio = SocketIO()
+
+
+def user_room(user_id):
+    return f"user:{user_id}"
+
+
+def init_realtime(app):
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        async_mode=SOCKETIO_ASYNC_MODE or None,
+        message_queue=SOCKETIO_MESSAGE_QUEUE or None,
+    )
+
+
+def _queue_snapshot():
+    queue = service_queue.users()
+    return {"queue": queue, "queue_length": len(queue)}
+
+
+@socketio.on("connect")
+def on_connect(auth=None):
+    """
+    连接时通过 auth 证明身份，房间只由服务端确认过的身份决定：
+    客服 {"role": "agent", "token": 管理员 token}；登录用户 {"token": 登录 token}，加入 user:<用户 id>；
+    匿名用户 {"user_id": ..., "chat_token": 聊天接口签发的会话密钥}。只带 user_id 的连接会被拒绝。
+    """
+    auth = auth or {}
+    token = auth.get("token") or request.args.get("token")
+    if auth.get("role") == "agent":
+        identity = identify_token(token)
+        if identity is None or not identity.is_admin:
+            return False
+        join_room(AGENT_ROOM)
+        socketio.emit("queue_updated", _queue_snapshot(), to=request.sid)
+        return True
+
+    if token:
+        identity = identify_token(token)
+        if identity is None:
+            return False
+        user_id = str(identity.id)
+    else:
+        user_id = auth.get("user_id") or request.args.get("user_id")
+        if not verify_chat_token(user_id, auth.get("chat_token") or request.args.get("chat_token")):
+            return False
+    join_room(user_room(user_id))
+    position = service_queue.position(user_id)
+    if position is not None:
+        socketio.emit("queue_position", {"queue_num": position}, to=request.sid)
+    return True
+
+
+def publish_queue_changed():
+    """排队有变化时调用：客服端收到完整队列，排队中的用户收到自己的最新序号"""
+    snapshot = _queue_snapshot()
+    socketio.emit("queue_updated", snapshot, to=AGENT_ROOM)
+    for position, user_id in enumerate(snapshot["queue"], 1):
+        socketio.emit("queue_position", {"queue_num": position}, to=user_room(user_id))
+
+
+def publish_service_reply(user_id, record):
+    """人工客服回复推送给对应用户"""
+    socketio.emit("service_reply", record, to=user_room(user_id))
+
+
+def publish_service_taken(user_id):
+    """客服接待了该用户，用户端可以隐藏排队提示"""
+    socketio.emit("queue_position", {"queue_num": None}, to=user_room(user_id))
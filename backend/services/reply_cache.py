@@ -0,0 +1,39 @@
+import re
+import unicodedata
+
+from config import AI_REPLY_CACHE_MAX_ENTRIES, AI_REPLY_CACHE_TTL
+from services.lru_cache import TTLLRUCache
+
+
+# AI 回复缓存：相同（归一化后）问题 + 相同服务方案/模型，直接复用上次的回复
+reply_cache = TTLLRUCache(AI_REPLY_CACHE_MAX_ENTRIES, AI_REPLY_CACHE_TTL)
+
+# 常见繁体字 -> 简体字（覆盖购物客服高频用字即可）
+_TRADITIONAL = str.maketrans({
+    "麼": "么", "嗎": "吗", "們": "们", "個": "个", "這": "这", "裡": "里", "沒": "没", "還": "还",
+    "貨": "货", "運": "运", "費": "费", "郵": "邮", "訂": "订", "單": "单", "購": "购", "買": "买",
+    "賣": "卖", "價": "价", "錢": "钱", "幣": "币", "換": "换", "發": "发", "東": "东", "務": "务",
+    "問": "问", "題": "题", "會": "会", "時": "时", "間": "间", "號": "号", "碼": "码", "點": "点",
+    "優": "优", "質": "质", "後": "后", "處": "处", "辦": "办", "詢": "询", "聯": "联", "繫": "系",
+    "開": "开", "關": "关", "帳": "账", "戶": "户", "補": "补", "庫": "库", "學": "学", "請": "请",
+    "說": "说", "為": "为", "電": "电", "話": "话", "無": "无", "寫": "写", "來": "来", "給": "给",
+    "讓": "让", "於": "于",
+})
+_PREFIXES = ("请问一下", "请问", "你好", "您好", "想问一下", "想问", "问一下")
+_PARTICLES = "呢啊呀吧哦嘛啦哈"
+_SPACE_PUNCT_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_question(question):
+    """问题归一化：全角转半角、繁转简、大小写、去标点空白、去掉常见的客套前缀和句尾语气词"""
+    text = unicodedata.normalize("NFKC", question or "").lower().translate(_TRADITIONAL)
+    text = _SPACE_PUNCT_RE.sub("", text)
+    for prefix in _PREFIXES:
+        if text.startswith(prefix) and len(text) > len(prefix):
+            text = text[len(prefix):]
+            break
+    return text.rstrip(_PARTICLES) or text
+
+
+def reply_cache_key(question, scheme, model):
+    return (scheme, model, normalize_question(question))
@@ -0,0 +1,239 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+
+from sqlalchemy.orm import selectinload
+
+from config import SEARCH_INDEX_ENABLED, SEARCH_INDEX_MAX_AGE
+from db import db
+from models.product import Product
+from services.background import start_periodic
+
+
+# 商品关键词搜索：进程内倒排索引（名称+描述），中英文混合分词
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[a-z0-9]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def tokenize(text, for_query=False):
+    """分词：英文/数字按单词切分；中文连续片段切成二元组（索引时额外保留单字，便于单字查询）"""
+    tokens = []
+    for m in _TOKEN_RE.finditer((text or "").lower()):
+        run = m.group()
+        if not _CJK_RE.match(run):
+            tokens.append(run)
+            continue
+        if len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        if not for_query:
+            tokens.extend(run)
+    return tokens
+
+
+def _add_document(postings, doc_terms, doc_category, product_id, name, description, category_id):
+    """把一个商品写入给定的索引结构，返回是否新增了英文词（英文词表需要重新排序）"""
+    weights = {}
+    for term in tokenize(name):
+        weights[term] = weights.get(term, 0.0) + NAME_WEIGHT
+    for term in tokenize(description):
+        weights[term] = weights.get(term, 0.0) + DESCRIPTION_WEIGHT
+    new_latin = False
+    for term, weight in weights.items():
+        term_postings = postings.get(term)
+        if term_postings is None:
+            term_postings = postings[term] = {}
+            if not _CJK_RE.match(term):
+                new_latin = True
+        term_postings[product_id] = weight
+    doc_terms[product_id] = set(weights)
+    doc_category[product_id] = category_id
+    return new_latin
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}  # term -> {product_id: weight}
+        self._doc_terms = {}  # product_id -> set(term)
+        self._doc_category = {}  # product_id -> category_id
+        self._latin_terms = []  # 英文词表（有序），用于前缀匹配
+        self._latin_dirty = False
+        self._building = False
+        self._replay = []  # 重建期间的增量修改，新索引换上后重放
+        self.ready = False
+        self.built_at = 0.0
+
+    def _add(self, product_id, name, description, category_id):
+        if _add_document(self._postings, self._doc_terms, self._doc_category,
+                         product_id, name, description, category_id):
+            self._latin_dirty = True
+
+    def _remove(self, product_id):
+        for term in self._doc_terms.pop(product_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                if not _CJK_RE.match(term):
+                    self._latin_dirty = True
+        self._doc_category.pop(product_id, None)
+
+    def build(self, rows):
+        """rows: 可迭代的 (id, name, description, category_id)。
+
+        新索引在局部变量中构建，不持有锁，期间的搜索继续使用旧索引；构建完成后在锁内一次换上。
+        遍历中途出错时旧索引保持不变。构建期间 upsert/remove 的修改记录下来，换上新索引后重放，不会丢失。
+        """
+        with self._lock:
+            self._building = True
+            self._replay = []
+        try:
+            postings, doc_terms, doc_category = {}, {}, {}
+            for product_id, name, description, category_id in rows:
+                _add_document(postings, doc_terms, doc_category, product_id, name, description, category_id)
+        except Exception:
+            with self._lock:
+                self._building = False
+                self._replay = []
+            raise
+
+        with self._lock:
+            self._postings, self._doc_terms, self._doc_category = postings, doc_terms, doc_category
+            for op, args in self._replay:
+                op(*args)
+            self._building = False
+            self._replay = []
+            self._latin_dirty = True
+            self.ready = True
+            self.built_at = time.time()
+
+    def _upsert(self, product_id, name, description, category_id):
+        self._remove(product_id)
+        self._add(product_id, name, description, category_id)
+
+    def upsert(self, product_id, name, description, category_id):
+        with self._lock:
+            self._upsert(product_id, name, description, category_id)
+            if self._building:
+                self._replay.append((self._upsert, (product_id, name, description, category_id)))
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+            if self._building:
+                self._replay.append((self._remove, (product_id,)))
+
+    def _expand(self, term):
+        """英文词按前缀扩展（与原 LIKE 的子串语义尽量接近），中文二元组精确匹配"""
+        if _CJK_RE.match(term):
+            return [term] if term in self._postings else []
+        if self._latin_dirty:
+            self._latin_terms = sorted(t for t in self._postings if not _CJK_RE.match(t))
+            self._latin_dirty = False
+        start = bisect.bisect_left(self._latin_terms, term)
+        matched = []
+        for t in self._latin_terms[start:]:
+            if not t.startswith(term):
+                break
+            matched.append(t)
+        return matched
+
+    def search(self, keyword, category_id=None, limit=None):
+        """返回 (命中总数, 按相关度排序的商品ID列表)，所有查询词都需命中；limit 只取前若干条，避免全量排序"""
+        terms = list(dict.fromkeys(tokenize(keyword, for_query=True)))
+        if not terms:
+            return 0, []
+        with self._lock:
+            total_docs = len(self._doc_terms) or 1
+            candidates = None
+            scores = {}
+            for term in terms:
+                hits = {}
+                for t in self._expand(term):
+                    postings = self._postings[t]
+                    idf = math.log(1.0 + total_docs / len(postings))
+                    for product_id, weight in postings.items():
+                        if candidates is not None and product_id not in candidates:
+                            continue
+                        hits[product_id] = max(hits.get(product_id, 0.0), weight * idf)
+                if not hits:
+                    return 0, []
+                candidates = set(hits)
+                for product_id, score in hits.items():
+                    scores[product_id] = scores.get(product_id, 0.0) + score
+            if category_id is not None:
+                candidates = {pid for pid in candidates if self._doc_category.get(pid) == category_id}
+            rank = lambda pid: (-scores[pid], -pid)  # noqa: E731
+            if limit is None:
+                return len(candidates), sorted(candidates, key=rank)
+            return len(candidates), heapq.nsmallest(limit, candidates, key=rank)
+
+
+product_index = ProductSearchIndex()
+_build_lock = threading.Lock()
+
+
+def rebuild_index():
+    """全量重建索引（后台线程每 SEARCH_INDEX_MAX_AGE 秒一次，同步其他进程的修改）；返回是否成功"""
+    if not _build_lock.acquire(blocking=False):
+        return False
+    try:
+        rows = db.session.query(Product.id, Product.name, Product.description, Product.category_id).yield_per(5000)
+        product_index.build(rows)
+        return True
+    except Exception as e:
+        print(f"构建商品搜索索引失败: {str(e)}")
+        return False
+    finally:
+        db.session.rollback()
+        _build_lock.release()
+
+
+def _ensure_index():
+    # 请求从不构建索引：索引由后台线程构建，首次构建完成前的请求走 LIKE 回退
+    return SEARCH_INDEX_ENABLED and product_index.ready
+
+
+def search_products(keyword, category_id=None, offset=0, limit=10):
+    """走倒排索引搜索商品，返回 (total_count, products)；索引不可用时返回 None，由调用方回退到 LIKE 查询"""
+    if not _ensure_index():
+        return None
+    offset = max(offset, 0)
+    try:
+        total, ids = product_index.search(keyword, category_id=category_id, limit=offset + limit)
+    except Exception as e:
+        print(f"商品搜索索引查询失败: {str(e)}")
+        return None
+
+    page_ids = ids[offset:offset + limit]
+    if not page_ids:
+        return total, []
+    products = Product.query.options(selectinload(Product.category)).filter(Product.id.in_(page_ids)).all()
+    rows = {p.id: p for p in products}
+    return total, [rows[pid] for pid in page_ids if pid in rows]
+
+
+def index_product(product):
+    """商品新增/修改后同步索引（后台正在重建时，修改会在新索引换上后重放）"""
+    product_index.upsert(product.id, product.name, product.description, product.category_id)
+
+
+def unindex_product(product_id):
+    product_index.remove(product_id)
+
+
+def start_search_index_refresher(app):
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    return start_periodic(app, "search-index-refresher", SEARCH_INDEX_MAX_AGE, rebuild_index)
@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from config import MAX_QUEUE_LENGTH, SERVICE_QUEUE_BACKEND
+from db import db
+from models.service_queue_entry import ServiceQueueEntry
+
+
+class QueueFullError(Exception):
+    """排队人数已达 MAX_QUEUE_LENGTH"""
+
+
+class MemoryServiceQueue:
+    """进程内排队（单进程调试用）：OrderedDict 保证入队/出队/移除/判断是否在队中都是 O(1)。
+
+    每个用户入队时分配递增的序号，排队序号按算术计算：
+    自己的序号 - 队首序号 + 1 - 排在自己前面、中途被移出的人数。
+    中途移出的序号保存在有序列表中（二分查找），出队时丢弃队首之前的部分；
+    没有中途移出时查询是 O(1)，空洞数超过 max_length 时整体重新编号，均摊仍是 O(1)。
+    """
+
+    def __init__(self, max_length):
+        self.max_length = max_length
+        self._lock = threading.Lock()
+        self._queue = OrderedDict()  # user_id -> 入队序号
+        self._next_seq = 1
+        self._head = 1  # 队首的序号（队列为空时等于 _next_seq）
+        self._holes = []  # 队首之后中途被移出的序号（有序）
+
+    def enqueue(self, user_id):
+        """加入排队（已在队中则不变），返回排队序号；队列已满时抛出 QueueFullError"""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id not in self._queue:
+                if len(self._queue) >= self.max_length:
+                    raise QueueFullError(f"排队人数已满（{self.max_length}人）")
+                if not self._queue:
+                    self._head = self._next_seq
+                self._queue[user_id] = self._next_seq
+                self._next_seq += 1
+            return self._position(user_id)
+
+    def _position(self, user_id):
+        seq = self._queue[user_id]
+        return seq - self._head + 1 - bisect.bisect_left(self._holes, seq)
+
+    def _advance_head(self):
+        """队首出队/移出后：队首序号移到新的第一个用户，丢弃已经不在队首之后的空洞"""
+        if not self._queue:
+            self._head = self._next_seq
+            self._holes.clear()
+            return
+        self._head = next(iter(self._queue.values()))
+        del self._holes[:bisect.bisect_left(self._holes, self._head)]
+
+    def _renumber(self):
+        """空洞过多时按当前顺序重新编号，空洞清零"""
+        for seq, user_id in enumerate(self._queue, self._head):
+            self._queue[user_id] = seq
+        self._next_seq = self._head + len(self._queue)
+        self._holes.clear()
+
+    def position(self, user_id):
+        """排队序号（从 1 开始），不在队中返回 None"""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id not in self._queue:
+                return None
+            return self._position(user_id)
+
+    def remove(self, user_id):
+        with self._lock:
+            seq = self._queue.pop(str(user_id), None)
+            if seq is None:
+                return False
+            if seq == self._head:
+                self._advance_head()
+            else:
+                bisect.insort(self._holes, seq)
+                if len(self._holes) > self.max_length:
+                    self._renumber()
+            return True
+
+    def pop(self):
+        """取出排在最前面的用户，队列为空返回 None"""
+        with self._lock:
+            if not self._queue:
+                return None
+            user_id = self._queue.popitem(last=False)[0]
+            self._advance_head()
+            return user_id
+
+    def users(self):
+        with self._lock:
+            return list(self._queue)
+
+    def length(self):
+        return len(self._queue)
+
+
+class DatabaseServiceQueue:
+    """service_queue 表排队：自增 id 为顺序号，所有进程看到同一个队列和一致的排队序号。
+
+    入队/出队/移除都是按唯一索引的单行读写；排队序号为 COUNT(id <= 自己的 id)，
+    队列长度受 max_length 限制，所以统计的行数有上限。
+    """
+
+    def __init__(self, max_length):
+        self.max_length = max_length
+
+    def enqueue(self, user_id):
+        """加入排队（已在队中则不变），返回排队序号；队列已满时抛出 QueueFullError"""
+        user_id = str(user_id)
+        position = self.position(user_id)
+        if position is not None:
+            return position
+        if self.length() >= self.max_length:
+            raise QueueFullError(f"排队人数已满（{self.max_length}人）")
+
+        entry = ServiceQueueEntry(user_id=user_id, enqueued_at=int(time.time()))
+        db.session.add(entry)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 同一用户的并发请求已经入队
+            db.session.rollback()
+            return self.position(user_id)
+
+        # 多个进程同时入队可能超出上限，排在上限之后的撤回
+        position = self.position(user_id)
+        if position is not None and position > self.max_length:
+            self.remove(user_id)
+            raise QueueFullError(f"排队人数已满（{self.max_length}人）")
+        return position
+
+    def position(self, user_id):
+        """排队序号（从 1 开始），不在队中返回 None"""
+        own_id = (
+            db.session.query(ServiceQueueEntry.id)
+            .filter(ServiceQueueEntry.user_id == str(user_id))
+            .scalar_subquery()
+        )
+        position = db.session.query(func.count(ServiceQueueEntry.id)).filter(ServiceQueueEntry.id <= own_id).scalar()
+        return position or None
+
+    def remove(self, user_id):
+        removed = ServiceQueueEntry.query.filter(ServiceQueueEntry.user_id == str(user_id)).delete(synchronize_session=False)
+        db.session.commit()
+        return removed == 1
+
+    def pop(self):
+        """取出排在最前面的用户，队列为空返回 None；多个客服同时取号时每人取到不同的用户"""
+        while True:
+            head = db.session.query(ServiceQueueEntry.id, ServiceQueueEntry.user_id).order_by(ServiceQueueEntry.id.asc()).first()
+            if head is None:
+                return None
+            removed = ServiceQueueEntry.query.filter(ServiceQueueEntry.id == head.id).delete(synchronize_session=False)
+            db.session.commit()
+            if removed == 1:
+                return head.user_id
+
+    def users(self):
+        return [row.user_id for row in db.session.query(ServiceQueueEntry.user_id).order_by(ServiceQueueEntry.id.asc())]
+
+    def length(self):
+        return db.session.query(func.count(ServiceQueueEntry.id)).scalar() or 0
+
+
+if SERVICE_QUEUE_BACKEND == "memory":
+    service_queue = MemoryServiceQueue(MAX_QUEUE_LENGTH)
+else:
+    service_queue = DatabaseServiceQueue(MAX_QUEUE_LENGTH)
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from config import WECHAT_ASYNC_MAX_PENDING, WECHAT_DEDUP_PRUNE_INTERVAL, WECHAT_DEDUP_TTL
+from db import db
+from models.wechat_msg_receipt import WechatMsgReceipt
+from services.ai_client import ai_executor
+from services.ai_service import generate_ai_reply
+from services.background import delete_in_batches, start_periodic
+from services.messages import log_wechat_message
+from services.realtime import publish_queue_changed
+from services.service_queue import QueueFullError, service_queue
+from services.wechat_service import send_custom_text
+
+
+def message_dedup_key(msg):
+    """普通消息用 MsgId 去重；事件消息没有 MsgId，按微信文档用 FromUserName + CreateTime"""
+    return msg.get("MsgId") or f"{msg.get('FromUserName')}:{msg.get('CreateTime')}"
+
+
+def claim_message(msg_id, user_id):
+    """登记收到的消息，返回 False 表示这是微信的重试（同一条消息已在处理），多进程下同样有效"""
+    db.session.add(WechatMsgReceipt(msg_id=str(msg_id)[:64], user_id=str(user_id), created_at=int(time.time())))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def transfer_if_unanswerable(user_id, reply_content):
+    """AI 无法解答时转接人工客服，返回最终发给用户的内容"""
+    if "转接人工客服" not in reply_content:
+        return reply_content
+    try:
+        queue_num = service_queue.enqueue(user_id)
+    except QueueFullError:
+        return "该问题我无法解答，当前人工客服排队人数已满，请稍后再试～"
+    publish_queue_changed()
+    return f"该问题我无法解答，已为你转接人工客服，当前排队序号：{queue_num}，客服将尽快为你服务～"
+
+
+class WechatReplyDispatcher:
+    """后台生成 AI 回复并通过客服消息接口发送，webhook 本身立即返回"""
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.delivered = 0
+        self.failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def submit(self, user_id, question, received_at=None):
+        """提交后台处理，待处理数已满时返回 False（调用方直接回复稍后再试）"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            self.submitted += 1
+        app = current_app._get_current_object()
+        ai_executor.submit(self._run, app, user_id, question, received_at or time.time())
+        return True
+
+    def _run(self, app, user_id, question, received_at):
+        delivered = False
+        try:
+            with app.app_context():
+                reply_content = transfer_if_unanswerable(user_id, generate_ai_reply(question, user_id).text)
+                delivered = send_custom_text(user_id, reply_content)
+                log_wechat_message(user_id=user_id, content=question, reply_content=reply_content, message_type="text")
+        except Exception as e:
+            print(f"微信消息后台处理失败: {str(e)}")
+        finally:
+            latency = time.time() - received_at
+            with self._lock:
+                self.pending -= 1
+                if delivered:
+                    self.delivered += 1
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "avg_delivery_s": round(self._latency_total / self.delivered, 3) if self.delivered else 0.0,
+                "max_delivery_s": round(self._latency_max, 3),
+            }
+
+
+wechat_dispatcher = WechatReplyDispatcher(WECHAT_ASYNC_MAX_PENDING)
+
+
+def prune_message_receipts(batch_size=1000, max_batches=None):
+    cutoff = int(time.time()) - WECHAT_DEDUP_TTL
+    return delete_in_batches(WechatMsgReceipt, WechatMsgReceipt.created_at <= cutoff, batch_size, max_batches)
+
+
+def start_wechat_receipt_pruner(app):
+    return start_periodic(app, "wechat-receipt-pruner", WECHAT_DEDUP_PRUNE_INTERVAL, prune_message_receipts)
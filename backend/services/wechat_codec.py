@@ -0,0 +1,87 @@
+import re
+import time
+from xml.parsers import expat
+
+# 微信消息 XML 编解码：解析只取根节点下已知的字段，渲染使用预先拼好的紧凑模板
+
+MAX_XML_BYTES = 64 * 1024  # 微信推送的消息都很小，超过该大小直接拒绝
+
+# 普通消息与事件推送会用到的字段，其余节点（含嵌套节点）一律忽略
+KNOWN_FIELDS = frozenset({
+    "ToUserName", "FromUserName", "CreateTime", "MsgType", "MsgId", "MsgDataId", "Idx",
+    "Content", "PicUrl", "MediaId", "Format", "Recognition", "ThumbMediaId",
+    "Location_X", "Location_Y", "Scale", "Label", "Title", "Description", "Url",
+    "Event", "EventKey", "Ticket", "Latitude", "Longitude", "Precision",
+})
+
+# XML 1.0 不允许的控制字符（\t \n \r 以外），回复内容中出现时删除，否则微信解析失败
+_INVALID_XML_CHARS_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _reject_dtd(*args):
+    # DOCTYPE/实体声明是 XML 炸弹（实体指数展开）和 XXE 的入口，微信消息不会包含
+    raise ValueError("DTD is not allowed")
+
+
+def parse_xml(xml_data):
+    """解析微信推送的 XML，返回 {字段名: 文本}；格式错误、过大或包含 DTD 时抛出 ValueError"""
+    if isinstance(xml_data, str):
+        xml_data = xml_data.encode("utf-8")
+    if len(xml_data) > MAX_XML_BYTES:
+        raise ValueError("xml too large")
+
+    msg = {}
+    depth = 0
+    field = None
+    parts = []
+
+    def start(name, attrs):
+        nonlocal depth, field
+        depth += 1
+        if depth == 2 and name in KNOWN_FIELDS:
+            field = name
+            parts.clear()
+
+    def end(name):
+        nonlocal depth, field
+        if depth == 2 and field is not None:
+            msg[field] = "".join(parts)
+            field = None
+        depth -= 1
+
+    def text(data):
+        if field is not None and depth == 2:
+            parts.append(data)
+
+    parser = expat.ParserCreate("utf-8")
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text
+    parser.StartDoctypeDeclHandler = _reject_dtd
+    parser.EntityDeclHandler = _reject_dtd
+    parser.ExternalEntityRefHandler = _reject_dtd
+    try:
+        parser.Parse(xml_data, True)
+    except expat.ExpatError as e:
+        raise ValueError(f"invalid xml: {e}")
+    return msg
+
+
+def cdata(text):
+    """包成 CDATA 段：内容里的 "]]>" 拆成两段，非法控制字符删除"""
+    text = _INVALID_XML_CHARS_RE.sub("", str(text))
+    if "]]>" in text:
+        text = text.replace("]]>", "]]]]><![CDATA[>")
+    return f"<![CDATA[{text}]]>"
+
+
+def generate_reply_xml(msg, reply_content):
+    """生成被动回复的文本消息 XML（收发方与收到的消息对调）"""
+    return (
+        f"<xml><ToUserName>{cdata(msg['FromUserName'])}</ToUserName>"
+        f"<FromUserName>{cdata(msg['ToUserName'])}</FromUserName>"
+        f"<CreateTime>{int(time.time())}</CreateTime>"
+        f"<MsgType><![CDATA[text]]></MsgType>"
+        f"<Content>{cdata(reply_content)}</Content></xml>"
+    )
@@ -0,0 +1,202 @@
+import threading
+import time
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import WECHAT_CREDENTIAL_LEASE, WECHAT_CREDENTIAL_REFRESH_MARGIN
+from db import db
+from models.wechat_credential import WechatCredential
+
+# 距离真正过期不足该秒数的凭证不再使用（留出请求在路上的时间）
+_EXPIRY_SAFETY = 60
+# 等待其他进程刷新时，重新读取共享凭证的间隔（秒）
+_WAIT_POLL_INTERVAL = 0.2
+
+_table = WechatCredential.__table__
+
+
+class CredentialCache:
+    """
+    微信接口凭证缓存：进程内一份副本 + 数据库中多进程共享的一行。
+
+    - 剩余有效期低于 refresh_margin 时开始刷新，同一时间只有一个线程（进程内锁）、
+      一个进程（数据库租约）调用微信接口，其余请求继续使用仍然有效的旧凭证；
+      没有可用旧凭证时等待刷新结果
+    - 其他进程刷新后写回数据库，本进程读到后直接使用，不再重复调用微信接口
+    - fetch() 返回 (凭证, 有效秒数)，失败时返回 None 或抛出异常
+    """
+
+    def __init__(self, name, fetch, refresh_margin=WECHAT_CREDENTIAL_REFRESH_MARGIN, lease_seconds=WECHAT_CREDENTIAL_LEASE):
+        self.name = name
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.waits = 0
+        self.stale_served = 0
+        self.invalidations = 0
+
+    def _count(self, field):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _fresh(self, now):
+        return self._value is not None and now < self._expires_at - self.refresh_margin
+
+    def _usable(self, now):
+        if self._value is not None and now < self._expires_at - _EXPIRY_SAFETY:
+            return self._value
+        return None
+
+    def get(self):
+        """返回当前可用的凭证，获取失败时返回 None"""
+        now = time.time()
+        if self._fresh(now):
+            self._count("hits")
+            return self._value
+
+        usable = self._usable(now)
+        if not self._lock.acquire(blocking=False):
+            if usable:
+                # 其他线程正在刷新，旧凭证仍然有效，直接使用
+                self._count("stale_served")
+                return usable
+            self._count("waits")
+            self._lock.acquire()
+        try:
+            return self._refresh_locked()
+        except Exception as e:
+            print(f"获取{self.name}失败: {str(e)}")
+            return self._usable(time.time())
+        finally:
+            self._lock.release()
+
+    def _refresh_locked(self):
+        if self._fresh(time.time()):
+            # 等锁期间已由其他线程刷新
+            self._count("hits")
+            return self._value
+        if self._load_shared():
+            self._count("shared_hits")
+            return self._value
+
+        deadline = time.time() + self.lease_seconds
+        while True:
+            if self._acquire_lease():
+                return self._fetch_and_store()
+            # 其他进程持有租约，正在刷新
+            usable = self._usable(time.time())
+            if usable:
+                self._count("stale_served")
+                return usable
+            if time.time() >= deadline:
+                return None
+            self._count("waits")
+            time.sleep(_WAIT_POLL_INTERVAL)
+            if self._load_shared():
+                self._count("shared_hits")
+                return self._value
+
+    def _fetch_and_store(self):
+        try:
+            result = self.fetch()
+        except Exception as e:
+            print(f"刷新{self.name}失败: {str(e)}")
+            result = None
+        now = int(time.time())
+        if not result:
+            self._count("refresh_failures")
+            with db.engine.begin() as conn:
+                conn.execute(update(_table).where(_table.c.name == self.name).values(lease_until=0))
+            return self._usable(now)
+
+        value, expires_in = result
+        self._value = value
+        self._expires_at = now + int(expires_in)
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(_table)
+                .where(_table.c.name == self.name)
+                .values(value=value, expires_at=self._expires_at, lease_until=0, updated_at=now)
+            )
+        self._count("refreshes")
+        return value
+
+    def _load_shared(self):
+        """读取数据库中的共享凭证，比本进程的副本新时采用；返回采用后是否无需刷新"""
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(_table.c.value, _table.c.expires_at).where(_table.c.name == self.name)
+            ).first()
+        if row is not None and row.value and row.expires_at > self._expires_at:
+            self._value = row.value
+            self._expires_at = row.expires_at
+        return self._fresh(time.time())
+
+    def _acquire_lease(self):
+        """抢刷新租约（租约过期后可被其他进程接管），返回是否抢到"""
+        now = int(time.time())
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                update(_table)
+                .where(_table.c.name == self.name, _table.c.lease_until < now)
+                .values(lease_until=now + self.lease_seconds)
+            )
+            if result.rowcount == 1:
+                return True
+            exists = conn.execute(select(_table.c.name).where(_table.c.name == self.name)).first()
+        if exists:
+            return False
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    insert(_table).values(
+                        name=self.name, value=None, expires_at=0, lease_until=now + self.lease_seconds, updated_at=now
+                    )
+                )
+            return True
+        except IntegrityError:
+            return False
+
+    def invalidate(self, value):
+        """微信返回凭证失效时调用；只作废传入的这个值，避免把别人刚刷新的新凭证也作废"""
+        if not value:
+            return
+        self._count("invalidations")
+        if self._value == value:
+            self._expires_at = 0
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(_table).where(_table.c.name == self.name, _table.c.value == value).values(expires_at=0)
+            )
+
+    def refresh_if_due(self):
+        """后台提前刷新：只处理已经在使用（获取过）的凭证，未配置公众号时不会去调用微信接口"""
+        if self._value is None:
+            self._load_shared()
+            if self._value is None:
+                return None
+        if self._fresh(time.time()):
+            return self._value
+        return self.get()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "waits": self.waits,
+                "stale_served": self.stale_served,
+                "invalidations": self.invalidations,
+                "expires_in": max(0, int(self._expires_at - time.time())) if self._value else 0,
+            }
@@ -1,96 +1,102 @@
 import hashlib
+import json
 import random
 import time
-import xml.etree.ElementTree as ET
 
 import requests
 
-from config import APPID, APPSECRET
-import state
-
-
-# 4. 微信消息处理（解析XML/回复XML）
-def parse_xml(xml_data):
-    """解析微信发来的XML消息"""
-    root = ET.fromstring(xml_data)
-    msg = {}
-    for child in root:
-        msg[child.tag] = child.text
-    return msg
-
-
-def generate_reply_xml(msg, reply_content):
-    """生成微信回复的XML格式"""
-    xml_template = """
-    <xml>
-        <ToUserName><![CDATA[{to_user}]]></ToUserName>
-        <FromUserName><![CDATA[{from_user}]]></FromUserName>
-        <CreateTime>{create_time}</CreateTime>
-        <MsgType><![CDATA[text]]></MsgType>
-        <Content><![CDATA[{content}]]></Content>
-    </xml>
-    """
-    return xml_template.format(
-        to_user=msg["FromUserName"],
-        from_user=msg["ToUserName"],
-        create_time=str(int(time.time())),
-        content=reply_content
-    )
+from config import APPID, APPSECRET, WECHAT_API_BASE, WECHAT_CREDENTIAL_REFRESH_INTERVAL
+from services.background import start_periodic
+from services.wechat_credentials import CredentialCache
 
 
-# 获取微信access_token
-def get_access_token():
-    # 如果access_token未过期，直接返回
-    if state.access_token and time.time() < state.access_token_expires:
-        return state.access_token
-
-    # 调用微信接口获取access_token
-    url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={APPID}&secret={APPSECRET}"
-    try:
-        response = requests.get(url, timeout=5)
-        result = response.json()
-
-        if "access_token" in result:
-            state.access_token = result["access_token"]
-            # 设置过期时间（微信返回7200秒，我们提前100秒过期）
-            state.access_token_expires = time.time() + 7100
-            return state.access_token
-        else:
-            print(f"获取access_token失败: {result}")
-            return None
-    except Exception as e:
-        print(f"获取access_token异常: {e}")
-        return None
-
+# access_token 失效/过期的错误码，遇到时作废当前 token、重新获取后再试一次
+_TOKEN_EXPIRED_ERRCODES = {40001, 40014, 42001}
 
-# 获取微信jsapi_ticket
-def get_jsapi_ticket():
-    # 如果jsapi_ticket未过期，直接返回
-    if state.jsapi_ticket and time.time() < state.jsapi_ticket_expires:
-        return state.jsapi_ticket
 
-    # 先获取access_token
-    token = get_access_token()
-    if not token:
+def _fetch_access_token():
+    url = f"{WECHAT_API_BASE}/cgi-bin/token?grant_type=client_credential&appid={APPID}&secret={APPSECRET}"
+    result = requests.get(url, timeout=5).json()
+    if "access_token" not in result:
+        print(f"获取access_token失败: {result}")
         return None
+    return result["access_token"], result.get("expires_in", 7200)
 
-    # 调用微信接口获取jsapi_ticket
-    url = f"https://api.weixin.qq.com/cgi-bin/ticket/getticket?access_token={token}&type=jsapi"
-    try:
-        response = requests.get(url, timeout=5)
-        result = response.json()
 
-        if result.get("errcode") == 0:
-            state.jsapi_ticket = result["ticket"]
-            # 设置过期时间（微信返回7200秒，我们提前100秒过期）
-            state.jsapi_ticket_expires = time.time() + 7100
-            return state.jsapi_ticket
-        else:
-            print(f"获取jsapi_ticket失败: {result}")
+def _fetch_jsapi_ticket():
+    for attempt in range(2):
+        token = access_token_cache.get()
+        if not token:
             return None
-    except Exception as e:
-        print(f"获取jsapi_ticket异常: {e}")
+        url = f"{WECHAT_API_BASE}/cgi-bin/ticket/getticket?access_token={token}&type=jsapi"
+        result = requests.get(url, timeout=5).json()
+        if result.get("errcode") == 0:
+            return result["ticket"], result.get("expires_in", 7200)
+        if result.get("errcode") in _TOKEN_EXPIRED_ERRCODES and attempt == 0:
+            access_token_cache.invalidate(token)
+            continue
+        print(f"获取jsapi_ticket失败: {result}")
         return None
+    return None
+
+
+# 多进程共享、单飞刷新的凭证缓存（见 services/wechat_credentials.py）
+access_token_cache = CredentialCache("access_token", _fetch_access_token)
+jsapi_ticket_cache = CredentialCache("jsapi_ticket", _fetch_jsapi_ticket)
+
+
+# 获取微信access_token
+def get_access_token():
+    return access_token_cache.get()
+
+
+# 获取微信jsapi_ticket
+def get_jsapi_ticket():
+    return jsapi_ticket_cache.get()
+
+
+def credential_stats():
+    return {"access_token": access_token_cache.stats(), "jsapi_ticket": jsapi_ticket_cache.stats()}
+
+
+def refresh_due_credentials():
+    access_token_cache.refresh_if_due()
+    jsapi_ticket_cache.refresh_if_due()
+
+
+def start_credential_refresher(app):
+    return start_periodic(app, "wechat-credential-refresher", WECHAT_CREDENTIAL_REFRESH_INTERVAL, refresh_due_credentials)
+
+
+def send_custom_text(openid, content):
+    """通过客服消息接口给用户发送文本（用户 48 小时内与公众号有过互动即可发送），返回是否成功"""
+    for attempt in range(2):
+        token = get_access_token()
+        if not token:
+            return False
+        try:
+            response = requests.post(
+                f"{WECHAT_API_BASE}/cgi-bin/message/custom/send?access_token={token}",
+                data=json.dumps(
+                    {"touser": openid, "msgtype": "text", "text": {"content": content}}, ensure_ascii=False
+                ).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                timeout=5,
+            )
+            result = response.json()
+        except Exception as e:
+            print(f"发送客服消息异常: {e}")
+            return False
+
+        errcode = result.get("errcode", 0)
+        if errcode == 0:
+            return True
+        if errcode in _TOKEN_EXPIRED_ERRCODES and attempt == 0:
+            access_token_cache.invalidate(token)
+            continue
+        print(f"发送客服消息失败: {result}")
+        return False
+    return False
 
 
 def make_jsapi_signature(url: str):
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接导入 backend 下的模块（config、services.*），与运行 app.py 时一致
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
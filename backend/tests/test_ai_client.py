@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from services import ai_client
+from services.ai_client import CircuitOpenError, ProviderBusyError, ProviderClient
+
+
+class _OkResponse:
+    def raise_for_status(self):
+        pass
+
+
+def _half_open_provider():
+    provider = ProviderClient("test", max_concurrency=1)
+    for _ in range(provider.breaker.failure_threshold):
+        provider.breaker.record_failure()
+    provider.breaker._opened_at = time.time() - provider.breaker.reset_timeout - 1
+    return provider
+
+
+def test_half_open_probe_without_slot_does_not_stick(monkeypatch):
+    """试探请求排队拿不到并发名额时，熔断器不能一直停在 half_open"""
+    monkeypatch.setattr(ai_client, "AI_QUEUE_TIMEOUT", 0.01)
+    provider = _half_open_provider()
+    calls = []
+    monkeypatch.setattr(provider.session, "request", lambda *a, **kw: calls.append(a) or _OkResponse())
+    assert provider.breaker.state == "half_open"
+
+    provider._slots.acquire()  # 并发名额被占满
+    with pytest.raises(ProviderBusyError):
+        provider.request("GET", "http://provider.test/")
+    provider._slots.release()
+
+    provider.request("GET", "http://provider.test/")
+    assert len(calls) == 1
+    assert provider.breaker.state == "closed"
+
+
+def test_half_open_stream_probe_without_slot_does_not_stick(monkeypatch):
+    monkeypatch.setattr(ai_client, "AI_QUEUE_TIMEOUT", 0.01)
+    provider = _half_open_provider()
+
+    provider._slots.acquire()
+    with pytest.raises(ProviderBusyError):
+        next(provider.stream_lines("GET", "http://provider.test/"))
+    provider._slots.release()
+
+    assert provider.breaker.allow()  # 名额空出来后仍能放行试探请求
+
+
+def test_open_breaker_short_circuits_without_queueing(monkeypatch):
+    monkeypatch.setattr(ai_client, "AI_QUEUE_TIMEOUT", 5)
+    provider = _half_open_provider()
+    provider.breaker._opened_at = time.time()
+    provider._slots.acquire()
+    started = time.time()
+    with pytest.raises(CircuitOpenError):
+        provider.request("GET", "http://provider.test/")
+    assert time.time() - started < 1
@@ -1,6 +1,11 @@
 import json
+import sys
 from pathlib import Path
 
+# Amounts are converted with the backend's own helper so the seed matches the API exactly.
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+from services.money import to_cents  # noqa: E402
+
 
 def _infer_category(name: str) -> str:
     n = (name or "").lower()
@@ -77,7 +82,7 @@ def main() -> None:
     # Insert products
     lines.append(
         "INSERT INTO `products` (\n"
-        "  `id`, `name`, `description`, `price`, `image`, `stock`, `rating`, `category_id`\n"
+        "  `id`, `name`, `description`, `price_cents`, `image`, `stock`, `rating`, `category_id`\n"
         ") VALUES\n"
     )
 
@@ -89,7 +94,7 @@ def main() -> None:
             continue
 
         desc = p.get("description")
-        price = float(p.get("price") or 0)
+        price_cents = to_cents(p.get("price"))  # products.price_cents stores integer cents
         image = p.get("image")
         stock = int(p.get("stock") or 0)
         rating = p.get("rating")
@@ -111,7 +116,7 @@ def main() -> None:
                     pid_sql,
                     name_sql,
                     desc_sql,
-                    str(price),
+                    str(price_cents),
                     image_sql,
                     str(stock),
                     rating_sql,